@@ -0,0 +1,72 @@
+# armazem_local.py — armazém local (SQLite) com o que a esteira já publicou
+#
+# Com ARMAZEM_LOCAL=<arquivo .sqlite> o importador_carteira guarda aqui a assinatura (hash)
+# da última Carteira que escreveu inteira (cabeçalho + dados + linhas de CICLO/LV). Na
+# execução seguinte, se a Carteira montada tem a mesma assinatura, a aba não é limpa nem
+# reescrita — só o carimbo de T2 muda. O arquivo é guardado entre execuções pelo cache do
+# Actions (ver .github/workflows). A assinatura só é gravada depois da escrita completa:
+# uma execução que caiu no meio não vale como publicada.
+# SQLite é da stdlib: nada a instalar. Sem ARMAZEM_LOCAL nada muda.
+
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence
+
+ARMAZEM_LOCAL = os.environ.get("ARMAZEM_LOCAL", "").strip()
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS _cargas (
+    tabela       TEXT PRIMARY KEY,
+    carregado_em TEXT NOT NULL,
+    linhas       INTEGER NOT NULL,
+    assinatura   TEXT NOT NULL
+);
+"""
+
+
+def assinatura(linhas: Iterable[Sequence]) -> str:
+    """Hash das linhas exatamente como vão para a aba (ordem e valores, sem tipar)."""
+    h = hashlib.sha1()
+    for r in linhas:
+        h.update(json.dumps(list(r), ensure_ascii=False, default=str).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()[:16]
+
+
+class Armazem:
+    """
+    with Armazem() as db:
+        if (db.carga("carteira") or {}).get("assinatura") == assinatura(linhas): ...
+        db.registrar("carteira", len(linhas), assinatura(linhas))   # depois de escrever
+    """
+
+    def __init__(self, caminho: str = ARMAZEM_LOCAL):
+        if not caminho:
+            raise RuntimeError("Armazem requer ARMAZEM_LOCAL (caminho do arquivo .sqlite).")
+        Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(caminho)
+        self.con.executescript(_ESQUEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def fechar(self):
+        self.con.close()
+
+    def registrar(self, tabela: str, linhas: int, assin: str):
+        """Marca `tabela` como publicada com `linhas` linhas e assinatura `assin`."""
+        with self.con:
+            self.con.execute("INSERT OR REPLACE INTO _cargas VALUES (?, ?, ?, ?)",
+                             (tabela, datetime.now().isoformat(timespec="seconds"), linhas, assin))
+
+    def carga(self, tabela: str) -> Optional[Dict]:
+        r = self.con.execute("SELECT carregado_em, linhas, assinatura FROM _cargas WHERE tabela = ?",
+                             (tabela,)).fetchone()
+        return {"carregado_em": r[0], "linhas": r[1], "assinatura": r[2]} if r else None
@@ -0,0 +1,192 @@
+# arquivo_historico.py — arquivo frio do Historico: SQLite por mês, comprimido, no Drive
+#
+# A aba Historico fica só com a janela quente; o que sai dela (linhas expiradas do modo
+# snapshot, versões superadas do modo SCD) vem para cá em vez de ser descartado. Um
+# arquivo por mês (historico_AAAA-MM.sqlite.gz, pela data da linha) numa pasta do Drive
+# (ARQUIVO_PASTA_ID) — os runners do Actions são efêmeros. Tabela `historico` com índice
+# (serial, unidade): consultar() filtra por faixa de datas e unidades baixando só os
+# meses da faixa (cópia local só durante a execução). SQLite é da stdlib: nada a instalar.
+# Reenvio das mesmas linhas (retry depois de falha) não duplica: chave única
+# (serial, hash da linha, ordem entre iguais do mesmo lote).
+
+import io
+import os
+import gzip
+import json
+import sqlite3
+import hashlib
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from cota_sheets import com_retry, log
+
+HISTORICO_TIERING = os.environ.get("HISTORICO_TIERING", "0") == "1"
+ARQUIVO_PASTA_ID  = os.environ.get("ARQUIVO_PASTA_ID", "")
+ARQUIVO_CACHE     = os.environ.get("ARQUIVO_CACHE", "")   # vazio: diretório temporário da execução
+
+BASE_SERIAL = datetime(1899, 12, 30)
+IDX_CHAVE   = 1    # B  (ID da carteira)
+IDX_UNIDADE = 29   # AD
+IDX_MUDANCA = 38   # AM (só no SCD)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS historico (
+    serial   INTEGER NOT NULL,
+    unidade  TEXT,
+    chave    TEXT,
+    mudanca  TEXT,
+    hash     TEXT NOT NULL,
+    ordem    INTEGER NOT NULL,
+    linha    TEXT NOT NULL,
+    UNIQUE (serial, hash, ordem)
+);
+CREATE INDEX IF NOT EXISTS ix_historico_serial_unidade ON historico (serial, unidade);
+"""
+
+
+def mes_do_serial(serial: int) -> str:
+    return (BASE_SERIAL + timedelta(days=int(serial))).strftime("%Y-%m")
+
+
+def nome_arquivo(mes: str) -> str:
+    return f"historico_{mes}.sqlite.gz"
+
+
+def _cel(r: List, i: int) -> str:
+    return str(r[i]).strip() if len(r) > i and r[i] is not None else ""
+
+
+# ========= DRIVE =========
+class ArquivoDrive:
+    """Lê/grava os arquivos mensais na pasta do Drive (cliente googleapiclient drive v3)."""
+
+    def __init__(self, drive, pasta_id: str = ARQUIVO_PASTA_ID):
+        if not pasta_id:
+            raise RuntimeError("HISTORICO_TIERING=1 requer ARQUIVO_PASTA_ID (pasta do Drive do arquivo).")
+        self.drive = drive
+        self.pasta_id = pasta_id
+        self._ids: Dict[str, Optional[str]] = {}
+
+    def _id(self, nome: str) -> Optional[str]:
+        if nome not in self._ids:
+            files = com_retry(lambda: self.drive.files().list(
+                q=f"name = '{nome}' and trashed = false and '{self.pasta_id}' in parents",
+                spaces="drive", corpora="allDrives", fields="files(id)", supportsAllDrives=True,
+                includeItemsFromAllDrives=True, pageSize=1).execute(), desc=f"files.list({nome})").get("files", [])
+            self._ids[nome] = files[0]["id"] if files else None
+        return self._ids[nome]
+
+    def baixar(self, mes: str, destino: Path) -> bool:
+        from googleapiclient.http import MediaIoBaseDownload
+        fid = self._id(nome_arquivo(mes))
+        if fid is None:
+            return False
+        buf = io.BytesIO()
+        baixador = MediaIoBaseDownload(buf, self.drive.files().get_media(fileId=fid, supportsAllDrives=True),
+                                       chunksize=8 * 1024 * 1024)
+        done = False
+        while not done:
+            _, done = com_retry(baixador.next_chunk, desc=f"download {nome_arquivo(mes)}")
+        destino.write_bytes(gzip.decompress(buf.getvalue()))
+        return True
+
+    def enviar(self, mes: str, origem: Path):
+        from googleapiclient.http import MediaIoBaseUpload
+        nome = nome_arquivo(mes)
+        media = MediaIoBaseUpload(io.BytesIO(gzip.compress(origem.read_bytes(), compresslevel=9)),
+                                  mimetype="application/gzip", resumable=True)
+        fid = self._id(nome)
+        if fid is None:
+            r = com_retry(lambda: self.drive.files().create(
+                body={"name": nome, "parents": [self.pasta_id]}, media_body=media, fields="id",
+                supportsAllDrives=True).execute(), desc=f"create {nome}", tipo="escrita")
+            self._ids[nome] = r["id"]
+        else:
+            com_retry(lambda: self.drive.files().update(fileId=fid, media_body=media, supportsAllDrives=True).execute(),
+                      desc=f"update {nome}", tipo="escrita")
+
+
+# ========= ARQUIVO =========
+class ArquivoHistorico:
+    """
+    arq = ArquivoHistorico(ArquivoDrive(drive))
+    arq.arquivar(linhas)                                   # linhas no layout A..AL(+AM/AN)
+    arq.consultar("01/05/2025", "31/05/2025", {"UNIDADE X"})
+    """
+
+    def __init__(self, armazenamento: ArquivoDrive, cache: str = ARQUIVO_CACHE):
+        self.armazenamento = armazenamento
+        self.cache = Path(cache) if cache else Path(tempfile.mkdtemp(prefix="arquivo_historico_"))
+        self.cache.mkdir(parents=True, exist_ok=True)
+        self._abertos: Dict[str, sqlite3.Connection] = {}
+
+    def _conexao(self, mes: str, criar: bool) -> Optional[sqlite3.Connection]:
+        if mes not in self._abertos:
+            caminho = self.cache / f"historico_{mes}.sqlite"
+            if not caminho.exists() and not self.armazenamento.baixar(mes, caminho) and not criar:
+                return None
+            con = sqlite3.connect(caminho)
+            con.executescript(_ESQUEMA)
+            self._abertos[mes] = con
+        return self._abertos[mes]
+
+    def arquivar(self, linhas: Iterable[List], serial_de=None) -> int:
+        """Grava as linhas (A = serial do dia) nos arquivos dos seus meses e sobe os alterados. -> nº inserido."""
+        conv = serial_de or (lambda v: int(float(v)))
+        por_mes: Dict[str, List[tuple]] = {}
+        ordem: Dict[tuple, int] = {}
+        for r in linhas:
+            try:
+                s = conv(r[0])
+            except (TypeError, ValueError):
+                continue
+            if s is None:
+                continue
+            texto = json.dumps(list(r), ensure_ascii=False, separators=(",", ":"))
+            h = hashlib.sha1(texto.encode("utf-8")).hexdigest()[:16]
+            k = (s, h)
+            ordem[k] = ordem.get(k, -1) + 1
+            por_mes.setdefault(mes_do_serial(s), []).append(
+                (s, _cel(r, IDX_UNIDADE), _cel(r, IDX_CHAVE), _cel(r, IDX_MUDANCA) or None, h, ordem[k], texto))
+
+        total = 0
+        for mes, regs in sorted(por_mes.items()):
+            con = self._conexao(mes, criar=True)
+            antes = con.total_changes
+            with con:
+                con.executemany("INSERT OR IGNORE INTO historico (serial, unidade, chave, mudanca, hash, ordem, linha) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?)", regs)
+            novos = con.total_changes - antes
+            total += novos
+            if novos:
+                con.execute("VACUUM")
+                self.armazenamento.enviar(mes, self.cache / f"historico_{mes}.sqlite")
+            log(f"🗄️  arquivo {mes}: {novos:,} linhas novas ({len(regs) - novos:,} já arquivadas)")
+        return total
+
+    def consultar(self, data_ini: str, data_fim: str, unidades: Optional[Iterable[str]] = None) -> List[List]:
+        """Linhas com data em [data_ini, data_fim] (dd/mm/aaaa), opcionalmente só das `unidades`."""
+        d0 = datetime.strptime(data_ini, "%d/%m/%Y")
+        d1 = datetime.strptime(data_fim, "%d/%m/%Y")
+        s0, s1 = (d0 - BASE_SERIAL).days, (d1 - BASE_SERIAL).days
+        unidades = list(unidades) if unidades else None
+        out = []
+        mes = d0.replace(day=1)
+        while mes <= d1:
+            con = self._conexao(mes.strftime("%Y-%m"), criar=False)
+            if con is not None:
+                sql = "SELECT linha FROM historico WHERE serial BETWEEN ? AND ?"
+                args: list = [s0, s1]
+                if unidades:
+                    sql += f" AND unidade IN ({','.join('?' * len(unidades))})"
+                    args += unidades
+                out.extend(json.loads(t) for (t,) in con.execute(sql + " ORDER BY serial, rowid", args))
+            mes = (mes + timedelta(days=32)).replace(day=1)
+        return out
+
+    def fechar(self):
+        for con in self._abertos.values():
+            con.close()
+        self._abertos.clear()
@@ -40,6 +40,8 @@ import gspread
 from gspread.exceptions import APIError
 from google.oauth2.service_account import Credentials as SACreds
 
+import cache_local
+
 # =======================
 # CONFIGURAÇÕES GERAIS
 # =======================
@@ -70,6 +72,10 @@ BLOCK2 = [
     ("bd_exec.py",        8),
     ("importador_carteira.py", 9),
 ]
+# 1 = prefetch.py em segundo plano desde o início: as fontes do BLOCO 2 (BANCO.xlsx,
+# Carteira_Planejador, BD_Serv_Esteira) baixam enquanto o BLOCO 1 escreve (cache_local.py)
+PREFETCH_BLOCO2 = os.environ.get("PREFETCH_BLOCO2", "1") == "1"
+SCRIPT_PREFETCH = "prefetch.py"
 
 # =======================
 # CONFIG DAS RÉPLICAS
@@ -78,6 +84,9 @@ STOP_ON_FAILURE = True
 SKIP_MISSING = False
 MAX_ATTEMPTS_PER_SCRIPT = 3
 BACKOFF_BASE_SECONDS = 5
+# 1 = replicacao.py (todas as abas por destino em 2 chamadas); 0 = um script replicar_* por aba
+REPLICA_CONSOLIDADA = os.environ.get("REPLICA_CONSOLIDADA", "1") == "1"
+SCRIPT_REPLICA_CONSOLIDADA = "replicacao.py"
 SCRIPTS_REPLICA = [
     "replicar_carteira.py",
     "replicar_bd_exec.py",
@@ -286,6 +295,30 @@ def ensure_block(ws, base_dir: Path, steps: List[Tuple[str, int]], idx_offset: i
 
     return executed
 
+# =======================
+# PREFETCH DO BLOCO 2
+# =======================
+def iniciar_prefetch(base_dir: Path) -> Optional[subprocess.Popen]:
+    script = base_dir / SCRIPT_PREFETCH
+    if not PREFETCH_BLOCO2 or not script.exists():
+        return None
+    rodada = cache_local.iniciar_rodada()   # herdado pelos passos (subprocess usa os.environ)
+    print(f"📦 {fmt_now()}  Prefetch do BLOCO 2 em segundo plano (rodada {rodada})", flush=True)
+    try:
+        return subprocess.Popen([sys.executable, "-u", str(script)], cwd=str(base_dir))
+    except Exception as e:
+        print(f"⚠️  Prefetch não iniciado ({e}); o BLOCO 2 lê das fontes.", flush=True)
+        return None
+
+def encerrar_prefetch(proc: Optional[subprocess.Popen]):
+    if proc is not None and proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    cache_local.encerrar_rodada()
+
 # =======================
 # EXECUÇÃO DAS RÉPLICAS
 # =======================
@@ -325,9 +358,14 @@ def run_script_with_retries(script_path: Path, idx: int, total: int) -> int:
     return rc
 
 def run_replicas(base_dir: Path) -> bool:
-    banner("RÉPLICAS: execução sequencial dos scripts replicar_*")
+    if REPLICA_CONSOLIDADA:
+        banner("RÉPLICAS: replicacao.py (todas as abas, uma transação por destino)")
+        scripts = [SCRIPT_REPLICA_CONSOLIDADA]
+    else:
+        banner("RÉPLICAS: execução sequencial dos scripts replicar_*")
+        scripts = SCRIPTS_REPLICA
 
-    missing = [s for s in SCRIPTS_REPLICA if not (base_dir / s).exists()]
+    missing = [s for s in scripts if not (base_dir / s).exists()]
     if missing and not SKIP_MISSING:
         print("Arquivos de réplica não encontrados:")
         for m in missing:
@@ -339,7 +377,7 @@ def run_replicas(base_dir: Path) -> bool:
         for m in missing:
             print(f" - {m}")
 
-    run_list = [s for s in SCRIPTS_REPLICA if (base_dir / s).exists()] if SKIP_MISSING else SCRIPTS_REPLICA
+    run_list = [s for s in scripts if (base_dir / s).exists()] if SKIP_MISSING else scripts
     total = len(run_list)
 
     failures = []
@@ -373,6 +411,13 @@ def main():
     banner("PIPELINE – Atualização com controle de status na aba BD_Config")
     overall_start = time.perf_counter()
 
+    prefetch = iniciar_prefetch(base_dir)
+    try:
+        _executar(ws, base_dir, overall_start)
+    finally:
+        encerrar_prefetch(prefetch)
+
+def _executar(ws, base_dir: Path, overall_start: float):
     # BLOCO 1
     banner("BLOCO 1: ciclo → lv → med_parcial → operacao")
     _ = ensure_block(ws, base_dir, BLOCK1, idx_offset=0)
@@ -8,10 +8,14 @@ from datetime import datetime
 from pathlib import Path
 from google.oauth2.service_account import Credentials as SACreds
 from gspread.exceptions import APIError
+from gspread.utils import a1_to_rowcol, extract_id_from_url
+
+import cache_local
+from escrita_planejada import CARIMBO_PREVIO, carimbo_gspread, escrever_em_lotes
+from formatos import NUMERO, aplicar_formatos
 
 # ================== FLAGS / TUNING ==================
 FORCAR_FORMATACAO = os.environ.get("FORCAR_FORMATACAO", "0") == "1"  # aplica formato na coluna B
-CHUNK_ROWS        = int(os.environ.get("CHUNK_ROWS", "5000"))        # linhas por bloco no upload
 MAX_RETRIES       = 6
 BASE_SLEEP        = 1.0
 TRANSIENT_CODES   = {429, 500, 502, 503, 504}
@@ -118,21 +122,15 @@ def safe_update(ws, a1, values):
     with_retry(ws.update, range_name=a1, values=values, value_input_option='USER_ENTERED',
                desc=f"update {a1}")
 
-def chunked_update(ws, start_row, start_col_letter, end_col_letter, values):
-    n = len(values)
-    if n == 0:
-        return
-    i, bloco = 0, 0
-    t0 = time.time()
-    while i < n:
-        parte = values[i:i+CHUNK_ROWS]
-        a1 = f"{start_col_letter}{start_row + i}:{end_col_letter}{start_row + i + len(parte) - 1}"
-        bloco += 1
-        log(f"🚚 Bloco {bloco}: {a1} ({len(parte)} linhas)")
-        safe_update(ws, a1, parte)
-        i += len(parte)
-        time.sleep(0.2)  # micro pausa para evitar rajadas
-    log(f"✅ Upload concluído em {time.time() - t0:.1f}s ({n} linhas)")
+def chunked_update(ws, start_row, start_col_letter, end_col_letter, values, ultimo=None):
+    """Escrita em lotes dimensionados por bytes/células (ver escrita_planejada). -> nº de requisições."""
+    col_ini = a1_to_rowcol(f"{start_col_letter}1")[1]
+    col_fim = a1_to_rowcol(f"{end_col_letter}1")[1]
+    return escrever_em_lotes(
+        lambda rng, parte: ws.update(range_name=rng, values=parte, value_input_option="USER_ENTERED"),
+        values, linha_ini=start_row, col_ini=col_ini, largura=col_fim - col_ini + 1,
+        ultimo=ultimo, desc=f"update {start_col_letter}:{end_col_letter}",
+    )
 
 def parse_valor(s):
     """Converte strings tipo 'R$ 1.234,56' em float 1234.56; vazio se não parseável."""
@@ -166,10 +164,13 @@ def main():
     creds = make_creds()
     gc = gspread.authorize(creds)
 
-    # ---- Abrir origem/destino
-    log("📂 Abrindo origem por URL…")
-    planilha_origem = with_retry(gc.open_by_url, URL_ORIGEM, desc="open_by_url origem")
-    aba_origem      = with_retry(planilha_origem.worksheet, NOME_ABA_ORIGEM, desc="worksheet origem")
+    # ---- Abrir origem/destino (origem já lida pelo prefetch.py dispensa abrir)
+    dados = cache_local.ler(cache_local.chave_valores(extract_id_from_url(URL_ORIGEM),
+                                                      f"{NOME_ABA_ORIGEM}!{INTERVALO_ORIGEM}"))
+    if dados is None:
+        log("📂 Abrindo origem por URL…")
+        planilha_origem = with_retry(gc.open_by_url, URL_ORIGEM, desc="open_by_url origem")
+        aba_origem      = with_retry(planilha_origem.worksheet, NOME_ABA_ORIGEM, desc="worksheet origem")
 
     log("📂 Abrindo destino por ID…")
     planilha_destino = with_retry(gc.open_by_key, ID_PLANILHA_DESTINO, desc="open_by_key destino")
@@ -184,11 +185,15 @@ def main():
     ensure_size(aba_destino, min_rows=2, min_cols=5)
 
     # ---- Status inicial
-    safe_update(aba_destino, "E2", [["Atualizando"]])
+    if CARIMBO_PREVIO:
+        safe_update(aba_destino, "E2", [["Atualizando"]])
 
     # ---- Leitura
-    log(f"📥 Lendo origem: {NOME_ABA_ORIGEM}!{INTERVALO_ORIGEM} …")
-    dados = with_retry(aba_origem.get, INTERVALO_ORIGEM, desc="get origem")
+    if dados is None:
+        log(f"📥 Lendo origem: {NOME_ABA_ORIGEM}!{INTERVALO_ORIGEM} …")
+        dados = with_retry(aba_origem.get, INTERVALO_ORIGEM, desc="get origem")
+    else:
+        log(f"📦 Origem {NOME_ABA_ORIGEM}!{INTERVALO_ORIGEM} do cache da rodada (prefetch)")
     log(f"🔎 Linhas lidas: {len(dados)}")
 
     # ---- Tratamento/filtragem
@@ -204,48 +209,27 @@ def main():
 
     log(f"✅ Linhas válidas para envio: {len(dados_filtrados)}")
 
-    # ---- Limpeza (todas as linhas de A2:B) e cabeçalhos
+    # ---- Limpeza (todas as linhas de A2:B)
     safe_clear(aba_destino, "A2:B")  # limpa TODAS as linhas de A..B a partir da linha 2
-    safe_update(aba_destino, "A1:B1", [["Código", "Valor"]])
 
-    # ---- Upload em blocos
-    if dados_filtrados:
-        chunked_update(aba_destino, start_row=2, start_col_letter="A", end_col_letter="B", values=dados_filtrados)
-    else:
-        log("⛔ Nada para escrever.")
+    # ---- Upload em blocos: cabeçalho A1:B1 no primeiro bloco, status final E2 no último
+    if not dados_filtrados:
+        log("⛔ Nada para escrever (só cabeçalho).")
+    chunked_update(aba_destino, start_row=1, start_col_letter="A", end_col_letter="B",
+                   values=[["Código", "Valor"]] + dados_filtrados,
+                   ultimo=carimbo_gspread(aba_destino, "E2", lambda: f"Atualizado em: {now()}"))
 
     # ---- Formatação opcional (coluna B como número)
     if FORCAR_FORMATACAO and len(dados_filtrados) > 0:
         try:
             log("🎨 Aplicando formatação opcional em B (número)…")
-            sheet_id = aba_destino._properties['sheetId']
-            end_row_idx = 1 + len(dados_filtrados)  # dados começam na linha 2 (idx 1)
-
-            reqs = {
-                "requests": [
-                    {"repeatCell": {
-                        "range": {
-                            "sheetId": sheet_id,
-                            "startRowIndex": 1,
-                            "endRowIndex": end_row_idx,
-                            "startColumnIndex": 1,   # B = 1 (0-based)
-                            "endColumnIndex": 2
-                        },
-                        "cell": {"userEnteredFormat": {"numberFormat": {"type": "NUMBER", "pattern": "#,##0.00"}}},
-                        "fields": "userEnteredFormat.numberFormat"
-                    }}
-                ]
-            }
-            with_retry(aba_destino.spreadsheet.batch_update, reqs, desc="batch_update formato B")
-            log("✅ Formatação aplicada.")
+            # só o delta desde a última execução (ver formatos.py)
+            aplicar_formatos(aba_destino, {1: NUMERO}, 1, 1 + len(dados_filtrados), desc="formato B")
         except APIError as e:
             log(f"⚠️  Falha na formatação opcional (seguindo): {e}")
     else:
         log("⏭️ Formatação opcional desativada ou sem dados.")
 
-    # ---- Status final
-    safe_update(aba_destino, "E2", [[f"Atualizado em: {now()}"]])
-
     log("🏁 FINALIZADO.")
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+# cache_local.py — snapshot em disco das fontes lidas pelos passos da esteira
+#
+# Os passos rodam como subprocessos do orquestrador, então o cache é em disco: um
+# diretório por rodada (ESTEIRA_CACHE_RODADA, definido pelo orquestrador e herdado pelos
+# filhos). Fora de uma rodada (script rodado à mão) nada é lido nem gravado — sem risco de
+# usar uma foto velha. Quem produz grava o próprio PID na rodada e marca a chave como
+# pendente antes de começar; quem consome só espera a pendência enquanto o produtor está
+# vivo e até um prazo único por processo (CACHE_ESPERA_S no total, não por chave) e, se não
+# houver valor, lê da fonte como sempre. Ver prefetch.py.
+
+import os
+import time
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+CACHE_DIR      = Path(os.environ.get("ESTEIRA_CACHE_DIR", Path(tempfile.gettempdir()) / "esteira_cache"))
+CACHE_ESPERA_S = float(os.environ.get("CACHE_ESPERA_S", "300"))   # espera total por um prefetch ainda em voo
+
+_PRAZO: Optional[float] = None   # fim da espera deste processo (começa na 1ª chave pendente)
+
+
+def rodada() -> Optional[str]:
+    return os.environ.get("ESTEIRA_CACHE_RODADA") or None
+
+
+def _dir() -> Optional[Path]:
+    r = rodada()
+    return CACHE_DIR / r if r else None
+
+
+def _caminho(chave: str, ext: str = ".pkl") -> Optional[Path]:
+    d = _dir()
+    if d is None:
+        return None
+    return d / ("".join(c if c.isalnum() or c in "-_." else "_" for c in chave) + ext)
+
+
+def chave_valores(spreadsheet_id: str, faixa: str) -> str:
+    """Chave de uma leitura values.get — produtor e consumidor chegam nela pelos próprios IDs."""
+    return f"valores.{spreadsheet_id}.{faixa}"
+
+
+def chave_drive(pasta_id: str, nome: str) -> str:
+    return f"drive.{pasta_id}.{nome}"
+
+
+# ========= PRODUTOR =========
+def registrar_produtor():
+    """Grava o PID do produtor na rodada: pendência de produtor morto não segura ninguém."""
+    p = _caminho("produtor", ".pid")
+    if p is not None:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(str(os.getpid()))
+
+
+def encerrar_produtor():
+    p = _caminho("produtor", ".pid")
+    if p is not None:
+        p.unlink(missing_ok=True)
+
+
+def marcar_pendente(chave: str):
+    p = _caminho(chave, ".pendente")
+    if p is not None:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.touch()
+
+
+def gravar(chave: str, valor: Any):
+    """Grava atômico (tmp + replace) e encerra a pendência."""
+    p = _caminho(chave)
+    if p is None:
+        return
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, p)
+    desistir(chave)
+
+
+def desistir(chave: str):
+    """Encerra a pendência sem valor (o consumidor volta a ler da fonte)."""
+    p = _caminho(chave, ".pendente")
+    if p is not None:
+        p.unlink(missing_ok=True)
+
+
+# ========= CONSUMIDOR =========
+def _produtor_vivo() -> bool:
+    try:
+        pid = int(_caminho("produtor", ".pid").read_text())
+    except (OSError, ValueError):
+        return False
+    if os.name == "nt":   # os.kill(pid, 0) encerraria o processo no Windows: fica só o prazo
+        return True
+    try:
+        with open(f"/proc/{pid}/stat") as f:   # zumbi (filho ainda não recolhido) conta como morto
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except (OSError, IndexError):
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def ler(chave: str, padrao: Any = None, espera: float = CACHE_ESPERA_S) -> Any:
+    """Valor da rodada atual (esperando um prefetch pendente e vivo) ou `padrao`."""
+    global _PRAZO
+    p = _caminho(chave)
+    if p is None:
+        return padrao
+    pendente = _caminho(chave, ".pendente")
+    if pendente.exists() and _produtor_vivo():
+        if _PRAZO is None:
+            _PRAZO = time.monotonic() + espera
+        while pendente.exists() and time.monotonic() < _PRAZO and _produtor_vivo():
+            time.sleep(0.5)
+    try:
+        with open(p, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return padrao
+
+
+# ========= RODADA =========
+def iniciar_rodada() -> str:
+    """Define ESTEIRA_CACHE_RODADA (herdado pelos subprocessos) com um diretório novo."""
+    r = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    os.environ["ESTEIRA_CACHE_RODADA"] = r
+    (CACHE_DIR / r).mkdir(parents=True, exist_ok=True)
+    return r
+
+
+def encerrar_rodada():
+    d = _dir()
+    if d is not None:
+        shutil.rmtree(d, ignore_errors=True)
@@ -11,10 +11,15 @@ from typing import Optional, List
 
 from google.oauth2.service_account import Credentials as SACreds
 from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_to_rowcol
+
+import cache_local
+from escrita_planejada import CARIMBO_PREVIO, carimbo_gspread, escrever_em_lotes
+from formatos import DATA, aplicar_formatos
 
 # ========= FLAGS =========
 FORCAR_FORMATACAO = os.environ.get("FORCAR_FORMATACAO", "0") == "1"
-CHUNK_ROWS        = int(os.environ.get("CHUNK_ROWS", "3000"))
+SHEETS_ASYNC      = os.environ.get("SHEETS_ASYNC", "0") == "1"   # lê as ORIGENS em paralelo (sheets_async)
 MAX_RETRIES       = 6
 BASE_SLEEP        = 1.0
 TRANSIENT_CODES   = {429, 500, 502, 503, 504}
@@ -92,19 +97,15 @@ def safe_update(ws, a1, values):
     log(f"✍️  Update {a1} ({len(values)} linhas)")
     with_retry(ws.update, range_name=a1, values=values, value_input_option="USER_ENTERED", desc=f"update {a1}")
 
-def chunked_update(ws, start_row, start_col_letter, end_col_letter, values):
-    n = len(values)
-    if n == 0:
-        return
-    i, bloco = 0, 0
-    while i < n:
-        parte = values[i:i+CHUNK_ROWS]
-        a1 = f"{start_col_letter}{start_row + i}:{end_col_letter}{start_row + i + len(parte) - 1}"
-        bloco += 1
-        log(f"🚚 Bloco {bloco}: {a1} ({len(parte)} linhas)")
-        safe_update(ws, a1, parte)
-        i += len(parte)
-        time.sleep(0.12)  # alivia write/min
+def chunked_update(ws, start_row, start_col_letter, end_col_letter, values, ultimo=None):
+    """Escrita em lotes dimensionados por bytes/células (ver escrita_planejada). -> nº de requisições."""
+    col_ini = a1_to_rowcol(f"{start_col_letter}1")[1]
+    col_fim = a1_to_rowcol(f"{end_col_letter}1")[1]
+    return escrever_em_lotes(
+        lambda rng, parte: ws.update(range_name=rng, values=parte, value_input_option="USER_ENTERED"),
+        values, linha_ini=start_row, col_ini=col_ini, largura=col_fim - col_ini + 1,
+        ultimo=ultimo, desc=f"update {start_col_letter}:{end_col_letter}",
+    )
 
 def _excel_serial_to_date_str(val):
     """Converte números seriais do Excel em 'dd/mm/yyyy' (base 1899-12-30)."""
@@ -174,16 +175,16 @@ except WorksheetNotFound:
 
 ensure_size(ws_dst, min_rows=2, min_cols=11)  # até K
 
-# Status
-safe_update(ws_dst, "E1", [["Atualizando"]])
-
-# Cabeçalhos (uma vez só)
+# Status + cabeçalhos numa única values.batchUpdate
 headers_FI = [["UNIDADE", "FIM PREVISTO", "STATUS EXECUCAO", "PROJETO"]]
 header_J   = [["AL"]]           # nova coluna J
 header_K   = [["DATA BI"]]
-safe_update(ws_dst, "F1:I1", headers_FI)
-safe_update(ws_dst, "J1",   header_J)
-safe_update(ws_dst, "K1",   header_K)
+iniciais = [{"range": "F1:I1", "values": headers_FI}, {"range": "J1", "values": header_J},
+            {"range": "K1", "values": header_K}]
+if CARIMBO_PREVIO:
+    iniciais.insert(0, {"range": "E1", "values": [["Atualizando"]]})
+log("✍️  Status + cabeçalhos F1:K1")
+with_retry(ws_dst.batch_update, iniciais, value_input_option="USER_ENTERED", desc="status + cabeçalhos")
 
 # ========= COLETA DE DADOS =========
 todos_FI: List[List[str]] = []  # F..I (4 colunas)
@@ -196,12 +197,46 @@ def values_get(spreadsheet, a1_range: str):
     resp = with_retry(spreadsheet.values_get, a1_range, desc=f"values_get {a1_range}")
     return resp.get("values", []) or []
 
+FAIXA_ORIGEM = "Carteira_Planejador!A6:BI"
+
+def ler_origens_async(origens: List[str]) -> dict:
+    # Todas as origens ao mesmo tempo (1 values.get cada, sem open_by_key); ritmo do GOVERNADOR.
+    # Falha de uma origem vira a exceção no lugar dos dados (tratada no laço abaixo).
+    import asyncio
+    from sheets_async import ClienteAsync, rodar
+
+    async def todas():
+        async with ClienteAsync(creds) as cli:
+            return await asyncio.gather(
+                *(cli.values_get(o, FAIXA_ORIGEM, desc=f"values_get origem {o}") for o in origens),
+                return_exceptions=True)
+
+    log(f"📥 Lendo {len(origens)} origens em paralelo (async)…")
+    return dict(zip(origens, rodar(todas())))
+
+# lidas antecipadamente pelo prefetch.py (rodada do orquestrador); o resto vem da fonte
+lidos = {}
+for origem_id in ORIGENS:
+    v = cache_local.ler(cache_local.chave_valores(origem_id, FAIXA_ORIGEM))
+    if v is not None:
+        lidos[origem_id] = v
+if lidos:
+    log(f"📦 {len(lidos)}/{len(ORIGENS)} origens do cache da rodada (prefetch)")
+faltam = [o for o in ORIGENS if o not in lidos]
+if SHEETS_ASYNC and faltam:
+    lidos.update(ler_origens_async(faltam))
+
 for idx, origem_id in enumerate(ORIGENS, 1):
     try:
         log(f"📥 [{idx}/{len(ORIGENS)}] Lendo origem {origem_id} :: 'Carteira_Planejador'…")
-        book_src = with_retry(gc.open_by_key, origem_id, desc=f"open_by_key origem {idx}")
-        # **Leitura via Values API** — mais estável que ws.get
-        dados = values_get(book_src, "Carteira_Planejador!A6:BI")
+        if origem_id in lidos:
+            dados = lidos[origem_id]
+            if isinstance(dados, Exception):
+                raise dados
+        else:
+            book_src = with_retry(gc.open_by_key, origem_id, desc=f"open_by_key origem {idx}")
+            # **Leitura via Values API** — mais estável que ws.get
+            dados = values_get(book_src, FAIXA_ORIGEM)
         log(f"   ↳ Linhas lidas: {len(dados)}")
 
         # M(13)->12, O(15)->14, P(16)->15, Q(17)->16, AL(38)->37, BI(61)->60
@@ -236,10 +271,15 @@ faixas_limpeza = [
 safe_clear(ws_dst, faixas_limpeza)
 
 # ========= UPLOAD (EM BLOCOS) =========
+carimbado = False
 if todos_FI:
     chunked_update(ws_dst, start_row=2, start_col_letter="F", end_col_letter="I", values=todos_FI)
     chunked_update(ws_dst, start_row=2, start_col_letter="J", end_col_letter="J", values=todas_J)
-    chunked_update(ws_dst, start_row=2, start_col_letter="K", end_col_letter="K", values=todas_K)
+    # timestamp final E1 vai junto do último bloco de K
+    carimbado = chunked_update(
+        ws_dst, start_row=2, start_col_letter="K", end_col_letter="K", values=todas_K,
+        ultimo=carimbo_gspread(ws_dst, "E1", lambda: f"Atualizado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"),
+    ) > 0
 else:
     log("⛔ Nada para escrever.")
 
@@ -247,34 +287,16 @@ else:
 if FORCAR_FORMATACAO and len(todos_FI) > 0:
     try:
         log("🎨 Formatação opcional em G e K…")
-        sheet_id = ws_dst._properties['sheetId']
-        end_row_idx = 1 + len(todos_FI)  # dados começam na linha 2
-
-        reqs = {
-            "requests": [
-                {"repeatCell": {
-                    "range": {"sheetId": sheet_id, "startRowIndex": 1, "endRowIndex": end_row_idx,
-                              "startColumnIndex": 6, "endColumnIndex": 7},  # G
-                    "cell": {"userEnteredFormat": {"numberFormat": {"type": "DATE", "pattern": "dd/MM/yyyy"}}},
-                    "fields": "userEnteredFormat.numberFormat"
-                }},
-                {"repeatCell": {
-                    "range": {"sheetId": sheet_id, "startRowIndex": 1, "endRowIndex": end_row_idx,
-                              "startColumnIndex": 10, "endColumnIndex": 11},  # K
-                    "cell": {"userEnteredFormat": {"numberFormat": {"type": "DATE", "pattern": "dd/MM/yyyy"}}},
-                    "fields": "userEnteredFormat.numberFormat"
-                }},
-            ]
-        }
-        with_retry(ws_dst.spreadsheet.batch_update, reqs, desc="batch_update formatação")
-        log("✅ Formatação aplicada.")
+        # G e K data; só o delta desde a última execução (ver formatos.py)
+        aplicar_formatos(ws_dst, {6: DATA, 10: DATA}, 1, 1 + len(todos_FI), desc="formato G/K")
     except APIError as e:
         log(f"⚠️  Falha na formatação opcional (seguindo): {e}")
 else:
     log("⏭️ Formatação opcional desativada.")
 
-# ========= TIMESTAMP =========
-agora = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
-safe_update(ws_dst, "E1", [[f"Atualizado em: {agora}"]])
+# ========= TIMESTAMP (só se não foi junto dos dados) =========
+if not carimbado:
+    agora = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+    safe_update(ws_dst, "E1", [[f"Atualizado em: {agora}"]])
 
 log(f"🏁 FINALIZADO. Linhas processadas: {total_linhas} | tempo total {time.time() - t0_ini:.1f}s")
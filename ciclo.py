@@ -7,6 +7,10 @@ import gspread
 from gspread.exceptions import APIError
 from google.oauth2.service_account import Credentials as SACreds
 
+from escrita_planejada import CARIMBO_PREVIO, carimbo_gspread, escrever_em_lotes
+from leitura_janelada import ler_em_janelas
+from formatos import aplicar_formatos, requisicao_descarte
+
 __VERSION__ = "ciclo.py corrigido K/L/P numeros + G/M/O datas"
 print(f">>> {__VERSION__} — caminho: {__file__}", flush=True)
 
@@ -167,7 +171,8 @@ try:
 except Exception:
     pass
 
-dados = gs_retry(w_src.get, INTERVALO_ORIGEM, desc=f"get {ABA_ORIGEM}!{INTERVALO_ORIGEM}")
+# A (ID da obra) sonda a última linha usada: as janelas não varrem o vazio da grade
+dados = ler_em_janelas(w_src, INTERVALO_ORIGEM, sonda_col='A', desc=f"get {ABA_ORIGEM}!{INTERVALO_ORIGEM}")
 
 if not dados:
     total = w_dst.row_count or 2
@@ -214,18 +219,11 @@ for r in linhas:
         if idx < len(r):
             r[idx] = normalizar_data(r[idx])
 
-gs_retry(w_dst.update, range_name='Z1', values=[['Atualizando']], desc="status Z1")
-
-dest_first = f"{DEST_START_LET}1"
-
-gs_retry(
-    b_dst.values_update,
-    f"{ABA_DESTINO}!{dest_first}",
-    params={'valueInputOption': 'USER_ENTERED'},
-    body={'values': [hdr] + linhas},
-    desc="values_update COLAGEM"
-)
+if CARIMBO_PREVIO:
+    gs_retry(w_dst.update, range_name='Z1', values=[['Atualizando']], desc="status Z1")
 
+# rabo e right-size ANTES da colagem (faixas disjuntas dos dados novos): assim o
+# carimbo Z1 pode ir junto do último bloco e continua sendo a última escrita
 lin_fim = len(linhas) + 1
 total = w_dst.row_count or (lin_fim + 5000)
 
@@ -236,157 +234,40 @@ if total > lin_fim + 1:
 # right-size: encolhe linhas se a grade inchou (mantém colunas p/ carimbo Z1)
 alvo_rows = max(lin_fim + 200, 2)
 if w_dst.row_count > alvo_rows:
-    gs_retry(w_dst.resize, rows=alvo_rows, cols=w_dst.col_count, desc="rightsize linhas")
+    # as linhas apagadas levam a formatação junto: o estado de formatos.py é recortado na mesma chamada
+    reqs = [{"updateSheetProperties": {
+        "properties": {"sheetId": w_dst.id, "gridProperties": {"rowCount": alvo_rows}},
+        "fields": "gridProperties.rowCount",
+    }}]
+    descarte = requisicao_descarte(w_dst, alvo_rows)
+    if descarte:
+        reqs.append(descarte)
+    gs_retry(b_dst.batch_update, {"requests": reqs}, desc="rightsize linhas")
+    w_dst._properties.setdefault("gridProperties", {})["rowCount"] = alvo_rows
+
+escrever_em_lotes(
+    lambda rng, parte: b_dst.values_update(rng, params={'valueInputOption': 'USER_ENTERED'}, body={'values': parte}),
+    [hdr] + linhas,
+    linha_ini=1,
+    col_ini=DEST_START_NUM,
+    largura=SRC_WIDTH,
+    aba=ABA_DESTINO,
+    ultimo=carimbo_gspread(w_dst, 'Z1', lambda: f'Atualizado em {agora_str()}'),
+    desc="values_update COLAGEM"
+)
 
 if FORCAR_FORMATACAO:
     try:
         n = len(linhas)
 
         if n > 0:
-            sid = w_dst._properties['sheetId']
-            end = n + 1
-
-            reqs = {
-                "requests": [
-                    # K número
-                    {
-                        "repeatCell": {
-                            "range": {
-                                "sheetId": sid,
-                                "startRowIndex": 1,
-                                "endRowIndex": end,
-                                "startColumnIndex": 10,
-                                "endColumnIndex": 11
-                            },
-                            "cell": {
-                                "userEnteredFormat": {
-                                    "numberFormat": {
-                                        "type": "NUMBER",
-                                        "pattern": "#,##0.00"
-                                    }
-                                }
-                            },
-                            "fields": "userEnteredFormat.numberFormat"
-                        }
-                    },
-                    # L número
-                    {
-                        "repeatCell": {
-                            "range": {
-                                "sheetId": sid,
-                                "startRowIndex": 1,
-                                "endRowIndex": end,
-                                "startColumnIndex": 11,
-                                "endColumnIndex": 12
-                            },
-                            "cell": {
-                                "userEnteredFormat": {
-                                    "numberFormat": {
-                                        "type": "NUMBER",
-                                        "pattern": "#,##0.00"
-                                    }
-                                }
-                            },
-                            "fields": "userEnteredFormat.numberFormat"
-                        }
-                    },
-                    # P número
-                    {
-                        "repeatCell": {
-                            "range": {
-                                "sheetId": sid,
-                                "startRowIndex": 1,
-                                "endRowIndex": end,
-                                "startColumnIndex": 15,
-                                "endColumnIndex": 16
-                            },
-                            "cell": {
-                                "userEnteredFormat": {
-                                    "numberFormat": {
-                                        "type": "NUMBER",
-                                        "pattern": "#,##0.00"
-                                    }
-                                }
-                            },
-                            "fields": "userEnteredFormat.numberFormat"
-                        }
-                    },
-                    # G data
-                    {
-                        "repeatCell": {
-                            "range": {
-                                "sheetId": sid,
-                                "startRowIndex": 1,
-                                "endRowIndex": end,
-                                "startColumnIndex": 6,
-                                "endColumnIndex": 7
-                            },
-                            "cell": {
-                                "userEnteredFormat": {
-                                    "numberFormat": {
-                                        "type": "DATE",
-                                        "pattern": "dd/mm/yyyy"
-                                    }
-                                }
-                            },
-                            "fields": "userEnteredFormat.numberFormat"
-                        }
-                    },
-                    # M data
-                    {
-                        "repeatCell": {
-                            "range": {
-                                "sheetId": sid,
-                                "startRowIndex": 1,
-                                "endRowIndex": end,
-                                "startColumnIndex": 12,
-                                "endColumnIndex": 13
-                            },
-                            "cell": {
-                                "userEnteredFormat": {
-                                    "numberFormat": {
-                                        "type": "DATE",
-                                        "pattern": "dd/mm/yyyy"
-                                    }
-                                }
-                            },
-                            "fields": "userEnteredFormat.numberFormat"
-                        }
-                    },
-                    # O data
-                    {
-                        "repeatCell": {
-                            "range": {
-                                "sheetId": sid,
-                                "startRowIndex": 1,
-                                "endRowIndex": end,
-                                "startColumnIndex": 14,
-                                "endColumnIndex": 15
-                            },
-                            "cell": {
-                                "userEnteredFormat": {
-                                    "numberFormat": {
-                                        "type": "DATE",
-                                        "pattern": "dd/mm/yyyy"
-                                    }
-                                }
-                            },
-                            "fields": "userEnteredFormat.numberFormat"
-                        }
-                    },
-                ]
-            }
-
-            gs_retry(w_dst.spreadsheet.batch_update, reqs, desc="format opcional")
+            # K/L/P número, G/M/O data; só o delta desde a última execução (ver formatos.py)
+            num = {"type": "NUMBER", "pattern": "#,##0.00"}
+            data = {"type": "DATE", "pattern": "dd/mm/yyyy"}
+            aplicar_formatos(w_dst, {10: num, 11: num, 15: num, 6: data, 12: data, 14: data},
+                             1, n + 1, desc="format opcional")
 
     except APIError as e:
         print(f"[AVISO] Formatação opcional falhou (segue): {e}", flush=True)
 
-gs_retry(
-    w_dst.update,
-    range_name='Z1',
-    values=[[f'Atualizado em {agora_str()}']],
-    desc="final Z1"
-)
-
 print("✅ CICLO atualizado — K/L/P números e G/M/O datas.", flush=True)
@@ -0,0 +1,94 @@
+# conversoes.py — conversões de célula das réplicas e o plano de conversão por coluna
+#
+# Os replicar_* tinham cada um sua limpar_num/normaliza_data (quase iguais) aplicadas
+# célula a célula com ifs por índice. Aqui as conversões são únicas e compilar_conversao()
+# monta, uma vez por aba, a lista (coluna, função) só das colunas que mudam algo;
+# converter() percorre as linhas aplicando só essas.
+
+import re
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Tuple
+
+_RE_NAO_NUM  = re.compile(r"[^0-9,.\-+eE]")
+_RE_NAO_DATA = re.compile(r"[^0-9/\-: ]")
+_RE_DDMMAAAA = re.compile(r"^\d{2}/\d{2}/\d{4}$")
+_FORMATOS_DATA = ("%d/%m/%Y", "%d/%m/%y", "%Y-%m-%d", "%d-%m-%Y")
+
+
+# ========= CONVERSÕES =========
+def texto(v):
+    """Remove o apóstrofo inicial (texto forçado no Sheets)."""
+    if v is None:
+        return ""
+    return v[1:] if isinstance(v, str) and v.startswith("'") else v
+
+
+def num_br(v):
+    """'R$ 1.234,56' -> 1234.56; vazio/inválido -> ''."""
+    if v is None:
+        return ""
+    s = str(v).strip()
+    if not s:
+        return ""
+    s = _RE_NAO_NUM.sub("", s.replace("R$", ""))
+    if "," in s and "." in s:
+        s = s.replace(".", "").replace(",", ".")
+    elif "," in s:
+        s = s.replace(",", ".")
+    try:
+        return float(s)
+    except Exception:
+        return ""
+
+
+def data_br(v):
+    """dd/mm/aaaa, dd/mm/aa, aaaa-mm-dd, dd-mm-aaaa -> 'dd/mm/aaaa' (USER_ENTERED interpreta); senão o texto original."""
+    if v is None:
+        return ""
+    orig = str(v).strip()
+    s = orig.replace("’", "").replace("‘", "").replace("'", "")
+    if not s:
+        return ""
+    s = _RE_NAO_DATA.sub("", s)
+    for fmt in _FORMATOS_DATA:
+        try:
+            return datetime.strptime(s.split(" ")[0], fmt).strftime("%d/%m/%Y")
+        except Exception:
+            continue
+    return texto(orig)
+
+
+def data_ou_num(v):
+    """Data dd/mm/aaaa quando reconhece; senão número limpo (BD_EXEC B / G)."""
+    d = data_br(v)
+    return d if d and _RE_DDMMAAAA.match(d) else num_br(v)
+
+
+# ========= PLANO =========
+def compilar_conversao(largura: int, num: Iterable[int] = (), data: Iterable[int] = (),
+                       data_num: Iterable[int] = (), cru: bool = False) -> List[Tuple[int, Callable]]:
+    """[(coluna, função)] das colunas que mudam; cru=True não mexe nas demais (nem no apóstrofo)."""
+    plano: List[Optional[Callable]] = [None if cru else texto] * largura
+    for cols, fn in ((num, num_br), (data, data_br), (data_num, data_ou_num)):
+        for i in cols:
+            if i < largura:
+                plano[i] = fn
+    return [(i, fn) for i, fn in enumerate(plano) if fn is not None]
+
+
+def converter(linhas: List[List], largura: int, plano: List[Tuple[int, Callable]],
+              cabecalho: int = 0, pular_vazias: bool = True) -> List[List]:
+    """
+    Ajusta cada linha para `largura` colunas e aplica o plano. As `cabecalho` primeiras
+    linhas só são ajustadas; com pular_vazias, linhas sem nenhum valor são descartadas.
+    """
+    out = [(list(r[:largura]) + [""] * (largura - len(r))) for r in linhas[:cabecalho]]
+    for r in linhas[cabecalho:]:
+        r = [("" if c is None else c) for c in r[:largura]]
+        if pular_vazias and not any(str(c).strip() for c in r):
+            continue
+        r += [""] * (largura - len(r))
+        for i, fn in plano:
+            r[i] = fn(r[i])
+        out.append(r)
+    return out
@@ -0,0 +1,130 @@
+# cota_sheets.py — governador de cota compartilhado + retry genérico (gspread / googleapiclient / requests)
+#
+# Todas as chamadas concorrentes (leituras em janelas, escritas paralelas, réplicas)
+# passam por GOVERNADOR: limita req/min por tipo (leitura/escrita), limita chamadas
+# simultâneas e, ao receber 429, pausa todo mundo em vez de cada thread insistir sozinha.
+
+import os
+import re
+import time
+import random
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+# ========= TUNING =========
+COTA_LEITURAS_MIN = int(os.environ.get("COTA_LEITURAS_MIN", "240"))  # req/min de leitura (limite Google: 300/projeto)
+COTA_ESCRITAS_MIN = int(os.environ.get("COTA_ESCRITAS_MIN", "240"))  # req/min de escrita
+COTA_CONCORRENCIA = int(os.environ.get("COTA_CONCORRENCIA", "4"))    # chamadas simultâneas no processo
+COTA_RAJADA       = int(os.environ.get("COTA_RAJADA", "8"))          # requisições liberadas de uma vez
+COTA_CONCORRENCIA_ASYNC = int(os.environ.get("COTA_CONCORRENCIA_ASYNC", "0"))  # em voo no sheets_async; 0 = 8 × COTA_CONCORRENCIA
+
+TRANSIENT_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES     = 6
+BASE_SLEEP      = 1.0
+
+
+# ========= LOG =========
+def log(msg):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+# ========= ERROS =========
+def codigo_http(e: Exception) -> Optional[int]:
+    """Extrai o status HTTP de APIError (gspread), HttpError (googleapiclient) ou do texto '[503]'."""
+    code = getattr(getattr(e, "response", None), "status_code", None)
+    if code is None:
+        code = getattr(getattr(e, "resp", None), "status", None)
+    if code is None:
+        m = re.search(r"\[(\d{3})\]", str(e))
+        code = m.group(1) if m else None
+    try:
+        return int(code) if code is not None else None
+    except Exception:
+        return None
+
+
+def eh_transitorio(e: Exception) -> bool:
+    if codigo_http(e) in TRANSIENT_CODES:
+        return True
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    nome = type(e).__name__
+    if nome in ("ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout", "ChunkedEncodingError",
+                "RemoteDisconnected", "ProtocolError", "ReadError", "ConnectError", "PoolTimeout"):
+        return True
+    s = str(e)
+    return any(t in s for t in ("backendError", "Internal error", "service is currently unavailable",
+                                "rateLimitExceeded", "deadline", "Deadline", "timed out"))
+
+
+# ========= GOVERNADOR =========
+class GovernadorCota:
+    """
+    Limitador por tipo ('leitura' / 'escrita') no estilo GCRA (token bucket sem thread):
+    cada reserva empurra o "próximo horário livre" em 1/taxa; até COTA_RAJADA chamadas
+    passam sem espera. Um semáforo limita as chamadas em voo no processo; concorrencia_async
+    é o limite equivalente para o cliente assíncrono (sheets_async), que o lê daqui.
+    """
+
+    def __init__(self, leituras_min: int, escritas_min: int, concorrencia: int, rajada: int = COTA_RAJADA,
+                 concorrencia_async: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._intervalo = {
+            "leitura": 60.0 / max(1, leituras_min),
+            "escrita": 60.0 / max(1, escritas_min),
+        }
+        self._tolerancia = {t: i * max(0, rajada - 1) for t, i in self._intervalo.items()}
+        self._tat = {t: 0.0 for t in self._intervalo}
+        self._pausa_ate = 0.0
+        self.concorrencia = max(1, concorrencia)
+        self._slots = threading.BoundedSemaphore(self.concorrencia)
+        self.concorrencia_async = max(1, concorrencia_async or 8 * self.concorrencia)
+
+    def reservar(self, tipo: str = "leitura") -> float:
+        """Reserva uma requisição e devolve quantos segundos esperar antes de enviá-la."""
+        with self._lock:
+            agora = time.monotonic()
+            tat = max(self._tat[tipo], agora)
+            espera = max(0.0, tat - self._tolerancia[tipo] - agora, self._pausa_ate - agora)
+            self._tat[tipo] = tat + self._intervalo[tipo]
+            return espera
+
+    def penalizar(self, segundos: float):
+        """Após um 429, segura todas as novas requisições do processo por `segundos`."""
+        with self._lock:
+            self._pausa_ate = max(self._pausa_ate, time.monotonic() + segundos)
+
+    @contextmanager
+    def slot(self, tipo: str = "leitura"):
+        espera = self.reservar(tipo)
+        if espera > 0:
+            time.sleep(espera)
+        with self._slots:
+            yield
+
+
+GOVERNADOR = GovernadorCota(COTA_LEITURAS_MIN, COTA_ESCRITAS_MIN, COTA_CONCORRENCIA,
+                            concorrencia_async=COTA_CONCORRENCIA_ASYNC)
+
+
+# ========= RETRY =========
+def com_retry(fn, *args, desc="", tipo="leitura", max_retries=MAX_RETRIES, base_sleep=BASE_SLEEP, **kwargs):
+    """Executa fn sob o governador; repete só erros transitórios, com backoff exponencial + jitter."""
+    tent = 0
+    while True:
+        try:
+            with GOVERNADOR.slot(tipo):
+                return fn(*args, **kwargs)
+        except Exception as e:
+            tent += 1
+            if not eh_transitorio(e) or tent >= max_retries:
+                log(f"❌ {desc or getattr(fn, '__name__', 'chamada')}: {e}")
+                raise
+            code = codigo_http(e)
+            slp = min(60.0, base_sleep * (2 ** (tent - 1)) + random.uniform(0, 0.75))
+            if code == 429:
+                GOVERNADOR.penalizar(slp)
+            log(f"⚠️  {desc or getattr(fn, '__name__', 'chamada')}: HTTP {code} — retry {tent}/{max_retries-1} em {slp:.1f}s")
+            time.sleep(slp)
@@ -0,0 +1,41 @@
+# elegibilidade_ae.py — flag da coluna AE do Historico calculada aqui em vez de ARRAYFORMULA
+#
+# A coluna AE (mestre e destinos do replicador) vinha de uma ARRAYFORMULA em AE3 que faz
+# um PROCH de cada AD em Esteira!$B$1:$K$1: "" se B vazio, 0 se AD = "-" ou não está no
+# cabeçalho da Esteira, senão 1. A aba só cresce e a fórmula é recalculada a cada escrita.
+# Com AE_ESTATICO=1 o cabeçalho da Esteira da própria planilha é lido uma vez, a flag sai
+# de um dicionário por valor distinto de AD e só as linhas escritas recebem AE (valor fixo
+# do dia da escrita). Voltar para a fórmula exige uma reescrita completa da aba
+# (HISTORICO_MODO=reparo / REPLICA_MODO=completo) para limpar os valores de AE.
+
+import os
+from typing import Iterable, List, Set
+
+AE_ESTATICO = os.environ.get("AE_ESTATICO", "0") == "1"
+
+FORMULA_AE = '=ARRAYFORMULA(SE(B3:B=""; ""; SE((AD3:AD="-") + ÉERROS(PROCH(AD3:AD; Esteira!$B$1:$K$1; 1; 0)); 0; 1)))'
+FAIXA_ESTEIRA = "Esteira!B1:K1"
+IDX_AE = 30
+
+
+def chaves_esteira(resp) -> Set[str]:
+    """Resposta do values.get de FAIXA_ESTEIRA -> chaves do PROCH (sem distinção de maiúsculas)."""
+    linha = ((resp or {}).get("values") or [[]])[0]
+    return {str(v).casefold() for v in linha if str(v) != ""}
+
+
+def coluna_ae(linhas: Iterable[List], chaves: Set[str], idx_b: int = 1, idx_ad: int = 29) -> List:
+    """Flag de cada linha (mesma regra da FORMULA_AE), um lookup por valor distinto de AD."""
+    memo = {}
+    out = []
+    for r in linhas:
+        b = r[idx_b] if len(r) > idx_b else ""
+        if b is None or str(b) == "":
+            out.append("")
+            continue
+        ad = r[idx_ad] if len(r) > idx_ad else ""
+        if ad not in memo:
+            s = "" if ad is None else str(ad)
+            memo[ad] = 0 if (s == "-" or s.casefold() not in chaves) else 1
+        out.append(memo[ad])
+    return out
@@ -0,0 +1,142 @@
+# escrita_paste.py — escrita em massa via pasteData (TSV) dentro de spreadsheets.batchUpdate
+#
+# values.update manda cada linha como array JSON ([["a", 1.5, ""], ...]): aspas, vírgulas
+# e escapes por célula, e o json.dumps do cliente pesa em dezenas de milhares de linhas.
+# Aqui cada bloco de linhas vira um texto TSV e sobe como pasteData; vários blocos (de
+# várias abas da mesma planilha) vão na mesma batchUpdate até o orçamento de bytes
+# (ORCAMENTO de escrita_planejada). O Sheets interpreta o texto como se fosse digitado,
+# ou seja, equivalente ao USER_ENTERED — por isso o codificador escreve números no
+# padrão da planilha (ESCRITA_PASTE_DECIMAL) e põe entre aspas o texto com TAB/quebra/aspas.
+# Ative com ESCRITA_PASTE=1; quem chama só fornece enviar(body) de uma batchUpdate.
+
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+from gspread.utils import a1_to_rowcol
+
+from cota_sheets import com_retry, log
+from escrita_planejada import ORCAMENTO
+
+ESCRITA_PASTE         = os.environ.get("ESCRITA_PASTE", "0") == "1"
+ESCRITA_PASTE_DECIMAL = os.environ.get("ESCRITA_PASTE_DECIMAL", ",")   # locale pt_BR do master/regionais
+
+_ESPECIAIS = ("\t", "\n", "\r", '"')
+
+
+# ========= CODIFICAÇÃO =========
+def campo_tsv(v, decimal: str = ESCRITA_PASTE_DECIMAL) -> str:
+    """Uma célula -> texto TSV: None/'' vazio, bool TRUE/FALSE, número no decimal da planilha."""
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "TRUE" if v else "FALSE"
+    if isinstance(v, int):
+        return str(v)
+    if isinstance(v, float):
+        if v != v or v in (float("inf"), float("-inf")):
+            return ""
+        s = repr(v)
+        if s.endswith(".0"):
+            s = s[:-2]
+        return s.replace(".", decimal) if decimal != "." else s
+    s = str(v)
+    if any(ch in s for ch in _ESPECIAIS):
+        return '"' + s.replace('"', '""') + '"'
+    return s
+
+
+def codificar_tsv(linhas: List[List], largura: Optional[int] = None, decimal: str = ESCRITA_PASTE_DECIMAL) -> str:
+    """Linhas -> TSV; com `largura`, completa/corta cada linha (células vazias sobrescrevem o antigo)."""
+    out = []
+    for r in linhas:
+        r = list(r[:largura]) + [""] * (largura - len(r)) if largura else r
+        out.append("\t".join(campo_tsv(v, decimal) for v in r))
+    return "\n".join(out)
+
+
+def requisicao_paste(sheet_id: int, texto: str, linha: int, col: int) -> Dict:
+    """pasteData com o canto superior esquerdo em (linha, col), 1-based."""
+    return {"pasteData": {
+        "coordinate": {"sheetId": sheet_id, "rowIndex": linha - 1, "columnIndex": col - 1},
+        "data": texto,
+        "type": "PASTE_NORMAL",
+        "delimiter": "\t",
+    }}
+
+
+def requisicao_texto(sheet_id: int, cel: str, texto: str) -> Dict:
+    """updateCells de um texto numa célula A1 (carimbo no fim da mesma batchUpdate)."""
+    r, c = a1_to_rowcol(cel)
+    return {"updateCells": {
+        "start": {"sheetId": sheet_id, "rowIndex": r - 1, "columnIndex": c - 1},
+        "rows": [{"values": [{"userEnteredValue": {"stringValue": texto}}]}],
+        "fields": "userEnteredValue",
+    }}
+
+
+# ========= PLANEJAMENTO =========
+def requisicoes_bloco(sheet_id: int, linhas: List[List], linha_ini: int = 1, col_ini: int = 1,
+                      largura: Optional[int] = None, limite_bytes: Optional[int] = None) -> List[Dict]:
+    """Quebra `linhas` em pasteData de até `limite_bytes` de TSV cada (1 linha no mínimo)."""
+    limite = limite_bytes or ORCAMENTO.limite_bytes
+    reqs, parte, tam, ini = [], [], 0, linha_ini
+    for i, r in enumerate(linhas):
+        t = codificar_tsv([r], largura)
+        if parte and tam + len(t) + 1 > limite:
+            reqs.append(requisicao_paste(sheet_id, "\n".join(parte), ini, col_ini))
+            parte, tam, ini = [], 0, linha_ini + i
+        parte.append(t)
+        tam += len(t) + 1
+    if parte:
+        reqs.append(requisicao_paste(sheet_id, "\n".join(parte), ini, col_ini))
+    return reqs
+
+
+def _tamanho(req: Dict) -> int:
+    p = req.get("pasteData")
+    return len(p["data"]) + 200 if p else 200
+
+
+def agrupar(reqs: List[Dict], limite_bytes: Optional[int] = None) -> List[List[Dict]]:
+    """Empacota requisições em batchUpdates de até `limite_bytes` (a ordem é mantida)."""
+    limite = limite_bytes or ORCAMENTO.limite_bytes
+    lotes, atual, tam = [], [], 0
+    for r in reqs:
+        t = _tamanho(r)
+        if atual and tam + t > limite:
+            lotes.append(atual)
+            atual, tam = [], 0
+        atual.append(r)
+        tam += t
+    if atual:
+        lotes.append(atual)
+    return lotes
+
+
+# ========= ENVIO =========
+def enviar_requisicoes(enviar: Callable[[Dict], object], reqs: List[Dict], desc: str = "") -> int:
+    """Envia `reqs` (estruturais + pasteData) no menor nº de batchUpdates. -> nº de chamadas."""
+    lotes = agrupar(reqs)
+    for k, lote in enumerate(lotes, start=1):
+        t0 = time.monotonic()
+        com_retry(enviar, {"requests": lote}, desc=f"{desc} pasteData {k}/{len(lotes)}", tipo="escrita")
+        dur = time.monotonic() - t0
+        ORCAMENTO.registrar_ok(dur)
+        kb = sum(_tamanho(r) for r in lote) // 1024
+        log(f"🚚 {desc} batchUpdate {k}/{len(lotes)} ({len(lote)} reqs, ~{kb} KB TSV, {dur:.1f}s)")
+    return len(lotes)
+
+
+def escrever_paste(enviar: Callable[[Dict], object], sheet_id: int, linhas: List[List],
+                   linha_ini: int = 1, col_ini: int = 1, largura: Optional[int] = None,
+                   antes: List[Dict] = (), depois: List[Dict] = (), desc: str = "") -> int:
+    """
+    Atalho de uma aba: `antes` (resize, limpeza...) + pasteData das linhas + `depois`
+    (carimbo final, ver requisicao_texto), nas mesmas batchUpdates — `depois` sai na
+    última. Mesma assinatura de posição que escrever_em_lotes. -> nº de chamadas.
+    """
+    reqs = list(antes) + requisicoes_bloco(sheet_id, linhas, linha_ini, col_ini, largura) + list(depois)
+    if not reqs:
+        return 0
+    return enviar_requisicoes(enviar, reqs, desc=desc)
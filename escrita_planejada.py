@@ -0,0 +1,257 @@
+# escrita_planejada.py — escrita em lotes com tamanho decidido por bytes/células, não por nº fixo de linhas
+#
+# Cada requisição leva o máximo de linhas que cabe no orçamento (bytes serializados
+# estimados + nº de células). O orçamento se ajusta sozinho: cresce quando as chamadas
+# voltam rápido, encolhe quando ficam lentas ou falham (5xx, deadline, payload grande).
+# Linha que sozinha estoura o orçamento é quebrada por colunas; faixas disjuntas
+# podem subir em paralelo (ESCRITA_PARALELA). Serve para gspread e
+# googleapiclient: quem chama só fornece enviar(faixa_a1, valores).
+# O carimbo final ("Atualizado em ...") vai junto do último bloco (ultimo=com_carimbo(...)),
+# numa values.batchUpdate de 2 faixas, em vez de ser uma escrita à parte.
+
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, List, Optional
+
+from gspread.utils import rowcol_to_a1
+
+from cota_sheets import GOVERNADOR, COTA_CONCORRENCIA, codigo_http, eh_transitorio, log, BASE_SLEEP
+
+# ========= TUNING =========
+ESCRITA_ALVO_BYTES  = int(os.environ.get("ESCRITA_ALVO_BYTES", "1500000"))  # bytes por requisição (inicial)
+ESCRITA_MAX_CELULAS = int(os.environ.get("ESCRITA_MAX_CELULAS", "100000"))  # células por requisição (inicial)
+ESCRITA_ALVO_SEG    = float(os.environ.get("ESCRITA_ALVO_SEG", "8"))        # latência desejada por requisição
+ESCRITA_PARALELA    = int(os.environ.get("ESCRITA_PARALELA", str(COTA_CONCORRENCIA)))  # blocos simultâneos (1 = sequencial)
+FATOR_MIN, FATOR_MAX = 1 / 32, 4.0
+MAX_TENTATIVAS       = 6
+# Status "Atualizando..." antes da carga; 0 = só o carimbo final (1 escrita a menos por aba)
+CARIMBO_PREVIO      = os.environ.get("CARIMBO_PREVIO", "1") == "1"
+
+
+# ========= ORÇAMENTO =========
+class OrcamentoEscrita:
+    """Limites de bytes/células por requisição, escalados por um fator adaptativo."""
+
+    def __init__(self, alvo_bytes: int, max_celulas: int, alvo_seg: float):
+        self.alvo_bytes = alvo_bytes
+        self.max_celulas = max_celulas
+        self.alvo_seg = alvo_seg
+        self.fator = 1.0
+        self._lock = threading.Lock()
+
+    @property
+    def limite_bytes(self) -> int:
+        return max(1, int(self.alvo_bytes * self.fator))
+
+    @property
+    def limite_celulas(self) -> int:
+        return max(1, int(self.max_celulas * self.fator))
+
+    def _ajustar(self, mult: float):
+        with self._lock:
+            self.fator = min(FATOR_MAX, max(FATOR_MIN, self.fator * mult))
+
+    def registrar_ok(self, segundos: float):
+        if segundos < self.alvo_seg / 2:
+            self._ajustar(1.25)
+        elif segundos > self.alvo_seg:
+            self._ajustar(max(0.5, self.alvo_seg / segundos))
+
+    def registrar_erro(self):
+        self._ajustar(0.5)
+
+    def linhas_que_cabem(self, pesos: List[int], larguras: List[int], i: int) -> int:
+        lim_b, lim_c = self.limite_bytes, self.limite_celulas
+        soma_b = soma_c = 0
+        k = i
+        while k < len(pesos):
+            if k > i and (soma_b + pesos[k] > lim_b or soma_c + larguras[k] > lim_c):
+                break
+            soma_b += pesos[k]
+            soma_c += larguras[k]
+            k += 1
+        return k - i
+
+
+ORCAMENTO = OrcamentoEscrita(ESCRITA_ALVO_BYTES, ESCRITA_MAX_CELULAS, ESCRITA_ALVO_SEG)
+
+
+# ========= HELPERS =========
+def bytes_linha(r) -> int:
+    """Estimativa do JSON da linha: valor + aspas/vírgula por célula + colchetes."""
+    return 2 + sum(len(str(v)) + 3 for v in r)
+
+
+def _faixa(aba: Optional[str], linha: int, col: int, n_lin: int, n_col: int) -> str:
+    a1 = f"{rowcol_to_a1(linha, col)}:{rowcol_to_a1(linha + max(1, n_lin) - 1, col + max(1, n_col) - 1)}"
+    if aba:
+        return f"'{aba.replace(chr(39), chr(39) * 2)}'!{a1}"
+    return a1
+
+
+def com_carimbo(enviar_varias: Callable[[List[dict]], object], aba: str, cel: str, texto) -> Callable:
+    """
+    enviar(faixa, valores) que grava o bloco E o carimbo `cel` numa chamada só;
+    enviar_varias(data) recebe a lista de faixas da values.batchUpdate. `texto` pode ser
+    callable (avaliado no envio, p/ o horário sair do fim da carga).
+    """
+    titulo = f"'{aba.replace(chr(39), chr(39) * 2)}'"
+
+    def enviar(rng, parte):
+        if "!" not in rng:
+            rng = f"{titulo}!{rng}"
+        valor = texto() if callable(texto) else texto
+        return enviar_varias([{"range": rng, "values": parte}, {"range": f"{titulo}!{cel}", "values": [[valor]]}])
+    return enviar
+
+
+def carimbo_gspread(ws, cel: str, texto) -> Callable:
+    """com_carimbo para uma worksheet gspread (values.batchUpdate USER_ENTERED)."""
+    return com_carimbo(
+        lambda data: ws.spreadsheet.values_batch_update({"valueInputOption": "USER_ENTERED", "data": data}),
+        ws.title, cel, texto,
+    )
+
+
+def _excede_tamanho(e: Exception) -> bool:
+    s = str(e).lower()
+    return codigo_http(e) == 413 or "too large" in s or "payload size" in s or "request entity" in s
+
+
+# ========= ESCRITA =========
+def _proximo_bloco(linhas, pesos, larguras, i, j, orcamento, linha_ini, col_ini, largura):
+    """Próximo bloco a partir da linha i (coluna relativa j) -> ((linha, col, valores, larg), i', j')."""
+    if j > 0 or pesos[i] > orcamento.limite_bytes:
+        linha = linhas[i]
+        por_celula = max(1, pesos[i] // max(1, len(linha)))
+        kc = max(1, orcamento.limite_bytes // por_celula)
+        parte = [linha[j:j + kc]]
+        fim = j + len(parte[0])
+        bloco = (linha_ini + i, col_ini + j, parte, len(parte[0]))
+        return (bloco, i, fim) if fim < len(linha) else (bloco, i + 1, 0)
+    k = orcamento.linhas_que_cabem(pesos, larguras, i)
+    bloco = (linha_ini + i, col_ini, linhas[i:i + k], largura or max(larguras[i:i + k]))
+    return bloco, i + k, 0
+
+
+def _enviar_bloco(enviar, bloco, aba, orcamento, desc, antes=None):
+    """
+    Envia um bloco com retry próprio; payload grande demais é dividido ao meio e reenviado.
+    antes: enviar sem carimbo, quando `enviar` é o do último bloco (com_carimbo) — ao dividir,
+    só o último pedaço leva o carimbo, depois dos outros.
+    """
+    linha, col, parte, larg = bloco
+    rng = _faixa(aba, linha, col, len(parte), larg)
+    tent = 0
+    while True:
+        t_req = time.monotonic()
+        try:
+            with GOVERNADOR.slot("escrita"):
+                enviar(rng, parte)
+        except Exception as e:
+            tent += 1
+            grande = _excede_tamanho(e)
+            if grande and len(parte) > 1:
+                orcamento.registrar_erro()
+                meio = len(parte) // 2
+                log(f"✂️  {desc} {rng}: payload grande demais — dividindo em 2")
+                _enviar_bloco(antes or enviar, (linha, col, parte[:meio], larg), aba, orcamento, desc)
+                _enviar_bloco(enviar, (linha + meio, col, parte[meio:], larg), aba, orcamento, desc, antes)
+                return
+            if not eh_transitorio(e) or tent >= MAX_TENTATIVAS:
+                log(f"❌ {desc} {rng}: {e}")
+                raise
+            code = codigo_http(e)
+            slp = min(60.0, BASE_SLEEP * (2 ** (tent - 1)) + random.uniform(0, 0.75))
+            if code == 429:
+                GOVERNADOR.penalizar(slp)       # cota, não tamanho: mantém o orçamento
+            else:
+                orcamento.registrar_erro()
+            log(f"⚠️  {desc} {rng}: {code or type(e).__name__} — retry {tent}/{MAX_TENTATIVAS-1} em {slp:.1f}s")
+            time.sleep(slp)
+            continue
+        dur = time.monotonic() - t_req
+        orcamento.registrar_ok(dur)
+        log(f"🚚 {desc} {rng} ({len(parte)} linhas, ~{sum(bytes_linha(r) for r in parte) // 1024} KB, {dur:.1f}s)")
+        return
+
+
+def escrever_em_lotes(enviar: Callable[[str, List[List]], object], linhas: List[List],
+                      linha_ini: int = 1, col_ini: int = 1, largura: Optional[int] = None,
+                      aba: Optional[str] = None, orcamento: OrcamentoEscrita = ORCAMENTO,
+                      paralelo: int = ESCRITA_PARALELA, ultimo: Optional[Callable] = None,
+                      desc: str = "") -> int:
+    """
+    Escreve `linhas` a partir de (linha_ini, col_ini) chamando enviar(faixa, valores)
+    quantas vezes o orçamento pedir. `largura` fixa a última coluna da faixa (senão usa a
+    linha mais larga do lote). Retorna o nº de blocos enviados (0 = nada enviado,
+    e `ultimo` não foi chamado: quem chama carimba à parte).
+
+    ultimo: enviar do último bloco (ex.: com_carimbo), chamado só depois de todos os
+    outros blocos terminarem.
+
+    paralelo=1: blocos em sequência, cada um dimensionado com o orçamento do momento.
+    paralelo>1: até `paralelo` threads sob o GOVERNADOR tiram o próximo bloco (faixas
+    disjuntas) de um cursor comum, dimensionado com o orçamento do momento em que é
+    tirado — a latência dos blocos já enviados ajusta os seguintes. Cada bloco repete
+    sozinho; depois de um erro ninguém tira bloco novo. A função só retorna (ou levanta
+    o 1º erro) depois que todos terminaram — quem chama pode carimbar o status logo em seguida.
+    """
+    n = len(linhas)
+    if n == 0:
+        return 0
+    pesos = [bytes_linha(r) for r in linhas]
+    larguras = [max(1, len(r)) for r in linhas]
+    t0 = time.time()
+    i = j = n_req = 0
+
+    if paralelo <= 1:
+        while i < n:
+            bloco, i, j = _proximo_bloco(linhas, pesos, larguras, i, j, orcamento, linha_ini, col_ini, largura)
+            _enviar_bloco(ultimo if (ultimo and i >= n) else enviar, bloco, aba, orcamento, desc, enviar)
+            n_req += 1
+    else:
+        trava = threading.Lock()
+        fim = None
+        falhou = False
+
+        def proximo():
+            nonlocal i, j, n_req, fim
+            with trava:
+                if falhou or i >= n:
+                    return None
+                bloco, i, j = _proximo_bloco(linhas, pesos, larguras, i, j, orcamento, linha_ini, col_ini, largura)
+                n_req += 1
+                if ultimo and i >= n:   # o último espera os outros terminarem
+                    fim = bloco
+                    return None
+                return bloco
+
+        def trabalhar():
+            nonlocal falhou
+            while True:
+                bloco = proximo()
+                if bloco is None:
+                    return
+                try:
+                    _enviar_bloco(enviar, bloco, aba, orcamento, desc)
+                except Exception:
+                    with trava:
+                        falhou = True
+                    raise
+
+        with ThreadPoolExecutor(max_workers=paralelo) as ex:
+            futs = [ex.submit(trabalhar) for _ in range(paralelo)]
+            wait(futs)
+        erros = [f.exception() for f in futs if f.exception() is not None]
+        if erros:
+            log(f"❌ {desc}: {len(erros)} envio(s) falharam em {n_req} blocos")
+            raise erros[0]
+        if fim:
+            _enviar_bloco(ultimo, fim, aba, orcamento, desc, enviar)
+
+    log(f"✅ {desc}: {n} linhas em {n_req} requisições ({time.time() - t0:.1f}s)")
+    return n_req
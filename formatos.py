@@ -0,0 +1,165 @@
+# formatos.py — formatação numérica (repeatCell) só quando precisa, com estado na própria aba
+#
+# Os blocos FORCAR_FORMATACAO reaplicavam os mesmos repeatCell NUMBER/DATE em toda
+# execução: 1 batchUpdate por aba por rodada, mesmo sem nada novo. Aqui cada aba guarda
+# em developer metadata (chave FORMATOS_CHAVE, JSON {col: [tipo, padrão, ini, fim]}) o
+# que já está formatado. requisicoes_formatos() compara com o pedido e devolve só o delta:
+#   - mesmo padrão e faixa já coberta  -> nada;
+#   - mesmo padrão e os dados cresceram -> repeatCell só das linhas novas;
+#   - padrão mudou / coluna nova        -> repeatCell da faixa toda.
+# O metadata é atualizado na MESMA batchUpdate (atômica), então estado e formato não divergem.
+# O fim guardado nunca passa da grade nem do fim dos dados de agora (linhas que voltam a
+# existir são formatadas de novo), e quem apaga linhas ou cola formatos por cima manda
+# junto requisicao_descarte(): o estado é recortado ou apagado na mesma batchUpdate.
+# O estado fica no Sheets (os runners do Actions são efêmeros). FORMATOS_FORCAR=1 ignora o
+# estado e reaplica tudo (ex.: alguém limpou a formatação na mão).
+
+import os
+import json
+from typing import Dict, List, Optional, Tuple
+
+from cota_sheets import com_retry, log
+
+FORMATOS_CHAVE  = "esteira_formatos"
+FORMATOS_FORCAR = os.environ.get("FORMATOS_FORCAR", "0") == "1"
+
+# pasteType de copyPaste que leva formatos junto (o estado da aba de destino deixa de valer)
+COLAGEM_COM_FORMATOS = ("PASTE_NORMAL", "PASTE_FORMAT", "PASTE_NO_BORDERS")
+
+NUMERO = {"type": "NUMBER", "pattern": "#,##0.00"}
+DATA   = {"type": "DATE", "pattern": "dd/MM/yyyy"}
+
+# {spreadsheet_id: {sheetId: (metadataId | None, {col: [tipo, padrão, ini, fim]})}}
+_ESTADOS: Dict[str, Dict[int, Tuple[Optional[int], Dict[str, list]]]] = {}
+# abas com o estado apagado por uma batchUpdate montada antes de o estado ser lido
+_DESCARTADAS: Dict[str, set] = {}
+
+
+# ========= ESTADO =========
+def registrar_estado(spreadsheet_id: str, meta: dict):
+    """Guarda o estado a partir de metadados já lidos (sheets[].developerMetadata), sem chamada extra."""
+    estados = {}
+    for s in meta.get("sheets", []):
+        for m in s.get("developerMetadata", []):
+            if m.get("metadataKey") == FORMATOS_CHAVE:
+                try:
+                    valor = json.loads(m.get("metadataValue") or "{}")
+                except ValueError:
+                    valor = {}
+                estados[s["properties"]["sheetId"]] = (m.get("metadataId"), valor)
+    for sid in _DESCARTADAS.pop(spreadsheet_id, ()):
+        estados.pop(sid, None)
+    _ESTADOS[spreadsheet_id] = estados
+
+
+def _estado_planilha(sh) -> Dict[int, Tuple[Optional[int], Dict[str, list]]]:
+    """Lê (1 chamada por planilha por execução) o metadata de formatos de todas as abas."""
+    if sh.id not in _ESTADOS:
+        meta = com_retry(sh.fetch_sheet_metadata,
+                         params={"fields": "sheets(properties(sheetId),developerMetadata)"},
+                         desc="metadados de formatos")
+        registrar_estado(sh.id, meta)
+    return _ESTADOS[sh.id]
+
+
+def invalidar(sh):
+    """Esquece o estado lido (após gravar, p/ a próxima leitura pegar metadataId novo)."""
+    _ESTADOS.pop(sh.id, None)
+
+
+def _valor_metadata(sid: int, meta_id: Optional[int], valor: Dict[str, list]) -> dict:
+    valor = json.dumps(valor, separators=(",", ":"))
+    if meta_id is not None:
+        return {"updateDeveloperMetadata": {
+            "dataFilters": [{"developerMetadataLookup": {"metadataId": meta_id}}],
+            "developerMetadata": {"metadataValue": valor},
+            "fields": "metadataValue",
+        }}
+    return {"createDeveloperMetadata": {"developerMetadata": {
+        "metadataKey": FORMATOS_CHAVE, "metadataValue": valor,
+        "location": {"sheetId": sid}, "visibility": "DOCUMENT",
+    }}}
+
+
+def requisicao_descarte(ws, linhas: Optional[int] = None) -> Optional[dict]:
+    """
+    Request que acompanha quem apaga linhas da aba (grade indo para `linhas`) ou cola
+    formatos por cima dela (linhas=None): recorta o fim guardado de cada coluna, ou apaga
+    o estado se ele não foi lido. None se o estado conhecido já está dentro da grade.
+    """
+    sh, sid = ws.spreadsheet, ws.id
+    estados = _ESTADOS.get(sh.id)
+    if estados is not None and sid not in estados:
+        return None
+    if estados is not None and linhas is not None:
+        meta_id, antigo = estados[sid]
+        novo = {c: v[:3] + [min(v[3], linhas)] for c, v in antigo.items() if v[2] < linhas}
+        if novo == antigo:
+            return None
+        if meta_id is not None:
+            estados[sid] = (meta_id, novo)
+            return _valor_metadata(sid, meta_id, novo)
+    if estados is not None:
+        estados.pop(sid, None)
+    else:
+        _DESCARTADAS.setdefault(sh.id, set()).add(sid)
+    return {"deleteDeveloperMetadata": {"dataFilter": {"developerMetadataLookup": {
+        "metadataKey": FORMATOS_CHAVE, "metadataLocation": {"sheetId": sid}}}}}
+
+
+def _repeat(sid: int, col: int, fmt: dict, ini: int, fim: int) -> dict:
+    return {"repeatCell": {
+        "range": {"sheetId": sid, "startRowIndex": ini, "endRowIndex": fim,
+                  "startColumnIndex": col, "endColumnIndex": col + 1},
+        "cell": {"userEnteredFormat": {"numberFormat": fmt}},
+        "fields": "userEnteredFormat.numberFormat",
+    }}
+
+
+# ========= DELTA =========
+def requisicoes_formatos(ws, faixas: List[Tuple[int, dict, int, int]], forcar: bool = FORMATOS_FORCAR) -> List[dict]:
+    """
+    faixas = [(coluna 0-based, numberFormat, linha_ini, linha_fim)] (índices de linha
+    0-based, fim exclusivo, como no repeatCell). -> requests do delta + metadata (ou []).
+    """
+    sid = ws.id
+    meta_id, antigo = _estado_planilha(ws.spreadsheet).get(sid, (None, {}))
+    novo = dict(antigo)
+    reqs = []
+    for col, fmt, ini, fim in faixas:
+        if fim <= ini:
+            continue
+        prev = None if forcar else antigo.get(str(col))
+        if prev and prev[:2] == [fmt["type"], fmt["pattern"]] and prev[2] <= ini:
+            # só vale o que ainda está na grade e nos dados de agora
+            feito = min(prev[3], ws.row_count, fim)
+            if feito >= fim:
+                novo[str(col)] = [fmt["type"], fmt["pattern"], prev[2], fim]
+                continue
+            if feito >= ini:    # só as linhas que passaram da faixa já formatada
+                reqs.append(_repeat(sid, col, fmt, feito, fim))
+                novo[str(col)] = [fmt["type"], fmt["pattern"], prev[2], fim]
+                continue
+        reqs.append(_repeat(sid, col, fmt, ini, fim))
+        novo[str(col)] = [fmt["type"], fmt["pattern"], ini, fim]
+
+    if not reqs and novo == antigo:
+        return []
+    return reqs + [_valor_metadata(sid, meta_id, novo)]
+
+
+def aplicar_formatos(ws, colunas: Dict[int, dict], linha_ini: int, linha_fim: int, desc: str = "") -> int:
+    """
+    Garante `colunas` ({coluna 0-based: numberFormat}) formatadas em [linha_ini, linha_fim).
+    Só chama a API se houver delta. -> nº de repeatCell enviados.
+    """
+    reqs = requisicoes_formatos(ws, [(c, f, linha_ini, linha_fim) for c, f in colunas.items()])
+    desc = desc or ws.title
+    if not reqs:
+        log(f"🎨 {desc}: formatação já aplicada — nada a enviar")
+        return 0
+    com_retry(ws.spreadsheet.batch_update, {"requests": reqs}, desc=f"{desc} formatos", tipo="escrita")
+    invalidar(ws.spreadsheet)
+    n = sum("repeatCell" in r for r in reqs)
+    log(f"🎨 {desc}: {n} faixa(s) formatada(s)")
+    return n
@@ -0,0 +1,203 @@
+# historico_indice.py — índice de linhas da aba Historico guardado na própria aba
+#
+# O Historico é uma janela móvel: A3.. tem as linhas dos últimos 7 dias + as de hoje,
+# em blocos contíguos por dia (coluna A = data). Para anexar só o dia de hoje sem ler
+# a coluna A inteira, a aba guarda em developer metadata (chave INDICE_CHAVE) a lista
+# [[serial_do_dia, nº de linhas], ...] na ordem das linhas, a partir de A3. O plano
+# de anexação sai só desse índice: quantas linhas do topo expiraram (deleteDimension),
+# onde começa o bloco de hoje (reexecução no mesmo dia sobrescreve) e o que limpar
+# abaixo. O metadata é atualizado na mesma batchUpdate que move as linhas.
+# Sem índice (ou índice que não confere), o bloco da semana é achado por busca k-ária
+# na coluna A (ordenada por data): cada rodada é 1 batchGet de BUSCA_AMOSTRAS células.
+# A aba Historico de cada destino do replicador_historico guarda o mesmo tipo de estado
+# (REPLICA_CHAVE): [[dia, n, hash], ...] da partição replicada, ver plano_replica().
+
+import os
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cota_sheets import com_retry
+from historico_scd import hash_grupo
+
+INDICE_CHAVE = "esteira_historico_indice"
+REPLICA_CHAVE = "esteira_replica_estado"
+LINHA_INI    = 3   # primeira linha de dados (A1 carimbo, A2 cabeçalho)
+BUSCA_AMOSTRAS = int(os.environ.get("HISTORICO_BUSCA_AMOSTRAS", "16"))   # células por batchGet na busca
+
+
+# ========= LEITURA / GRAVAÇÃO =========
+CAMPOS_METADADOS = "sheets(properties(sheetId),developerMetadata)"
+
+
+def metadado_da_aba(meta: Dict, sheet_id: int, chave: str) -> Tuple[Optional[int], Optional[str]]:
+    """(metadataId, valor) da chave na aba `sheet_id` dos metadados brutos da planilha, ou (None, None)."""
+    for s in meta.get("sheets", []):
+        if s["properties"]["sheetId"] != sheet_id:
+            continue
+        for m in s.get("developerMetadata", []):
+            if m.get("metadataKey") == chave:
+                return m.get("metadataId"), m.get("metadataValue", "")
+    return None, None
+
+
+def requisicao_metadado(sheet_id: int, meta_id: Optional[int], chave: str, valor: str) -> Dict:
+    """create/updateDeveloperMetadata da chave na aba (vai numa batchUpdate)."""
+    if meta_id is not None:
+        return {"updateDeveloperMetadata": {
+            "dataFilters": [{"developerMetadataLookup": {"metadataId": meta_id}}],
+            "developerMetadata": {"metadataValue": valor},
+            "fields": "metadataValue",
+        }}
+    return {"createDeveloperMetadata": {"developerMetadata": {
+        "metadataKey": chave, "metadataValue": valor,
+        "location": {"sheetId": sheet_id}, "visibility": "DOCUMENT",
+    }}}
+
+
+def ler_indice(ws) -> Tuple[Optional[int], Optional[List[List[int]]]]:
+    """(metadataId, [[serial, n], ...]) da aba, ou (None, None) se ainda não há índice."""
+    meta = com_retry(ws.spreadsheet.fetch_sheet_metadata, params={"fields": CAMPOS_METADADOS},
+                     desc="metadados do índice do Historico")
+    meta_id, valor = metadado_da_aba(meta, ws.id, INDICE_CHAVE)
+    if meta_id is None:
+        return None, None
+    try:
+        return meta_id, [[int(a), int(b)] for a, b in json.loads(valor)]
+    except (ValueError, TypeError):
+        return meta_id, None
+
+
+def requisicao_indice(sheet_id: int, meta_id: Optional[int], dias: List[List[int]]) -> Dict:
+    """create/updateDeveloperMetadata com o índice novo (vai na batchUpdate da escrita)."""
+    return requisicao_metadado(sheet_id, meta_id, INDICE_CHAVE, json.dumps(dias, separators=(",", ":")))
+
+
+# ========= ÍNDICE =========
+def indice_de_seriais(seriais: List[Optional[int]]) -> List[List[int]]:
+    """Coluna A (seriais, na ordem das linhas) -> [[serial, n], ...] por sequência de mesmo dia."""
+    dias: List[List[int]] = []
+    for s in seriais:
+        if dias and dias[-1][0] == s:
+            dias[-1][1] += 1
+        else:
+            dias.append([s, 1])
+    return dias
+
+
+def total_linhas(dias: List[List[int]]) -> int:
+    return sum(n for _, n in dias)
+
+
+def linhas_por_dia(dias: List[List[int]]) -> Dict[int, Tuple[int, int]]:
+    """{serial: (primeira_linha, última_linha)} (linhas 1-based da aba)."""
+    out, ini = {}, LINHA_INI
+    for s, n in dias:
+        out[s] = (ini, ini + n - 1)
+        ini += n
+    return out
+
+
+def bloco_semana(dias: List[List[int]], serial_limite: int, serial_hoje: int) -> Optional[Tuple[int, int]]:
+    """
+    (primeira, última) linha do último bloco contíguo de dias em [serial_limite, serial_hoje)
+    — o mesmo que a varredura de baixo para cima da coluna A acharia. None se não houver.
+    """
+    faixas = linhas_por_dia(dias)
+    ini = fim = None
+    for s, _ in reversed(dias):
+        if serial_limite <= s < serial_hoje:
+            fim = faixas[s][1] if fim is None else fim
+            ini = faixas[s][0]
+        elif fim is not None:
+            break
+    return (ini, fim) if fim is not None else None
+
+
+# ========= BUSCA (sem índice) =========
+def primeira_linha(ler_celulas: Callable[[List[int]], List], lo: int, hi: int,
+                   cond: Callable[[object], bool], amostras: int = BUSCA_AMOSTRAS) -> int:
+    """
+    Menor linha em [lo, hi] cuja célula satisfaz `cond` (monótona: falso... verdadeiro...),
+    ou hi + 1. ler_celulas(linhas) -> valores, 1 chamada por rodada: ~log_k(hi - lo) rodadas.
+    """
+    while True:
+        n = hi - lo + 1
+        if n <= amostras:   # janela pequena: lê tudo e responde
+            linhas = list(range(lo, hi + 1))
+            for r, v in zip(linhas, ler_celulas(linhas) if linhas else []):
+                if cond(v):
+                    return r
+            return hi + 1
+        passo = n // (amostras + 1)
+        linhas = [lo + passo * (k + 1) - 1 for k in range(amostras)]
+        novo_lo, novo_hi = lo, hi
+        for r, v in zip(linhas, ler_celulas(linhas)):
+            if cond(v):
+                novo_hi = r   # r satisfaz: a resposta é <= r
+                break
+            novo_lo = r + 1
+        lo, hi = novo_lo, novo_hi
+
+
+def plano_anexar(dias: List[List[int]], serial_limite: int, serial_hoje: int, n_hoje: int) -> Dict:
+    """
+    -> {"apagar": linhas expiradas no topo, "linha_ini": 1ª linha do bloco de hoje (já
+    descontadas as apagadas), "fim_antigo": última linha ocupada depois de apagar,
+    "dias": índice novo}. Dias < serial_limite expiram; dias >= serial_hoje são
+    substituídos pelo bloco de hoje (reexecução no mesmo dia).
+    """
+    apagar = 0
+    mantidos = []
+    for s, n in dias:
+        if s < serial_limite and not mantidos:
+            apagar += n
+        elif s < serial_hoje:
+            mantidos.append([s, n])
+    fim_antigo = LINHA_INI - 1 + total_linhas(dias) - apagar
+    linha_ini = LINHA_INI + total_linhas(mantidos)
+    novos = mantidos + ([[serial_hoje, n_hoje]] if n_hoje else [])
+    return {"apagar": apagar, "linha_ini": linha_ini, "fim_antigo": fim_antigo, "dias": novos}
+
+
+# ========= RÉPLICA INCREMENTAL (replicador_historico) =========
+def blocos_por_dia(linhas: List[List], col: int = 0) -> List[List]:
+    """Linhas (já tratadas, na ordem) -> [[dia, n, hash], ...] por sequência de mesmo valor na coluna `col`."""
+    blocos: List[List] = []
+    ini = 0
+    for i in range(len(linhas) + 1):
+        if i == len(linhas) or (i > ini and str(linhas[i][col]) != str(linhas[ini][col])):
+            if i > ini:
+                blocos.append([str(linhas[ini][col]), i - ini, hash_grupo(linhas[ini:i])])
+            ini = i
+    return blocos
+
+
+def ler_estado_replica(valor: Optional[str]) -> Optional[List[List]]:
+    """Valor do metadata REPLICA_CHAVE -> [[dia, n, hash], ...], ou None se ausente/inválido."""
+    try:
+        estado = [[str(d), int(n), str(h)] for d, n, h in json.loads(valor)]
+    except (ValueError, TypeError):
+        return None
+    return estado if all(n > 0 for _, n, _ in estado) else None
+
+
+def plano_replica(antigo: List[List], novo: List[List]) -> Dict:
+    """
+    Estado gravado no destino x blocos da partição de hoje -> {"apagar": linhas expiradas
+    no topo, "iguais": blocos do início que não mudaram, "linha_ini": 1ª linha a reescrever
+    (já descontadas as apagadas), "fim_antigo": última linha ocupada depois de apagar}.
+    Os blocos antigos antes do 1º dia de hoje saíram da janela; a partir do 1º bloco que
+    difere (dia novo, reexecução ou semana reparada na mestre) tudo é reescrito.
+    """
+    dias = [d for d, _, _ in antigo]
+    expirados = dias.index(novo[0][0]) if novo and novo[0][0] in dias else 0
+    resto = antigo[expirados:]
+    iguais = 0
+    while iguais < min(len(resto), len(novo)) and resto[iguais] == novo[iguais]:
+        iguais += 1
+    return {
+        "apagar": sum(n for _, n, _ in antigo[:expirados]),
+        "iguais": iguais,
+        "linha_ini": LINHA_INI + sum(n for _, n, _ in novo[:iguais]),
+        "fim_antigo": LINHA_INI - 1 + sum(n for _, n, _ in resto),
+    }
@@ -0,0 +1,138 @@
+# historico_scd.py — Historico só com as mudanças (SCD tipo 2) em vez da foto diária inteira
+#
+# No modo snapshot cada dia copia a BD_Carteira inteira para o Historico. Aqui (aba
+# ABA_SCD, mesmo layout A..AL + AM/AN) cada linha é uma VERSÃO: A = dia em que passou a
+# valer (serial), B..AD/AF..AL = conteúdo, AM = MUDANÇA (N nova, A alterada, R removida),
+# AN = hash do conteúdo ("h" + hex: gravado USER_ENTERED, um hex só de dígitos viraria
+# número e nunca mais bateria). A chave é o ID da carteira (coluna A da origem = B aqui); IDs
+# repetidos na origem formam um grupo — o grupo inteiro é a versão (hash do grupo).
+# Uma chave só ganha linhas quando o hash muda; some da origem -> 1 linha R (lápide).
+# A foto de qualquer dia sai de reconstruir(): por chave, a última versão com A <= dia.
+# Reexecução no mesmo dia: as linhas de hoje (sempre no fim) são substituídas.
+
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+ABA_SCD   = "Historico_SCD"
+LINHA_INI = 3   # A1 carimbo, A2 cabeçalho
+COLS_DADOS = 37  # origem A..AK
+NOVA, ALTERADA, REMOVIDA = "N", "A", "R"
+CABECALHO_EXTRA = ["MUDANÇA", "HASH"]
+PREFIXO_HASH = "h"
+
+
+# ========= HASH / GRUPOS =========
+def hash_grupo(linhas: List[List]) -> str:
+    h = hashlib.sha1()
+    for r in linhas:
+        h.update("\x1f".join("" if v is None else str(v) for v in r).encode("utf-8"))
+        h.update(b"\x1e")
+    return h.hexdigest()[:16]
+
+
+def agrupar_por_chave(tratadas: List[List], col_chave: int = 0) -> "OrderedDict[str, List[List]]":
+    """Linhas da origem (já tratadas) -> {chave: [linhas]} na ordem da primeira aparição."""
+    grupos: "OrderedDict[str, List[List]]" = OrderedDict()
+    for r in tratadas:
+        chave = str(r[col_chave]).strip()
+        if chave:
+            grupos.setdefault(chave, []).append(r)
+    return grupos
+
+
+# ========= ESTADO =========
+def estado_atual(chaves: List, mudancas: List, hashes: List, seriais: List[Optional[int]],
+                 serial_hoje: int) -> Tuple[Dict[str, Tuple[str, str]], int]:
+    """
+    Colunas B / AM / AN / A do SCD (mesma ordem de linhas) -> ({chave: (hash, mudança)} da
+    última versão ANTES de hoje, nº de linhas que ficam — as de hoje em diante são reescritas).
+    """
+    estado: Dict[str, Tuple[str, str]] = {}
+    manter = len(chaves)
+    for i, (k, m, h, s) in enumerate(zip(chaves, mudancas, hashes, seriais)):
+        if s is not None and s >= serial_hoje:
+            manter = i
+            break
+        estado[str(k).strip()] = (str(h), str(m))
+    return estado, manter
+
+
+def linhas_do_dia(grupos: "OrderedDict[str, List[List]]", estado: Dict[str, Tuple[str, str]],
+                  serial_hoje: int) -> Tuple[List[List], Dict[str, int]]:
+    """
+    -> (linhas novas no layout A..AL + AM/AN, contagem por tipo). Só entram grupos com hash
+    diferente da última versão viva e lápides das chaves vivas que sumiram.
+    """
+    out, cont = [], {NOVA: 0, ALTERADA: 0, REMOVIDA: 0}
+    for chave, linhas in grupos.items():
+        h = PREFIXO_HASH + hash_grupo(linhas)
+        ant = estado.get(chave)
+        if ant and ant[1] != REMOVIDA and ant[0] in (h, h[len(PREFIXO_HASH):]):   # AN antigo: hex sem prefixo
+            continue
+        tipo = ALTERADA if ant and ant[1] != REMOVIDA else NOVA
+        cont[tipo] += 1
+        for r in linhas:
+            r = (list(r) + [""] * COLS_DADOS)[:COLS_DADOS]
+            out.append([serial_hoje] + r[:29] + [""] + r[30:] + [tipo, h])
+    for chave, (h, m) in estado.items():
+        if m != REMOVIDA and chave not in grupos:
+            cont[REMOVIDA] += 1
+            out.append([serial_hoje, chave] + [""] * 28 + [""] + [""] * 7 + [REMOVIDA, ""])
+    return out, cont
+
+
+# ========= ARQUIVAMENTO (arquivo_historico.py) =========
+def versoes_arquivaveis(chaves: List, mudancas: List, seriais: List[Optional[int]], serial_corte: int) -> List[int]:
+    """
+    Índices (0-based) das linhas que nenhum dia >= serial_corte precisa para reconstruir:
+    versões substituídas por outra que já valia no corte, e lápides anteriores ao corte.
+    """
+    versoes: Dict[str, List[Tuple[int, List[int]]]] = {}
+    for i, (k, s) in enumerate(zip(chaves, seriais)):
+        if s is None:
+            continue
+        vs = versoes.setdefault(str(k).strip(), [])
+        if vs and vs[-1][0] == s:
+            vs[-1][1].append(i)
+        else:
+            vs.append((s, [i]))
+    fora = []
+    for vs in versoes.values():
+        for (s, idx), prox in zip(vs, vs[1:] + [None]):
+            if prox is not None and prox[0] <= serial_corte:
+                fora.extend(idx)
+            elif prox is None and s <= serial_corte and str(mudancas[idx[0]]) == REMOVIDA:
+                fora.extend(idx)
+    return sorted(fora)
+
+
+# ========= RECONSTRUÇÃO =========
+def reconstruir(linhas_scd: List[List], serial_dia: int, serial_de=None) -> List[List]:
+    """
+    Foto do dia `serial_dia` no layout do Historico (A = serial_dia, B..AL) a partir das
+    linhas do SCD (A..AN, a partir da linha 3). `serial_de(valor_A)` converte a coluna A
+    lida (formatada) em serial; padrão int(). As chaves saem na ordem da 1ª versão.
+    """
+    conv = serial_de or (lambda v: int(float(v)))
+    versoes: "OrderedDict[str, Tuple[int, List[List]]]" = OrderedDict()
+    for r in linhas_scd:
+        r = list(r) + [""] * (40 - len(r))
+        try:
+            s = conv(r[0])
+        except (TypeError, ValueError):
+            continue
+        if s is None or s > serial_dia:
+            continue
+        chave = str(r[1]).strip()
+        atual = versoes.get(chave)
+        if atual is None or s > atual[0]:
+            versoes[chave] = (s, [r])
+        elif s == atual[0]:
+            atual[1].append(r)
+    foto = []
+    for _, (_, rs) in versoes.items():
+        if rs[0][38] == REMOVIDA:
+            continue
+        foto.extend([serial_dia] + r[1:38] for r in rs)
+    return foto
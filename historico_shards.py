@@ -0,0 +1,86 @@
+# historico_shards.py — Historico em uma aba por mês + aba-índice dos shards
+#
+# Com HISTORICO_SHARDS=1 (armazenamento snapshot) o importador_historico grava o dia de
+# hoje na aba do mês (Historico_AAAA_MM) em vez da aba Historico única: nada expira
+# dentro do mês, então o append, o reparo e o índice de linhas (historico_indice.py,
+# developer metadata de cada shard) funcionam igual, só que numa aba que nunca passa de
+# um mês. A aba ABA_INDICE_SHARDS lista os shards (mês, dias, linhas, última gravação);
+# o replicador_historico e quem procura datas leem dela quais shards cobrem a janela e,
+# pelo índice de linhas de cada shard, só as linhas dos dias pedidos.
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from cota_sheets import com_retry
+from historico_indice import linhas_por_dia, total_linhas
+
+HISTORICO_SHARDS  = os.environ.get("HISTORICO_SHARDS", "0") == "1"
+ABA_INDICE_SHARDS = "Historico_Shards"
+PREFIXO_SHARD     = "Historico_"
+CABECALHO_INDICE  = ["ABA", "MÊS", "DIAS", "LINHAS", "ATUALIZADO EM"]
+
+
+# ========= NOMES =========
+def aba_do_mes(d: datetime) -> str:
+    return f"{PREFIXO_SHARD}{d.year:04d}_{d.month:02d}"
+
+
+def meses_da_faixa(d0: datetime, d1: datetime) -> List[datetime]:
+    """1º dia de cada mês que a faixa [d0, d1] toca, em ordem."""
+    out, m = [], d0.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    while m <= d1:
+        out.append(m)
+        m = (m + timedelta(days=32)).replace(day=1)
+    return out
+
+
+# ========= ÍNDICE DE SHARDS =========
+def ler_indice_shards(valores: List[List]) -> Dict[str, Dict]:
+    """Linhas da aba-índice (a partir da 2ª) -> {aba: {"linha", "mes", "dias", "linhas"}}."""
+    out = {}
+    for i, r in enumerate(valores, start=2):
+        r = list(r) + [""] * len(CABECALHO_INDICE)
+        if not str(r[0]).startswith(PREFIXO_SHARD):
+            continue
+        try:
+            dias, linhas = int(r[2] or 0), int(r[3] or 0)
+        except ValueError:
+            dias = linhas = 0
+        out[str(r[0])] = {"linha": i, "mes": str(r[1]), "dias": dias, "linhas": linhas}
+    return out
+
+
+def abas_da_janela(indice: Dict[str, Dict], d0: datetime, d1: datetime) -> Tuple[List[str], List[str]]:
+    """(shards da faixa que estão no índice, nomes esperados que não estão) — em ordem de mês."""
+    nomes = [aba_do_mes(m) for m in meses_da_faixa(d0, d1)]
+    return [n for n in nomes if n in indice], [n for n in nomes if n not in indice]
+
+
+def registrar_shard(book, aba: str, mes: datetime, dias: List[List[int]]):
+    """Cria/atualiza a linha do shard na aba-índice (cria a aba-índice se faltar)."""
+    from gspread.exceptions import WorksheetNotFound
+    try:
+        ws = book.worksheet(ABA_INDICE_SHARDS)
+    except WorksheetNotFound:
+        ws = com_retry(book.add_worksheet, title=ABA_INDICE_SHARDS, rows=100, cols=len(CABECALHO_INDICE),
+                       desc="add_worksheet índice de shards", tipo="escrita")
+        com_retry(ws.update, range_name="A1", values=[CABECALHO_INDICE], desc="cabeçalho índice de shards",
+                  tipo="escrita")
+    atuais = com_retry(ws.get, "A2:E", desc="get índice de shards") or []
+    indice = ler_indice_shards(atuais)
+    linha = indice[aba]["linha"] if aba in indice else 2 + len(atuais)
+    valores = [aba, mes.strftime("%m/%Y"), len(dias), total_linhas(dias), datetime.now().strftime("%d/%m/%Y %H:%M")]
+    if linha > ws.row_count:
+        com_retry(ws.add_rows, linha - ws.row_count, desc="add_rows índice de shards", tipo="escrita")
+    com_retry(ws.update, range_name=f"A{linha}", values=[valores], desc=f"índice de shards ({aba})", tipo="escrita")
+
+
+# ========= DATAS =========
+def linhas_dos_dias(dias: List[List[int]], serial_ini: int, serial_fim: int) -> Optional[Tuple[int, int]]:
+    """(primeira, última) linha da aba com os dias em [serial_ini, serial_fim], ou None (shard em ordem de data)."""
+    faixas = linhas_por_dia(dias)
+    dentro = [faixas[s] for s, _ in dias if serial_ini <= s <= serial_fim]
+    if not dentro:
+        return None
+    return min(a for a, _ in dentro), max(b for _, b in dentro)
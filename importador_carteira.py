@@ -3,6 +3,7 @@
 
 import os, re, json, time, random, unicodedata, pathlib, io
 from datetime import datetime
+from functools import lru_cache
 from typing import List, Any, Optional, Tuple
 
 import pandas as pd
@@ -16,6 +17,11 @@ from gspread.utils import rowcol_to_a1, a1_to_rowcol
 from google.oauth2.service_account import Credentials as SACreds
 from google.auth.transport.requests import Request as GARequest
 
+from escrita_planejada import CARIMBO_PREVIO, carimbo_gspread, escrever_em_lotes
+from escrita_paste import ESCRITA_PASTE, escrever_paste, requisicao_texto
+from unidades import MAP_UNIDADE
+from armazem_local import ARMAZEM_LOCAL, Armazem, assinatura
+
 
 # ───────── CONFIG ─────────
 ORIGEM_ID   = os.getenv('ORIGEM_ID',   '1lUNIeWCddfmvJEjWJpQMtuR4oRuMsI3VImDY0xBp3Bs')
@@ -27,7 +33,6 @@ CRED_JSON   = os.getenv('CRED_JSON',   'credenciais.json')
 COLS_ORIGEM  = os.getenv('COLS_ORIGEM', 'A,Z,B,C,D,E,U,T,N,AA,AB,CN,CQ,CR,CS,BQ,CE,V').split(',')
 DATE_LETTERS = os.getenv('DATE_LETTERS', 'CN,CQ,CR,CS,BQ,CE').split(',')
 
-CHUNK_ROWS_WRITE = int(os.getenv('CHUNK_ROWS_WRITE', '2000'))
 MAX_RETRIES      = int(os.getenv('MAX_RETRIES', '5'))
 RETRYABLE_CODES  = {429, 500, 502, 503, 504}
 FORCAR_DESTAQ    = os.getenv('FORCAR_DESTAQ', 'false').lower() in ('1', 'true', 'yes', 'y')
@@ -37,20 +42,6 @@ RANGES_PER_BATCH_CALL = int(os.getenv('RANGES_PER_BATCH_CALL', '25'))
 FETCH_ROWS_STEP       = int(os.getenv('FETCH_ROWS_STEP', '120'))
 
 
-MAP_UNIDADE = {
-    'CONQUISTA': 'VITORIA DA CONQUISTA',
-    'ITAPETINGA': 'ITAPETINGA',
-    'JEQUIE': 'JEQUIE',
-    'GUANAMBI': 'GUANAMBI',
-    'BARREIRAS': 'BARREIRAS',
-    'LAPA': 'BOM JESUS DA LAPA',
-    'IRECE': 'IRECE',
-    'IBOTIRAMA': 'IBOTIRAMA',
-    'BRUMADO': 'BRUMADO',
-    'LIVRAMENTO': 'LIVRAMENTO',
-}
-
-
 # ───────── LOG / RETRY ─────────
 def now():
     return datetime.now().strftime('%d/%m/%Y %H:%M:%S')
@@ -110,6 +101,17 @@ def norm_acento_up(s: str) -> str:
     )
 
 
+@lru_cache(maxsize=None)
+def unidade_mapeada(raw: str) -> str:
+    """Unidade canônica (MAP_UNIDADE) de um valor bruto — calculada uma vez por valor distinto."""
+    return MAP_UNIDADE.get(norm_acento_up(raw), (raw or "").strip())
+
+
+def _coluna_csv(df: pd.DataFrame, idx: int) -> pd.Series:
+    """Coluna `idx` do CSV exportado (texto) ou vazia se a aba não chega até ela."""
+    return df.iloc[:, idx] if idx < df.shape[1] else pd.Series("", index=df.index)
+
+
 def normalize_cell(v):
     try:
         if pd.isna(v):
@@ -396,24 +398,16 @@ def capturar_ciclo(creds: SACreds, b_dst) -> List[tuple]:
             return []
 
         idxC, idxD, idxE, idxF, idxL = map(letter_to_index, ['C', 'D', 'E', 'F', 'L'])
-        num_cols = df.shape[1]
-        idxs = [(i if i < num_cols else None) for i in [idxC, idxD, idxE, idxF, idxL]]
-        out = []
 
-        for _, row in df.iterrows():
-            valC = row.iat[idxs[0]] if idxs[0] is not None else ""
-            valD = row.iat[idxs[1]] if idxs[1] is not None else ""
-            valE = row.iat[idxs[2]] if idxs[2] is not None else ""
-            valF = row.iat[idxs[3]] if idxs[3] is not None else ""
-            valL = row.iat[idxs[4]] if idxs[4] is not None else ""
-
-            vid = str(valE).strip()
-
-            if not vid:
-                continue
-
-            uni = MAP_UNIDADE.get(norm_acento_up(str(valD)), str(valD).strip())
-            out.append(("CICLO", vid, str(valF), str(valC), str(valL), uni))
+        # colunar: filtra IDs vazios e mapeia a unidade por valor distinto
+        vid = _coluna_csv(df, idxE).astype(str).str.strip()
+        ok = vid != ""
+        uni = _coluna_csv(df, idxD)[ok].astype(str).map(unidade_mapeada)
+        out = list(zip(
+            ["CICLO"] * int(ok.sum()), vid[ok],
+            _coluna_csv(df, idxF)[ok].astype(str), _coluna_csv(df, idxC)[ok].astype(str),
+            _coluna_csv(df, idxL)[ok].astype(str), uni,
+        ))
 
         if out:
             log(f"✅ CICLO via CSV: {len(out)} linhas")
@@ -447,8 +441,7 @@ def capturar_ciclo(creds: SACreds, b_dst) -> List[tuple]:
             valL = rvals[idxL] if idxL < len(rvals) else ""
             rawD = rvals[idxD] if idxD < len(rvals) else ""
 
-            uni = MAP_UNIDADE.get(norm_acento_up(rawD), (rawD or "").strip())
-            out.append(("CICLO", vid, valF, valC, valL, uni))
+            out.append(("CICLO", vid, valF, valC, valL, unidade_mapeada(rawD)))
 
         log(f"✅ CICLO via Sheets(fallback): {len(out)} linhas")
         return out
@@ -472,22 +465,11 @@ def capturar_lv(creds: SACreds, b_dst) -> List[tuple]:
             return []
 
         idxA, idxB, idxC = map(letter_to_index, ['A', 'B', 'C'])
-        num_cols = df.shape[1]
-        idxs = [(i if i < num_cols else None) for i in [idxA, idxB, idxC]]
-        out = []
 
-        for _, row in df.iterrows():
-            uni_raw = row.iat[idxs[0]] if idxs[0] is not None else ""
-            vid = row.iat[idxs[1]] if idxs[1] is not None else ""
-            proj = row.iat[idxs[2]] if idxs[2] is not None else ""
-
-            vid = str(vid).strip()
-
-            if not vid:
-                continue
-
-            uni = MAP_UNIDADE.get(norm_acento_up(str(uni_raw)), str(uni_raw).strip())
-            out.append(("LV", vid, str(proj), uni))
+        vid = _coluna_csv(df, idxB).astype(str).str.strip()
+        ok = vid != ""
+        uni = _coluna_csv(df, idxA)[ok].astype(str).map(unidade_mapeada)
+        out = list(zip(["LV"] * int(ok.sum()), vid[ok], _coluna_csv(df, idxC)[ok].astype(str), uni))
 
         if out:
             log(f"✅ LV via CSV: {len(out)} linhas")
@@ -515,8 +497,7 @@ def capturar_lv(creds: SACreds, b_dst) -> List[tuple]:
             if not vid:
                 continue
 
-            uni = MAP_UNIDADE.get(norm_acento_up(uni_raw), (uni_raw or "").strip())
-            out.append(("LV", vid, proj, uni))
+            out.append(("LV", vid, proj, unidade_mapeada(uni_raw)))
 
         log(f"✅ LV via Sheets(fallback): {len(out)} linhas")
         return out
@@ -581,55 +562,50 @@ def ler_origem_para_df(w_src) -> pd.DataFrame:
 
 
 # ───────── WRITE Carteira ─────────
-def escrever_df_na_destino(w_dst, df: pd.DataFrame) -> int:
+def escrever_df_na_destino(w_dst, df: pd.DataFrame, carimbo=None) -> int:
+    """Cabeçalho + dados da Carteira; `carimbo` (callable -> texto) vai em T2 junto do último bloco."""
     rows0 = len(df)
     cols0 = len(df.columns)
     endL = col_letter(max(1, cols0))
 
     with_retry(w_dst.batch_clear, [f"A2:{endL}"], desc="clear dados")
 
+    # cabeçalho e status "Atualizando..." numa chamada só
+    iniciais = []
     if cols0 > 0:
-        with_retry(
-            w_dst.update,
-            range_name=f"A1:{rowcol_to_a1(1, cols0)}",
-            values=[list(df.columns)],
-            value_input_option='RAW'
-        )
-
-    with_retry(
-        w_dst.update,
-        range_name="T2",
-        values=[[f"Atualizando... {now()}"]],
-        value_input_option='RAW'
-    )
+        iniciais.append({"range": f"A1:{rowcol_to_a1(1, cols0)}", "values": [list(df.columns)]})
+    if CARIMBO_PREVIO:
+        iniciais.append({"range": "T2", "values": [[f"Atualizando... {now()}"]]})
+    if iniciais:
+        with_retry(w_dst.batch_update, iniciais, value_input_option='RAW', desc="cabeçalho + status")
 
     if rows0 > 0 and cols0 > 0:
         vals = df2values(df)
 
-        log(f"🚚 Escrevendo {rows0} linhas em blocos de {CHUNK_ROWS_WRITE} (USER_ENTERED)…")
-
-        i = 0
-
-        while i < rows0:
-            part = vals[i:i + CHUNK_ROWS_WRITE]
-            a1 = f"A{2+i}:{endL}{1+i+len(part)}"
-
-            with_retry(
-                w_dst.update,
-                range_name=a1,
-                values=part,
-                value_input_option='USER_ENTERED'
+        if ESCRITA_PASTE:
+            log(f"🚚 Escrevendo {rows0} linhas via pasteData (TSV)…")
+            escrever_paste(w_dst.spreadsheet.batch_update, w_dst.id, vals, linha_ini=2, largura=cols0,
+                           depois=[requisicao_texto(w_dst.id, "T2", carimbo())] if carimbo else [],
+                           desc="Carteira")
+        else:
+            log(f"🚚 Escrevendo {rows0} linhas em lotes por bytes/células (USER_ENTERED)…")
+
+            escrever_em_lotes(
+                lambda rng, part: w_dst.update(range_name=rng, values=part, value_input_option='USER_ENTERED'),
+                vals,
+                linha_ini=2,
+                largura=cols0,
+                ultimo=carimbo_gspread(w_dst, "T2", carimbo) if carimbo else None,
+                desc="Carteira"
             )
 
-            i += len(part)
-
     log("✅ Escrita de Carteira concluída.")
 
     return 2 + rows0
 
 
 # ───────── INSERIR CICLO/LV ─────────
-def inserir_linhas(w_dst, rows: List[List[Any]], start_row: int) -> int:
+def inserir_linhas(w_dst, rows: List[List[Any]], start_row: int, carimbo=None) -> int:
     if not rows:
         return start_row
 
@@ -641,13 +617,14 @@ def inserir_linhas(w_dst, rows: List[List[Any]], start_row: int) -> int:
                 last_col_idx = max(last_col_idx, j)
 
     endL = col_letter(last_col_idx)
-    a1 = f"A{start_row}:{endL}{start_row+len(rows)-1}"
 
-    with_retry(
-        w_dst.update,
-        range_name=a1,
-        values=rows,
-        value_input_option='USER_ENTERED'
+    escrever_em_lotes(
+        lambda rng, part: w_dst.update(range_name=rng, values=part, value_input_option='USER_ENTERED'),
+        rows,
+        linha_ini=start_row,
+        largura=last_col_idx,
+        ultimo=carimbo_gspread(w_dst, "T2", carimbo) if carimbo else None,
+        desc="CICLO/LV"
     )
 
     if FORCAR_DESTAQ:
@@ -656,6 +633,49 @@ def inserir_linhas(w_dst, rows: List[List[Any]], start_row: int) -> int:
     return start_row + len(rows)
 
 
+# ───────── CICLO/LV → LINHAS NOVAS ─────────
+# posições (0-based) na Carteira, calculadas uma vez
+COL_A, COL_B, COL_H, COL_K, COL_R = (a1index(c) - 1 for c in ('A', 'B', 'H', 'K', 'R'))
+
+
+def _linhas_extras(largura: int, ciclo, lv) -> List[List[Any]]:
+    """
+    CICLO (id, F, C, L, unidade): E → A, F → B, C → H, L → K, D → R
+    LV (id, projeto, unidade):    B → A, C → B, "SOMENTE LV" → H, unidade → R
+    """
+    base = [''] * max(largura, COL_R + 1)
+    linhas: List[List[Any]] = []
+
+    for vid, valF, valC, valL, uni in ciclo:
+        ln = base.copy()
+        ln[COL_A], ln[COL_B], ln[COL_H], ln[COL_K], ln[COL_R] = vid, valF, valC, limpar_numero_brasil(valL), uni
+        linhas.append(ln)
+
+    for vid, proj, uni in lv:
+        ln = base.copy()
+        ln[COL_A], ln[COL_B], ln[COL_H], ln[COL_R] = vid, proj, "SOMENTE LV", uni
+        linhas.append(ln)
+
+    return linhas
+
+
+def montar_linhas_extras(df: pd.DataFrame, dados_ciclo, dados_lv, larg_min: int) -> List[List[Any]]:
+    """Linhas de CICLO e depois LV cujo ID ainda não está na Carteira (1ª ocorrência de cada ID)."""
+    exist_ids = pd.Index(df.iloc[:, 0].astype(str).str.strip()) if not df.empty else pd.Index([])
+
+    # anti-join colunar: fora da Carteira, 1ª ocorrência; LV também fora de todo o CICLO
+    ciclo = pd.DataFrame(dados_ciclo, columns=["origem", "id", "F", "C", "L", "unidade"])
+    lv = pd.DataFrame(dados_lv, columns=["origem", "id", "projeto", "unidade"])
+    novos_ciclo = ciclo[(ciclo["id"] != "") & ~ciclo["id"].isin(exist_ids)].drop_duplicates("id")
+    novos_lv = lv[(lv["id"] != "") & ~lv["id"].isin(exist_ids) & ~lv["id"].isin(ciclo["id"])].drop_duplicates("id")
+
+    return _linhas_extras(
+        larg_min,
+        zip(novos_ciclo["id"], novos_ciclo["F"], novos_ciclo["C"], novos_ciclo["L"], novos_ciclo["unidade"]),
+        zip(novos_lv["id"], novos_lv["projeto"], novos_lv["unidade"]),
+    )
+
+
 # ───────── MAIN ─────────
 def main():
     log("▶️  importador_carteira.py — iniciando")
@@ -667,71 +687,51 @@ def main():
 
     df = ler_origem_para_df(w_src)
 
-    exist_ids = set(df.iloc[:, 0].astype(str).str.strip().tolist()) if not df.empty else set()
     larg_min = max(len(df.columns) if not df.empty else 0, a1index('R'))
 
-    linhas: List[List[Any]] = []
+    linhas = montar_linhas_extras(df, dados_ciclo, dados_lv, larg_min)
 
-    # CICLO:
-    # E → A
-    # F → B
-    # C → H
-    # L → K
-    # D → R
-    for _, vid, valF, valC, valL, uni in dados_ciclo:
-        if not vid or vid in exist_ids:
-            continue
-
-        ln = [''] * max(larg_min, a1index('R'))
-
-        ln[a1index('A') - 1] = vid
-        ln[a1index('B') - 1] = valF
-        ln[a1index('H') - 1] = valC
-        ln[a1index('K') - 1] = limpar_numero_brasil(valL)
-        ln[a1index('R') - 1] = uni
-
-        linhas.append(ln)
-        exist_ids.add(vid)
-
-    # LV:
-    # B → A
-    # C → B
-    # SOMENTE LV → H
-    # Unidade → R
-    for _, vid, proj, uni in dados_lv:
-        if not vid or vid in exist_ids:
-            continue
+    # T2 "Concluído" vai junto da última escrita de dados (CICLO/LV, se houver; senão a Carteira)
+    def carimbo():
+        return f"Concluído em {now()}"
 
-        ln = [''] * max(larg_min, a1index('R'))
-
-        ln[a1index('A') - 1] = vid
-        ln[a1index('B') - 1] = proj
-        ln[a1index('H') - 1] = "SOMENTE LV"
-        ln[a1index('R') - 1] = uni
-
-        linhas.append(ln)
-        exist_ids.add(vid)
+    # armazém local: Carteira idêntica à última escrita inteira -> a aba fica como está
+    assin = None
+    if ARMAZEM_LOCAL:
+        assin = assinatura([list(df.columns)] + (df2values(df) if not df.empty else []) + linhas)
+        with Armazem() as db:
+            anterior = db.carga("carteira")
+        if anterior and anterior["assinatura"] == assin:
+            log(f"🗃️  Carteira igual à escrita em {anterior['carregado_em']} ({anterior['linhas']} linhas) — só o carimbo.")
+            with_retry(w_dst.update, range_name="T2", values=[[carimbo()]], value_input_option='RAW')
+            return
 
     linhas_previstas = (len(df) if not df.empty else 0) + len(linhas) + 4
     colunas_previstas = max(max(20, len(df.columns) if not df.empty else 20), a1index('R'))
 
     ensure(w_dst, linhas_previstas + 2, colunas_previstas)
 
-    next_row = escrever_df_na_destino(w_dst, df)
+    tem_dados = len(df) > 0 and len(df.columns) > 0
+    next_row = escrever_df_na_destino(w_dst, df, carimbo=None if linhas else carimbo)
 
     if linhas:
         log(f"🔗 Inserindo {len(linhas)} linhas de CICLO/LV…")
-        next_row = inserir_linhas(w_dst, linhas, next_row)
+        next_row = inserir_linhas(w_dst, linhas, next_row, carimbo=carimbo)
         log(f"✅ {len(linhas)} linhas inseridas (CICLO/LV).")
     else:
         log("ℹ️  Sem linhas adicionais de CICLO/LV para inserir.")
 
-    with_retry(
-        w_dst.update,
-        range_name="T2",
-        values=[[f"Concluído em {now()}"]],
-        value_input_option='RAW'
-    )
+    if not linhas and not tem_dados:
+        with_retry(
+            w_dst.update,
+            range_name="T2",
+            values=[[carimbo()]],
+            value_input_option='RAW'
+        )
+
+    if assin:
+        with Armazem() as db:
+            db.registrar("carteira", next_row - 2, assin)
 
     total_estimado = next_row - 2
     log(f"🎉 Fim — linhas totais na Carteira após inserções: ~{total_estimado}.")
@@ -1,22 +1,42 @@
 # importador_historico.py — BD_Carteira -> Historico na MESMA planilha
 from datetime import datetime, timedelta
+import os, json, pathlib
 import gspread
 import re, time
 from gspread.exceptions import APIError, WorksheetNotFound
 
+from leitura_janelada import ler_em_janelas
+from escrita_paste import ESCRITA_PASTE, enviar_requisicoes, requisicoes_bloco
+from historico_indice import (LINHA_INI, bloco_semana, indice_de_seriais, ler_indice, plano_anexar,
+                              primeira_linha, requisicao_indice, total_linhas)
+from historico_scd import (ABA_SCD, ALTERADA, CABECALHO_EXTRA, NOVA, REMOVIDA, agrupar_por_chave,
+                           estado_atual, linhas_do_dia, versoes_arquivaveis)
+from arquivo_historico import HISTORICO_TIERING, ArquivoDrive, ArquivoHistorico
+from historico_shards import HISTORICO_SHARDS, aba_do_mes, registrar_shard
+from elegibilidade_ae import AE_ESTATICO, FAIXA_ESTEIRA, FORMULA_AE, chaves_esteira, coluna_ae
+from formatos import DATA
+
 # ========= CONFIG =========
 ID_PLANILHA  = "1gDktQhF0WIjfAX76J2yxQqEeeBsSfMUPGs5svbf9xGM"
 ABA_ORIGEM   = "BD_Carteira"
 ABA_DESTINO  = "Historico"
 CAM_CRED     = "credenciais.json"   # fallback local
 
-FORMULA_AE = '=ARRAYFORMULA(SE(B3:B=""; ""; SE((AD3:AD="-") + ÉERROS(PROCH(AD3:AD; Esteira!$B$1:$K$1; 1; 0)); 0; 1)))'
-
 RETRY_CRIT = (1, 3, 7, 15)
+
+# append: só as linhas de hoje, na posição do índice (historico_indice.py);
+# reparo: relê e reescreve a semana + hoje a partir de A3 (e reconstrói o índice)
+HISTORICO_MODO = os.environ.get("HISTORICO_MODO", "append").strip().lower()
+# snapshot: a carteira inteira por dia (Historico); scd: só o que mudou, por ID (historico_scd.py)
+HISTORICO_ARMAZENAMENTO = os.environ.get("HISTORICO_ARMAZENAMENTO", "snapshot").strip().lower()
+# janela quente (dias) da aba; com HISTORICO_TIERING=1 o que sai dela vai para o arquivo
+# (arquivo_historico.py) em vez de ser descartado — no SCD, por mês fechado
+HISTORICO_HORIZONTE_DIAS = int(os.environ.get("HISTORICO_HORIZONTE_DIAS", "7"))
+# HISTORICO_SHARDS=1 (só snapshot): hoje vai para a aba do mês (historico_shards.py), onde nada expira
+SHARDS = HISTORICO_SHARDS and HISTORICO_ARMAZENAMENTO != "scd"
 BASE_SERIAL = datetime(1899, 12, 30)
 
 # ========= AUTH (Secret ou arquivo local) =========
-import os, json, pathlib
 from google.oauth2.service_account import Credentials
 
 SCOPES = [
@@ -119,106 +139,352 @@ def parse_hist_date(a_str):
 t0 = time.perf_counter()
 hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
 serial_hoje = (hoje - BASE_SERIAL).days
-limite_data = hoje - timedelta(days=7)
+limite_data = hoje - timedelta(days=HISTORICO_HORIZONTE_DIAS)
+aba_hoje    = ABA_DESTINO
+if SHARDS:
+    aba_hoje    = aba_do_mes(hoje)
+    limite_data = hoje.replace(day=1)
 
 log("INÍCIO", f"Janela: {limite_data.strftime('%d/%m/%Y')} .. {hoje.strftime('%d/%m/%Y')}")
 
 book   = gc.open_by_key(ID_PLANILHA)
 ws_src = book.worksheet(ABA_ORIGEM)
-ws_dst = book.worksheet(ABA_DESTINO)
+if SHARDS:
+    try:
+        ws_dst = book.worksheet(aba_hoje)
+    except WorksheetNotFound:
+        log("SHARD", f"Criando aba {aba_hoje} (cabeçalho e formatos da aba {ABA_DESTINO})…")
+        ws_base = book.worksheet(ABA_DESTINO)
+        ws_dst = _retry(RETRY_CRIT, book.add_worksheet, title=aba_hoje, rows=1000, cols=38, op_name='add_worksheet shard')
+        def _faixa(sid, r0, r1):
+            return {"sheetId": sid, "startRowIndex": r0, "endRowIndex": r1, "startColumnIndex": 0, "endColumnIndex": 38}
+        # linha 2 (cabeçalho) inteira + formatos da 1ª linha de dados repetidos na grade toda (A em data etc.)
+        _retry(RETRY_CRIT, book.batch_update, {"requests": [
+            {"copyPaste": {"source": _faixa(ws_base.id, 1, 2), "destination": _faixa(ws_dst.id, 1, 2),
+                           "pasteType": "PASTE_NORMAL"}},
+            {"copyPaste": {"source": _faixa(ws_base.id, 2, 3), "destination": _faixa(ws_dst.id, 2, ws_dst.row_count),
+                           "pasteType": "PASTE_FORMAT"}},
+        ]}, op_name='cabeçalho e formatos shard')
+    log("SHARD", f"Aba de hoje: {aba_hoje}")
+else:
+    ws_dst = book.worksheet(ABA_DESTINO)
 
 # 1) Ler ORIGEM (A4:AK) e filtrar linhas com A preenchido
 log("ORIGEM", "Lendo A4:AK…")
-orig_vals    = _retry(RETRY_CRIT, ws_src.get, 'A4:AK', op_name='get origem') or []
+orig_vals    = ler_em_janelas(ws_src, 'A4:AK', sonda_col='A', desc='get origem') or []
 orig_validas = [l for l in orig_vals if l and (l[0] or "").strip() != ""]
 log("ORIGEM", f"Linhas válidas: {len(orig_validas):,}")
 
-# 2) Localizar bloco contíguo da última semana no HISTÓRICO lendo só A3:A
-log("HIST", "Lendo A3:A para localizar bloco da última semana…")
-colA = _retry(RETRY_CRIT, ws_dst.get, 'A3:A', op_name='get A3:A') or []
-start_idx = end_idx = None
-for i in range(len(colA)-1, -1, -1):
-    d = parse_hist_date(colA[i][0] if colA[i] else "")
-    if d and (limite_data <= d < hoje):
-        end_idx = i if end_idx is None else end_idx
-        start_idx = i
-    elif end_idx is not None:
-        break
-bloco_len = (end_idx - start_idx + 1) if start_idx is not None else 0
-if bloco_len:
-    log("HIST", f"Bloco encontrado: linhas {3+start_idx}..{3+start_idx+bloco_len-1} ({bloco_len:,})")
-else:
-    log("HIST", "Sem bloco contíguo da última semana (seguirá só com novas).")
-
-# 3) Tratar novas linhas (A..AK -> tipos corretos)
+# 2) Tratar novas linhas (A..AK -> tipos corretos)
 log("TRATAR", "Convertendo datas/números das novas linhas…")
 tratadas = [tratar_bloco_AK(l) for l in orig_validas]
 
-# 4) Montar payload:
-#    A (datas), B..AD (29 colunas: A..AC -> B..AD), AF..AL (7 colunas: AE..AK -> AF..AL), AE (fórmula)
-colA_total = []
-if bloco_len > 0:
-    colA_total.extend([[colA[start_idx + i][0]] for i in range(bloco_len)])
-for _ in tratadas:
-    colA_total.append([serial_hoje])
-
-left_total = []
-if bloco_len > 0:
-    left_total = _retry(RETRY_CRIT, ws_dst.get,
-                        f'B{3+start_idx}:AD{3+start_idx+bloco_len-1}', op_name='get B..AD bloco') or []
-    left_total = [(r + [""]*29)[:29] for r in left_total]
-left_total.extend([row[:29] for row in tratadas])
-
-right_total = []
-if bloco_len > 0:
-    right_total = _retry(RETRY_CRIT, ws_dst.get,
-                         f'AF{3+start_idx}:AL{3+start_idx+bloco_len-1}', op_name='get AF..AL bloco') or []
-    right_total = [(r + [""]*7)[:7] for r in right_total]
-right_total.extend([row[30:] for row in tratadas])
-
-total_linhas = len(colA_total)
-ultima_linha = 2 + total_linhas  # A3..A{ultima_linha}
-
-# === AJUSTE: garantir tamanho da aba e limpar rabo com segurança ===
-# Linhas necessárias até a última linha que vamos escrever
-rows_needed = ultima_linha
-# Garantir que exista a coluna AL
-cols_needed = max(ws_dst.col_count, col_letter_to_index_0b('AL') + 1)
-
-if ws_dst.row_count < rows_needed:
-    _retry(RETRY_CRIT, ws_dst.resize, rows_needed, ws_dst.col_count, op_name='resize rows')
-
-if ws_dst.col_count < cols_needed:
-    _retry(RETRY_CRIT, ws_dst.resize, max(ws_dst.row_count, rows_needed), cols_needed, op_name='resize cols')
-
-log("WRITE", f"Escrevendo {total_linhas:,} linhas (A + B..AD + AE fórmula + AF..AL)…")
-
-# Limpeza do "rabo" A{ultima_linha+1}:AL — apenas se existir
-tail_start = ultima_linha + 1
-# Após resize, considere no mínimo rows_needed
-max_row = max(ws_dst.row_count, rows_needed)
-if tail_start <= max_row:
-    _retry(RETRY_CRIT, ws_dst.spreadsheet.values_clear,
-           f"'{ws_dst.title}'!A{tail_start}:AL", op_name='clear tail')
-
-# limpar AE para a ARRAYFORMULA expandir
-_retry(RETRY_CRIT, ws_dst.spreadsheet.values_clear, f"'{ws_dst.title}'!AE3:AE", op_name='clear AE')
-
-# 5) Gravação
-payload = []
-# timestamp em A1 (opcional)
-payload.append({"range": f"{ws_dst.title}!A1", "values": [[f"Atualizado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}"]]})
-if total_linhas > 0:
-    payload.append({"range": f"{ws_dst.title}!A3:A{ultima_linha}", "values": colA_total})
-    payload.append({"range": f"{ws_dst.title}!B3",                 "values": left_total})
-    payload.append({"range": f"{ws_dst.title}!AF3",                "values": right_total})
-    payload.append({"range": f"{ws_dst.title}!AE3",                "values": [[FORMULA_AE]]})
+# ========= ESCRITA =========
+_chaves_ae = None
+
+def chaves_ae():
+    """Cabeçalho Esteira!B1:K1 desta planilha (AE_ESTATICO=1), lido uma vez."""
+    global _chaves_ae
+    if _chaves_ae is None:
+        _chaves_ae = chaves_esteira(_retry(RETRY_CRIT, book.values_get, FAIXA_ESTEIRA, op_name='get cabeçalho Esteira'))
+    return _chaves_ae
+
+def gravar(linha_ini, colA_total, left_total, right_total, antes=()):
+    """
+    A + B..AD + AF..AL a partir de linha_ini, AE (fórmula em AE3 ou, com AE_ESTATICO, os
+    valores das linhas escritas) e carimbo A1; `antes` = requests estruturais.
+    """
+    total = len(colA_total)
+    ultima = linha_ini + total - 1
+    antes = list(antes)
+    ae_total = [[v] for v in coluna_ae(left_total, chaves_ae(), idx_b=0, idx_ad=28)] if AE_ESTATICO else []
+    # shard: as linhas que a grade ganhou não herdam formato; A (serial) precisa ser data como no Historico
+    data_A = [{"repeatCell": {
+        "range": {"sheetId": ws_dst.id, "startRowIndex": linha_ini - 1, "endRowIndex": ultima,
+                  "startColumnIndex": 0, "endColumnIndex": 1},
+        "cell": {"userEnteredFormat": {"numberFormat": DATA}},
+        "fields": "userEnteredFormat.numberFormat"}}] if SHARDS and total > 0 else []
+    payload = []
+    # timestamp em A1 (opcional)
+    payload.append({"range": f"{ws_dst.title}!A1", "values": [[f"Atualizado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}"]]})
+    if total > 0 and ESCRITA_PASTE:
+        # blocos A / B..AD / AF..AL como pasteData (TSV) na batchUpdate; carimbo e fórmula depois
+        reqs = (antes + requisicoes_bloco(ws_dst.id, colA_total, linha_ini, 1, 1)
+                + requisicoes_bloco(ws_dst.id, left_total, linha_ini, 2, 29)
+                + requisicoes_bloco(ws_dst.id, right_total, linha_ini, col_letter_to_index_0b('AF') + 1, 7)
+                + requisicoes_bloco(ws_dst.id, ae_total, linha_ini, col_letter_to_index_0b('AE') + 1, 1)
+                + data_A)
+        enviar_requisicoes(ws_dst.spreadsheet.batch_update, reqs, desc="Historico")
+        antes = []
+    elif total > 0:
+        payload.append({"range": f"{ws_dst.title}!A{linha_ini}:A{ultima}", "values": colA_total})
+        payload.append({"range": f"{ws_dst.title}!B{linha_ini}",           "values": left_total})
+        payload.append({"range": f"{ws_dst.title}!AF{linha_ini}",          "values": right_total})
+        if ae_total:
+            payload.append({"range": f"{ws_dst.title}!AE{linha_ini}",      "values": ae_total})
+        antes += data_A
+    if not AE_ESTATICO:
+        payload.append({"range": f"{ws_dst.title}!AE3",                    "values": [[FORMULA_AE]]})
+    if antes:
+        _retry(RETRY_CRIT, ws_dst.spreadsheet.batch_update, {"requests": antes}, op_name='batch_update')
+
+    _retry(RETRY_CRIT, ws_dst.spreadsheet.values_batch_update,
+           body={"valueInputOption": "USER_ENTERED", "data": payload},
+           op_name='values_batch_update')
+
+def colunas_hoje():
+    return [[serial_hoje] for _ in tratadas], [row[:29] for row in tratadas], [row[30:] for row in tratadas]
+
+# ========= ARQUIVO FRIO (HISTORICO_TIERING=1) =========
+_arquivo = None
+
+def arquivo():
+    global _arquivo
+    if _arquivo is None:
+        from googleapiclient.discovery import build
+        _arquivo = ArquivoHistorico(ArquivoDrive(build("drive", "v3", credentials=make_creds(), cache_discovery=False)))
+    return _arquivo
+
+def arquivar_faixa(ws, ini, fim, ate_col="AL"):
+    """Lê A{ini}:{ate_col}{fim} e grava no arquivo ANTES de a aba descartar essas linhas."""
+    if not HISTORICO_TIERING or fim < ini:
+        return
+    log("ARQUIVO", f"Arquivando linhas {ini}..{fim} de {ws.title}…")
+    linhas = _retry(RETRY_CRIT, ws.get, f'A{ini}:{ate_col}{fim}', op_name='get linhas a arquivar') or []
+    arquivo().arquivar(linhas, serial_de=_serial_A)
+
+def _serial_A(v):
+    d = parse_hist_date(str(v))
+    return (d - BASE_SERIAL).days if d else None
+
+# ========= MODO REPARO: reescreve a semana + hoje a partir de A3 =========
+def _celulas_A(linhas):
+    """Valores de A nas `linhas` (1 batchGet) — amostras da busca sem índice."""
+    vrs = _retry(RETRY_CRIT, ws_dst.batch_get, [f"A{r}" for r in linhas], op_name='batch_get A (busca)') or []
+    return [(vr[0][0] if vr and vr[0] else "") for vr in vrs] + [""] * (len(linhas) - len(vrs))
+
+def localizar_bloco_busca():
+    """Bloco [limite, hoje) por busca k-ária em A (datas crescentes, sem buracos) — sem ler A3:A."""
+    def serial(v):
+        d = parse_hist_date(str(v))
+        return (d - BASE_SERIAL).days if d else None
+    fim = primeira_linha(_celulas_A, LINHA_INI, ws_dst.row_count, lambda v: not str(v).strip()) - 1
+    s_lim, s_hoje = (limite_data - BASE_SERIAL).days, serial_hoje
+    ini = primeira_linha(_celulas_A, LINHA_INI, fim, lambda v: (serial(v) or 0) >= s_lim)
+    ate = primeira_linha(_celulas_A, ini, fim, lambda v: (serial(v) or 0) >= s_hoje) - 1
+    return (ini, ate) if ini <= ate else None
+
+def reparar(meta_id, dias):
+    # Localizar bloco contíguo da última semana: pelo índice (0 chamadas) ou por busca
+    if dias is not None:
+        bloco = bloco_semana(dias, (limite_data - BASE_SERIAL).days, serial_hoje)
+        log("HIST", "Bloco da última semana pelo índice de linhas.")
+    else:
+        log("HIST", "Sem índice: localizando bloco da última semana por busca na coluna A…")
+        bloco = localizar_bloco_busca()
+    bloco_len = (bloco[1] - bloco[0] + 1) if bloco else 0
+    if bloco_len:
+        log("HIST", f"Bloco encontrado: linhas {bloco[0]}..{bloco[1]} ({bloco_len:,})")
+    else:
+        log("HIST", "Sem bloco contíguo da última semana (seguirá só com novas).")
+
+    # o que está acima do bloco (ou tudo, sem bloco) expirou: vai para o arquivo antes de ser sobrescrito
+    if HISTORICO_TIERING:
+        if bloco:
+            fim_descarte = bloco[0] - 1
+        elif dias is not None:
+            fim_descarte = LINHA_INI - 1 + total_linhas(dias)
+        else:
+            fim_descarte = primeira_linha(_celulas_A, LINHA_INI, ws_dst.row_count, lambda v: not str(v).strip()) - 1
+        arquivar_faixa(ws_dst, LINHA_INI, fim_descarte)
+
+    # Montar payload:
+    #    A (datas), B..AD (29 colunas: A..AC -> B..AD), AF..AL (7 colunas: AE..AK -> AF..AL), AE (fórmula)
+    colA_hoje, left_hoje, right_hoje = colunas_hoje()
+    colA_total, left_total, right_total = [], [], []
+    if bloco_len > 0:
+        # as 3 faixas do bloco numa leitura só
+        ini, fim = bloco
+        a, b, c = _retry(RETRY_CRIT, ws_dst.batch_get, [f'A{ini}:A{fim}', f'B{ini}:AD{fim}', f'AF{ini}:AL{fim}'],
+                         op_name='batch_get bloco')
+        def pad(vals, n):
+            return [(list(r) + [""]*n)[:n] for r in vals] + [[""]*n for _ in range(bloco_len - len(vals))]
+        colA_total, left_total, right_total = pad(a, 1), pad(b, 29), pad(c, 7)
+    colA_total.extend(colA_hoje)
+    left_total.extend(left_hoje)
+    right_total.extend(right_hoje)
+
+    n_total = len(colA_total)
+    ultima_linha = 2 + n_total  # A3..A{ultima_linha}
+
+    # === AJUSTE: garantir tamanho da aba e limpar rabo com segurança ===
+    # Linhas necessárias até a última linha que vamos escrever
+    rows_needed = ultima_linha
+    # Garantir que exista a coluna AL
+    cols_needed = max(ws_dst.col_count, col_letter_to_index_0b('AL') + 1)
+
+    if ws_dst.row_count < rows_needed:
+        _retry(RETRY_CRIT, ws_dst.resize, rows_needed, ws_dst.col_count, op_name='resize rows')
+
+    if ws_dst.col_count < cols_needed:
+        _retry(RETRY_CRIT, ws_dst.resize, max(ws_dst.row_count, rows_needed), cols_needed, op_name='resize cols')
+
+    log("WRITE", f"Escrevendo {n_total:,} linhas (A + B..AD + AE + AF..AL)…")
+
+    # Limpeza do "rabo" A{ultima_linha+1}:AL — apenas se existir
+    tail_start = ultima_linha + 1
+    # Após resize, considere no mínimo rows_needed
+    max_row = max(ws_dst.row_count, rows_needed)
+    if tail_start <= max_row:
+        _retry(RETRY_CRIT, ws_dst.spreadsheet.values_clear,
+               f"'{ws_dst.title}'!A{tail_start}:AL", op_name='clear tail')
+
+    # limpar AE para a ARRAYFORMULA expandir (AE_ESTATICO: a coluna é reescrita junto com as linhas)
+    if not AE_ESTATICO:
+        _retry(RETRY_CRIT, ws_dst.spreadsheet.values_clear, f"'{ws_dst.title}'!AE3:AE", op_name='clear AE')
+
+    # índice reconstruído a partir do que foi escrito (a coluna A do bloco vem formatada)
+    seriais = [(parse_hist_date(a[0]) - BASE_SERIAL).days if parse_hist_date(a[0]) else serial_hoje
+               for a in colA_total[:bloco_len]] + [serial_hoje] * len(tratadas)
+    dias_novos = indice_de_seriais(seriais)
+    gravar(3, colA_total, left_total, right_total, antes=[requisicao_indice(ws_dst.id, meta_id, dias_novos)])
+    return dias_novos
+
+# ========= MODO APPEND: só as linhas de hoje, posição pelo índice =========
+def _limpar(r0, r1, c0, c1):
+    return {"updateCells": {
+        "range": {"sheetId": ws_dst.id, "startRowIndex": r0, "endRowIndex": r1,
+                  "startColumnIndex": c0, "endColumnIndex": c1},
+        "fields": "userEnteredValue",
+    }}
+
+def indice_confere(dias):
+    """1 leitura curta: a última linha do índice tem a data do último dia e a seguinte está vazia."""
+    fim = LINHA_INI - 1 + total_linhas(dias)
+    ini = max(fim, LINHA_INI)
+    vals = _retry(RETRY_CRIT, ws_dst.get, f'A{ini}:A{fim + 1}', op_name='get A (conferência do índice)') or []
+    vals = [(r[0] if r else "") for r in vals] + ["", ""]
+    if fim < LINHA_INI:
+        return not str(vals[0]).strip()
+    d = parse_hist_date(vals[0])
+    return bool(d) and (d - BASE_SERIAL).days == dias[-1][0] and not str(vals[1]).strip()
+
+def ae_tem_formula():
+    """AE3 com a ARRAYFORMULA (1ª execução com AE_ESTATICO=1): o append apagaria os valores calculados."""
+    v = _retry(RETRY_CRIT, ws_dst.get, 'AE3', value_render_option='FORMULA', op_name='get AE3') or [[]]
+    return str((v[0] or [""])[0]).startswith("=")
+
+def anexar(meta_id, dias):
+    p = plano_anexar(dias, (limite_data - BASE_SERIAL).days, serial_hoje, len(tratadas))
+    colA_hoje, left_hoje, right_hoje = colunas_hoje()
+    ultima = p["linha_ini"] + len(tratadas) - 1
+    log("HIST", f"Índice: {total_linhas(dias):,} linhas; expiram {p['apagar']:,} do topo; "
+                f"hoje em A{p['linha_ini']}..A{max(ultima, p['linha_ini'] - 1)}")
+
+    # numa batchUpdate: grade, expirados, rabo (reexecução mais curta), índice novo.
+    # A grade cresce ANTES do deleteDimension: sobra linha após apagar (não dá para
+    # apagar todas as linhas não congeladas) e já cabe o bloco de hoje.
+    reqs = []
+    rows = max(ws_dst.row_count, ultima + p["apagar"], LINHA_INI + p["apagar"])
+    cols = max(ws_dst.col_count, col_letter_to_index_0b('AL') + 1)
+    if (rows, cols) != (ws_dst.row_count, ws_dst.col_count):
+        reqs.append({"updateSheetProperties": {
+            "properties": {"sheetId": ws_dst.id, "gridProperties": {"rowCount": rows, "columnCount": cols}},
+            "fields": "gridProperties.rowCount,gridProperties.columnCount"}})
+    if p["apagar"]:
+        arquivar_faixa(ws_dst, LINHA_INI, LINHA_INI - 1 + p["apagar"])
+        reqs.append({"deleteDimension": {"range": {
+            "sheetId": ws_dst.id, "dimension": "ROWS",
+            "startIndex": LINHA_INI - 1, "endIndex": LINHA_INI - 1 + p["apagar"]}}})
+    if p["fim_antigo"] > ultima:
+        reqs.append(_limpar(ultima, p["fim_antigo"], 0, col_letter_to_index_0b('AL') + 1))
+    reqs.append(requisicao_indice(ws_dst.id, meta_id, p["dias"]))
+
+    log("WRITE", f"Anexando {len(tratadas):,} linhas de hoje (A + B..AD + AF..AL)…")
+    gravar(p["linha_ini"], colA_hoje, left_hoje, right_hoje, antes=reqs)
+    return p["dias"]
+
+# ========= ARMAZENAMENTO SCD: só as versões que mudaram (historico_scd.py) =========
+def armazenar_scd():
+    try:
+        ws_scd = book.worksheet(ABA_SCD)
+    except WorksheetNotFound:
+        log("SCD", f"Criando aba {ABA_SCD}…")
+        ws_scd = _retry(RETRY_CRIT, book.add_worksheet, title=ABA_SCD, rows=1000, cols=40, op_name='add_worksheet SCD')
+        cab = (_retry(RETRY_CRIT, ws_dst.get, 'A2:AL2', op_name='get cabeçalho') or [[]])[0]
+        cab = (list(cab) + [""] * 38)[:38] + CABECALHO_EXTRA
+        _retry(RETRY_CRIT, ws_scd.update, range_name="A2", values=[cab], op_name='cabeçalho SCD')
+
+    # estado: chave / mudança / hash / início de cada versão (3 colunas estreitas, 1 chamada)
+    colA, colB, colMH = _retry(RETRY_CRIT, ws_scd.batch_get, ['A3:A', 'B3:B', 'AM3:AN'], op_name='batch_get estado SCD')
+    n = max(len(colA), len(colB), len(colMH))
+    def cel(vals, i, j=0):
+        return vals[i][j] if i < len(vals) and len(vals[i]) > j else ""
+
+    if HISTORICO_TIERING and n:
+        # virada de mês: versões que nenhum dia da janela quente usa (corte no 1º dia do mês do horizonte)
+        corte = (limite_data.replace(day=1) - BASE_SERIAL).days
+        fora = set(versoes_arquivaveis([cel(colB, i) for i in range(n)], [cel(colMH, i) for i in range(n)],
+                                       [_serial_A(cel(colA, i)) for i in range(n)], corte))
+        if fora:
+            log("ARQUIVO", f"{len(fora):,} versões anteriores a {limite_data.replace(day=1).strftime('%m/%Y')} -> arquivo")
+            todas = _retry(RETRY_CRIT, ws_scd.get, f'A{LINHA_INI}:AN{LINHA_INI - 1 + n}', op_name='get SCD (compactação)') or []
+            todas = [(list(r) + [""] * 40)[:40] for r in todas] + [[""] * 40 for _ in range(n - len(todas))]
+            arquivo().arquivar([todas[i] for i in sorted(fora)], serial_de=_serial_A)
+            vivas = [r for i, r in enumerate(todas) if i not in fora]
+            if vivas:
+                _retry(RETRY_CRIT, ws_scd.spreadsheet.values_batch_update,
+                       body={"valueInputOption": "USER_ENTERED",
+                             "data": [{"range": f"'{ABA_SCD}'!A{LINHA_INI}", "values": vivas}]},
+                       op_name='compactar SCD')
+            _retry(RETRY_CRIT, ws_scd.spreadsheet.values_clear,
+                   f"'{ABA_SCD}'!A{LINHA_INI + len(vivas)}:AN{LINHA_INI - 1 + n}", op_name='clear tail SCD (compactação)')
+            colA, colB, colMH = [[r[0]] for r in vivas], [[r[1]] for r in vivas], [r[38:40] for r in vivas]
+            n = len(vivas)
+    estado, manter = estado_atual([cel(colB, i) for i in range(n)], [cel(colMH, i) for i in range(n)],
+                                  [cel(colMH, i, 1) for i in range(n)], [_serial_A(cel(colA, i)) for i in range(n)],
+                                  serial_hoje)
+    novas, cont = linhas_do_dia(agrupar_por_chave(tratadas), estado, serial_hoje)
+    log("SCD", f"{len(estado):,} chaves no histórico; hoje: {cont[NOVA]:,} novas, {cont[ALTERADA]:,} alteradas, "
+               f"{cont[REMOVIDA]:,} removidas -> {len(novas):,} linhas (de {len(tratadas):,} na origem)")
+
+    linha_ini = LINHA_INI + manter
+    ultima = linha_ini + len(novas) - 1
+    fim_antigo = LINHA_INI - 1 + n
+    if ws_scd.row_count < ultima or ws_scd.col_count < 40:
+        _retry(RETRY_CRIT, ws_scd.resize, max(ws_scd.row_count, ultima), max(ws_scd.col_count, 40), op_name='resize SCD')
+    if fim_antigo > ultima:   # reexecução do dia com menos mudanças
+        _retry(RETRY_CRIT, ws_scd.spreadsheet.values_clear, f"'{ABA_SCD}'!A{ultima + 1}:AN{fim_antigo}",
+               op_name='clear tail SCD')
+    payload = [{"range": f"'{ABA_SCD}'!A1", "values": [[f"Atualizado em: {datetime.now().strftime('%d/%m/%Y %H:%M')}"]]}]
+    if novas:
+        payload.append({"range": f"'{ABA_SCD}'!A{linha_ini}", "values": novas})
+    _retry(RETRY_CRIT, ws_scd.spreadsheet.values_batch_update,
+           body={"valueInputOption": "USER_ENTERED", "data": payload}, op_name='values_batch_update SCD')
+
+if HISTORICO_ARMAZENAMENTO == "scd":
+    log("MODO", f"scd ({ABA_SCD})")
+    armazenar_scd()
 else:
-    payload.append({"range": f"{ws_dst.title}!AE3",                "values": [[FORMULA_AE]]})
-
-_retry(RETRY_CRIT, ws_dst.spreadsheet.values_batch_update,
-       body={"valueInputOption": "USER_ENTERED", "data": payload},
-       op_name='values_batch_update')
+    # 3) Modo: append (padrão) ou reparo (reescrita da semana; também sem índice válido)
+    meta_id, dias = ler_indice(ws_dst)
+    if dias is None:
+        log("HIST", "Sem índice de linhas na aba.")
+    elif not indice_confere(dias):
+        log("HIST", "Índice não confere com a coluna A (edição manual?) — descartado.")
+        dias = None
+    modo = HISTORICO_MODO if dias is not None else "reparo"   # reparo reconstrói o índice
+    if modo == "append" and AE_ESTATICO and ae_tem_formula():
+        log("HIST", "AE3 ainda tem a ARRAYFORMULA — reparo grava AE estático em todas as linhas.")
+        modo = "reparo"
+    log("MODO", modo)
+    if modo == "append":
+        dias = anexar(meta_id, dias)
+    else:
+        dias = reparar(meta_id, dias)
+    if SHARDS:
+        registrar_shard(book, aba_hoje, limite_data, dias)
+        log("SHARD", f"Índice de shards: {aba_hoje} com {len(dias)} dias.")
 
 log("FIM", f"✅ Histórico atualizado ({len(tratadas):,} novas linhas).")
 log("DURAÇÃO", f"{time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,110 @@
+# leitura_janelada.py — leitura de intervalos altos em janelas de linhas, em paralelo
+#
+# Substitui ws.get('A1:T') / ws.get_all_values() quando a aba cresce: em vez de uma
+# única resposta de vários MB (a que mais toma 500/503/deadline), descobre quantas
+# linhas existem, mede bytes/linha numa amostra, divide o resto em janelas com
+# tamanho-alvo em bytes e busca as janelas em paralelo sob o GOVERNADOR de cota.
+# Janela que falha é refeita sozinha (com_retry), não a leitura inteira.
+
+import os
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from gspread.utils import rowcol_to_a1
+
+from cota_sheets import com_retry, log, COTA_CONCORRENCIA
+
+# ========= TUNING =========
+LEITURA_ALVO_BYTES   = int(os.environ.get("LEITURA_ALVO_BYTES", str(2 * 1024 * 1024)))  # bytes por resposta
+LEITURA_AMOSTRA      = int(os.environ.get("LEITURA_AMOSTRA", "500"))                    # linhas da 1ª janela
+LEITURA_MIN_LINHAS   = 500
+LEITURA_MAX_LINHAS   = 50000
+
+_RE_A1 = re.compile(r"^([A-Z]+)?(\d+)?(?::([A-Z]+)?(\d+)?)?$")
+
+
+# ========= HELPERS =========
+def _col_letra(n: int) -> str:
+    return re.sub(r"\d+", "", rowcol_to_a1(1, n))
+
+
+def _parse_intervalo(intervalo: Optional[str], ws):
+    """'A4:AK' -> (4, 'A', 'AK', None). Sem intervalo = aba inteira."""
+    if not intervalo:
+        return 1, "A", _col_letra(ws.col_count), None
+    m = _RE_A1.match(intervalo.replace("$", "").upper())
+    if not m:
+        raise ValueError(f"Intervalo não suportado na leitura janelada: {intervalo}")
+    c1, l1, c2, l2 = m.groups()
+    c1 = c1 or "A"
+    c2 = c2 or _col_letra(ws.col_count)
+    return int(l1 or 1), c1, c2, (int(l2) if l2 else None)
+
+
+def _faixa(ws, c1, l1, c2, l2) -> str:
+    titulo = ws.title.replace("'", "''")
+    return f"'{titulo}'!{c1}{l1}:{c2}{l2}"
+
+
+def _buscar(ws, c1, l1, c2, l2, desc):
+    resp = com_retry(ws.spreadsheet.values_get, _faixa(ws, c1, l1, c2, l2),
+                     desc=f"{desc} {c1}{l1}:{c2}{l2}", tipo="leitura")
+    return resp.get("values", [])
+
+
+def linhas_usadas(ws, linha_ini: int = 1, sonda_col: Optional[str] = None, desc: str = "") -> int:
+    """
+    Última linha a ler. Com sonda_col lê só essa coluna (barato) e usa a última
+    linha preenchida; sem ela usa o tamanho da grade (metadado já carregado).
+    """
+    if sonda_col:
+        vals = _buscar(ws, sonda_col, linha_ini, sonda_col, ws.row_count, f"{desc} (sonda)")
+        return linha_ini + len(vals) - 1
+    return ws.row_count
+
+
+# ========= LEITURA =========
+def ler_em_janelas(ws, intervalo: Optional[str] = None, sonda_col: Optional[str] = None,
+                   retangular: bool = False, alvo_bytes: int = LEITURA_ALVO_BYTES,
+                   max_workers: int = COTA_CONCORRENCIA, desc: str = "") -> List[List[str]]:
+    """
+    Equivalente a ws.get(intervalo) (ou ws.get_all_values() com intervalo=None e
+    retangular=True), lido em janelas concorrentes. A API corta linhas vazias no fim
+    de cada janela; aqui cada janela é completada até o tamanho esperado antes de
+    concatenar, para manter o alinhamento das linhas, e só o fim do todo é aparado.
+    """
+    desc = desc or ws.title
+    l1, c1, c2, l2 = _parse_intervalo(intervalo, ws)
+    fim = l2 or linhas_usadas(ws, l1, sonda_col, desc)
+    if fim < l1:
+        return []
+
+    # 1ª janela = amostra para medir bytes/linha
+    fim_amostra = min(fim, l1 + LEITURA_AMOSTRA - 1)
+    amostra = _buscar(ws, c1, l1, c2, fim_amostra, desc)
+    blocos = [(l1, fim_amostra, amostra)]
+
+    if fim_amostra < fim:
+        bytes_linha = len(json.dumps(amostra, ensure_ascii=False)) / max(1, len(amostra)) if amostra else 64
+        passo = int(alvo_bytes // max(1.0, bytes_linha))
+        passo = max(LEITURA_MIN_LINHAS, min(LEITURA_MAX_LINHAS, passo))
+        janelas = [(a, min(fim, a + passo - 1)) for a in range(fim_amostra + 1, fim + 1, passo)]
+        log(f"🪟 {desc}: {fim - l1 + 1} linhas em {len(janelas) + 1} janelas (~{bytes_linha:.0f} B/linha, {passo} linhas/janela)")
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as ex:
+            resultados = list(ex.map(lambda j: _buscar(ws, c1, j[0], c2, j[1], desc), janelas))
+        blocos += [(a, b, vals) for (a, b), vals in zip(janelas, resultados)]
+
+    dados: List[List[str]] = []
+    for a, b, vals in blocos:
+        dados.extend(vals)
+        dados.extend([] for _ in range((b - a + 1) - len(vals)))
+    while dados and not any(dados[-1]):
+        dados.pop()
+
+    if retangular and dados:
+        larg = max(len(r) for r in dados)
+        dados = [r + [""] * (larg - len(r)) for r in dados]
+    return dados
@@ -10,9 +10,15 @@ import gspread
 from datetime import datetime
 from google.oauth2.service_account import Credentials as SACreds
 from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_to_rowcol
+
+from escrita_planejada import CARIMBO_PREVIO, carimbo_gspread, escrever_em_lotes
+from formatos import NUMERO, aplicar_formatos
+from publicacao_atomica import PUBLICACAO_ATOMICA, publicar
 
 # ====== FLAG: formatação opcional (desligada por padrão) ======
-FORCAR_FORMATACAO = os.environ.get("FORCAR_FORMATACAO", "0") == "1"
+# a publicação atômica cola só valores: aí os formatos das colunas vêm sempre daqui (só o delta)
+FORCAR_FORMATACAO = os.environ.get("FORCAR_FORMATACAO", "0") == "1" or PUBLICACAO_ATOMICA
 
 # ====== CONFIGURAÇÕES ======
 ID_ORIGEM     = '19xV_P6KIoZB9U03yMcdRb2oF_Q7gVdaukjAvE4xOvl8'
@@ -23,7 +29,6 @@ ID_DESTINO    = '1gDktQhF0WIjfAX76J2yxQqEeeBsSfMUPGs5svbf9xGM'
 ABA_DESTINO   = 'LV CICLO'
 CAM_CRED      = 'credenciais.json'  # fallback local
 
-CHUNK_ROWS    = int(os.environ.get("CHUNK_ROWS", "2000"))
 MAX_RETRIES   = 6
 BASE_SLEEP    = 1.1
 RETRYABLE     = {429, 500, 502, 503, 504}
@@ -110,19 +115,15 @@ def safe_update(ws, a1, values):
         desc=f"update {a1}"
     )
 
-def chunked_update(ws, values, start_row=1, start_col='A', end_col='Y'):
-    n = len(values)
-    i = 0
-    bloco = 0
-    t0 = time.time()
-    while i < n:
-        part = values[i:i+CHUNK_ROWS]
-        a1 = f"{start_col}{start_row + i}:{end_col}{start_row + i + len(part) - 1}"
-        bloco += 1
-        log(f"🚚 Enviando bloco {bloco} — linhas {start_row+i}..{start_row+i+len(part)-1} de {n}")
-        safe_update(ws, a1, part)
-        i += len(part)
-    log(f"✅ Upload concluído em {time.time() - t0:.1f}s ({n} linhas)")
+def chunked_update(ws, values, start_row=1, start_col='A', end_col='Y', ultimo=None):
+    """Escrita em lotes dimensionados por bytes/células (ver escrita_planejada). -> nº de requisições."""
+    col_ini = a1_to_rowcol(f"{start_col}1")[1]
+    col_fim = a1_to_rowcol(f"{end_col}1")[1]
+    return escrever_em_lotes(
+        lambda rng, part: ws.update(range_name=rng, values=part, value_input_option='USER_ENTERED'),
+        values, linha_ini=start_row, col_ini=col_ini, largura=col_fim - col_ini + 1,
+        ultimo=ultimo, desc=f"update {start_col}:{end_col}",
+    )
 
 # ====== INÍCIO ======
 log("🟢 INÍCIO LV CICLO")
@@ -153,8 +154,9 @@ except WorksheetNotFound:
 ensure_size(ws_dst, ws_dst.row_count, 26)
 
 # TIMESTAMP INICIAL
-log("🏷️  Marcando status inicial em Z1…")
-safe_update(ws_dst, 'Z1', [['Atualizando...']])
+if CARIMBO_PREVIO:
+    log("🏷️  Marcando status inicial em Z1…")
+    safe_update(ws_dst, 'Z1', [['Atualizando...']])
 
 # LEITURA
 log(f"📥 Lendo dados da origem ({ABA_ORIGEM}!{RANGE_ORIGEM})…")
@@ -211,68 +213,33 @@ n_rows, _ = df.shape
 log(f"📏 Tamanho a escrever: {n_rows} linhas × 25 colunas (A:Y)")
 ensure_size(ws_dst, n_rows, 26)
 
-# Limpa A:Y (preserva Z1)
-safe_clear(ws_dst, "A:Y")
-
-# Converte DF e envia em blocos
 values = df.values.tolist()
-chunked_update(ws_dst, values, start_row=1, start_col='A', end_col='Y')
+# o timestamp final Z1 vai na mesma chamada que publica/termina os dados
+carimbado = True
+if PUBLICACAO_ATOMICA:
+    # staging oculta + 1 batchUpdate: a aba nunca aparece vazia/parcial (Z1 fica fora da faixa)
+    publicar(ws_dst, values, largura=25, carimbo_cel='Z1', carimbo_final=f'Atualizado em {now_str()}',
+             desc=ABA_DESTINO)
+else:
+    # Limpa A:Y (preserva Z1) e envia em blocos
+    safe_clear(ws_dst, "A:Y")
+    carimbado = chunked_update(ws_dst, values, start_row=1, start_col='A', end_col='Y',
+                               ultimo=carimbo_gspread(ws_dst, 'Z1', lambda: f'Atualizado em {now_str()}')) > 0
 
 # FORMATAÇÃO OPCIONAL
 if FORCAR_FORMATACAO and n_rows > 1:
     try:
         log("🎨 Aplicando formatação opcional…")
-        sheet_id = ws_dst._properties['sheetId']
-        start_row_idx = 1
-        end_row_idx = n_rows
-
-        def repeat_num(col_idx):
-            return {
-                "repeatCell": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "startRowIndex": start_row_idx,
-                        "endRowIndex": end_row_idx,
-                        "startColumnIndex": col_idx,
-                        "endColumnIndex": col_idx + 1
-                    },
-                    "cell": {"userEnteredFormat": {"numberFormat": {"type": "NUMBER", "pattern": "#,##0.00"}}},
-                    "fields": "userEnteredFormat.numberFormat"
-                }
-            }
-
-        def repeat_date(col_idx):
-            return {
-                "repeatCell": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "startRowIndex": start_row_idx,
-                        "endRowIndex": end_row_idx,
-                        "startColumnIndex": col_idx,
-                        "endColumnIndex": col_idx + 1
-                    },
-                    "cell": {"userEnteredFormat": {"numberFormat": {"type": "DATE", "pattern": "dd/mm/yyyy"}}},
-                    "fields": "userEnteredFormat.numberFormat"
-                }
-            }
-
-        reqs = {
-            "requests": [
-                repeat_num(5),
-                repeat_num(10),
-                repeat_num(19),
-                repeat_num(21),
-                repeat_num(22),
-                repeat_date(7),
-            ]
-        }
-        with_retry(ws_dst.spreadsheet.batch_update, reqs, desc="batch_update formato")
-        log("✅ Formatação aplicada.")
+        # só o delta desde a última execução (estado em developer metadata, ver formatos.py)
+        aplicar_formatos(ws_dst, {5: NUMERO, 10: NUMERO, 19: NUMERO, 21: NUMERO, 22: NUMERO,
+                                  7: {"type": "DATE", "pattern": "dd/mm/yyyy"}},
+                         1, n_rows, desc="formato LV CICLO")
     except APIError as e:
         log(f"⚠️  Falha na formatação opcional (seguindo mesmo assim): {e}")
 
-# TIMESTAMP FINAL
-log("🏁 Gravando timestamp final em Z1…")
-safe_update(ws_dst, 'Z1', [[f'Atualizado em {now_str()}']])
+# TIMESTAMP FINAL (só se não foi junto dos dados)
+if not carimbado:
+    log("🏁 Gravando timestamp final em Z1…")
+    safe_update(ws_dst, 'Z1', [[f'Atualizado em {now_str()}']])
 
 log(f"🎉 LV CICLO concluído em {time.time() - t0_total:.1f}s  (formatação opcional: {'ON' if FORCAR_FORMATACAO else 'OFF'})")
@@ -9,9 +9,15 @@ import gspread
 from datetime import datetime
 from google.oauth2.service_account import Credentials
 from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_to_rowcol
+
+from escrita_planejada import CARIMBO_PREVIO, carimbo_gspread, escrever_em_lotes
+from formatos import DATA, NUMERO, aplicar_formatos
+from publicacao_atomica import PUBLICACAO_ATOMICA, publicar
 
 # ================== FLAGS ==================
-FORCAR_FORMATACAO = os.environ.get("FORCAR_FORMATACAO", "0") == "1"
+# a publicação atômica cola só valores: aí os formatos das colunas vêm sempre daqui (só o delta)
+FORCAR_FORMATACAO = os.environ.get("FORCAR_FORMATACAO", "0") == "1" or PUBLICACAO_ATOMICA
 
 # ================== CONFIG =================
 ID_PLANILHA_ORIGEM  = "19xV_P6KIoZB9U03yMcdRb2oF_Q7gVdaukjAvE4xOvl8"
@@ -20,7 +26,6 @@ ABA_ORIGEM          = "MED PARCIAIS GERAL"
 ABA_DESTINO         = "MED PARCIAL"
 CAMINHO_CREDENCIAIS = "credenciais.json"  # fallback
 
-CHUNK_ROWS  = 2000
 MAX_RETRIES = 6
 BASE_SLEEP  = 1.0
 TRANSIENT   = {429, 500, 502, 503, 504}
@@ -81,19 +86,15 @@ def safe_update(ws, a1, values):
     log(f"✍️  Update em {a1} ({len(values)} linhas)")
     with_retry(ws.update, range_name=a1, values=values, value_input_option="USER_ENTERED", desc=f"update {a1}")
 
-def chunked_update(ws, values, start_row=1, start_col='A', end_col='P'):
-    n = len(values)
-    if n == 0: return
-    i = 0; bloco = 0; t0 = time.time()
-    while i < n:
-        part = values[i:i+CHUNK_ROWS]
-        a1 = f"{start_col}{start_row + i}:{end_col}{start_row + i + len(part) - 1}"
-        bloco += 1
-        log(f"🚚 Enviando bloco {bloco} — linhas {start_row+i}..{start_row+i+len(part)-1} de {n}")
-        safe_update(ws, a1, part)
-        i += len(part)
-        time.sleep(0.12)
-    log(f"✅ Upload concluído em {time.time() - t0:.1f}s ({n} linhas)")
+def chunked_update(ws, values, start_row=1, start_col='A', end_col='P', ultimo=None):
+    """Escrita em lotes dimensionados por bytes/células (ver escrita_planejada). -> nº de requisições."""
+    col_ini = a1_to_rowcol(f"{start_col}1")[1]
+    col_fim = a1_to_rowcol(f"{end_col}1")[1]
+    return escrever_em_lotes(
+        lambda rng, part: ws.update(range_name=rng, values=part, value_input_option='USER_ENTERED'),
+        values, linha_ini=start_row, col_ini=col_ini, largura=col_fim - col_ini + 1,
+        ultimo=ultimo, desc=f"update {start_col}:{end_col}",
+    )
 
 # ================== INÍCIO =================
 inicio = time.time()
@@ -119,8 +120,9 @@ except WorksheetNotFound:
 ensure_size(aba_destino, aba_destino.row_count, 18)
 
 # ---- Status inicial
-log("🏷️  Status inicial em R1…")
-safe_update(aba_destino, "R1", [["Atualizando..."]])
+if CARIMBO_PREVIO:
+    log("🏷️  Status inicial em R1…")
+    safe_update(aba_destino, "R1", [["Atualizando..."]])
 
 # ---- Leitura
 log("📥 Lendo dados da origem (A1:P)…")
@@ -162,54 +164,42 @@ limite_linhas = len(dados) + 1
 log(f"📏 Tamanho a escrever: {limite_linhas} linhas × 16 colunas (B:P) + A")
 ensure_size(aba_destino, limite_linhas, 18)
 
-safe_clear(aba_destino, "A:P")
+dados_completo = [linha[1:] for linha in [cabecalho] + dados]
 
-log(f"📤 Colando A1:A{limite_linhas}…")
-chunked_update(aba_destino, projetos_corrigidos, start_row=1, start_col="A", end_col="A")
+# timestamp final R1 vai na mesma chamada que publica/termina os dados
+def carimbo_txt():
+    return f"Atualizado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"
+
+carimbado = True
+if PUBLICACAO_ATOMICA:
+    # A + B:P montados juntos, staging oculta + 1 batchUpdate (sem janela com a aba vazia)
+    linhas_ap = [a + (b + [""] * 15)[:15] for a, b in zip(projetos_corrigidos, dados_completo)]
+    log(f"📤 Publicando A1:P{limite_linhas} via staging…")
+    publicar(aba_destino, linhas_ap, largura=16, carimbo_cel="R1", carimbo_final=carimbo_txt(), desc=ABA_DESTINO)
+else:
+    safe_clear(aba_destino, "A:P")
 
-dados_completo = [linha[1:] for linha in [cabecalho] + dados]
+    log(f"📤 Colando A1:A{limite_linhas}…")
+    chunked_update(aba_destino, projetos_corrigidos, start_row=1, start_col="A", end_col="A")
 
-intervalo_destino = f"B1:P{limite_linhas}"
-log(f"📤 Colando {intervalo_destino} (USER_ENTERED)…")
-chunked_update(aba_destino, dados_completo, start_row=1, start_col="B", end_col="P")
+    intervalo_destino = f"B1:P{limite_linhas}"
+    log(f"📤 Colando {intervalo_destino} (USER_ENTERED)…")
+    carimbado = chunked_update(aba_destino, dados_completo, start_row=1, start_col="B", end_col="P",
+                               ultimo=carimbo_gspread(aba_destino, "R1", carimbo_txt)) > 0
 
 # ---- Formatação opcional (fail-soft)
 if FORCAR_FORMATACAO and limite_linhas > 1:
     try:
         log("🎨 Aplicando formatação opcional…")
-        sheet_id = aba_destino._properties['sheetId']
-        start_row_idx = 1
-        end_row_idx   = limite_linhas
-
-        def repeat_num(col_idx):
-            return {
-                "repeatCell": {
-                    "range": {"sheetId": sheet_id, "startRowIndex": start_row_idx, "endRowIndex": end_row_idx,
-                              "startColumnIndex": col_idx, "endColumnIndex": col_idx + 1},
-                    "cell": {"userEnteredFormat": {"numberFormat": {"type": "NUMBER", "pattern": "#,##0.00"}}},
-                    "fields": "userEnteredFormat.numberFormat"
-                }
-            }
-
-        def repeat_date(col_idx):
-            return {
-                "repeatCell": {
-                    "range": {"sheetId": sheet_id, "startRowIndex": start_row_idx, "endRowIndex": end_row_idx,
-                              "startColumnIndex": col_idx, "endColumnIndex": col_idx + 1},
-                    "cell": {"userEnteredFormat": {"numberFormat": {"type": "DATE", "pattern": "dd/MM/yyyy"}}},
-                    "fields": "userEnteredFormat.numberFormat"
-                }
-            }
-
-        reqs = {"requests": [repeat_num(6), repeat_num(10), repeat_date(7), repeat_date(9)]}
-        with_retry(aba_destino.spreadsheet.batch_update, reqs, desc="batch_update formato")
-        log("✅ Formatação aplicada.")
+        # só o delta desde a última execução (estado em developer metadata, ver formatos.py)
+        aplicar_formatos(aba_destino, {6: NUMERO, 10: NUMERO, 7: DATA, 9: DATA}, 1, limite_linhas,
+                         desc="formato MED PARCIAL")
     except APIError as e:
         log(f"⚠️  Falha na formatação opcional (seguindo mesmo assim): {e}")
 
-# ---- Timestamp final
-agora_str = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-log("🕒 Gravando timestamp final em R1…")
-safe_update(aba_destino, "R1", [[f"Atualizado em: {agora_str}"]])
+# ---- Timestamp final (só se não foi junto dos dados)
+if not carimbado:
+    log("🕒 Gravando timestamp final em R1…")
+    safe_update(aba_destino, "R1", [[carimbo_txt()]])
 
 log(f"🏁 Concluído em {time.time() - inicio:.1f}s — MED PARCIAL OK (formatação opcional: {'ON' if FORCAR_FORMATACAO else 'OFF'})")
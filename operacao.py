@@ -11,6 +11,9 @@ from google.oauth2.service_account import Credentials
 from gspread.exceptions import APIError, WorksheetNotFound
 from gspread.utils import rowcol_to_a1
 
+from escrita_planejada import CARIMBO_PREVIO, carimbo_gspread, escrever_em_lotes
+from formatos import DATA, NUMERO, aplicar_formatos
+
 # ================== FLAGS ==================
 FORCAR_FORMATACAO = os.environ.get("FORCAR_FORMATACAO", "0") == "1"
 
@@ -22,7 +25,6 @@ RANGE_ORIGEM = 'B17:M'     # 12 colunas (B..M)
 ABA_DESTINO  = 'OPERACAO'
 CAM_CRED     = 'credenciais.json'  # fallback
 
-CHUNK_ROWS      = int(os.environ.get("CHUNK_ROWS", "2000"))
 MAX_RETRIES     = 6
 BASE_SLEEP      = 1.0
 TRANSIENT_CODES = {429, 500, 502, 503, 504}
@@ -84,23 +86,14 @@ def safe_update(ws, a1, values):
     with_retries(ws.update, range_name=a1, values=values, value_input_option='USER_ENTERED',
                  desc=f"update {a1}")
 
-def update_in_blocks(ws, start_row, start_col, values, block_rows=CHUNK_ROWS):
-    total = len(values)
-    if total == 0: return
-    cols = len(values[0])
-    i = 0; bloco = 0; t0 = time.time()
-    while i < total:
-        part = values[i:i+block_rows]
-        end_row = start_row + len(part) - 1
-        end_col = start_col + cols - 1
-        rng = f"{rowcol_to_a1(start_row, start_col)}:{rowcol_to_a1(end_row, end_col)}"
-        bloco += 1
-        log(f"🚚 Enviando bloco {bloco} — {rng} ({len(part)} linhas)")
-        with_retries(ws.update, values=part, range_name=rng, value_input_option='USER_ENTERED', desc=f"update {rng}")
-        i += len(part)
-        start_row = end_row + 1
-        time.sleep(0.15)
-    log(f"✅ Upload concluído em {time.time() - t0:.1f}s ({total} linhas)")
+def update_in_blocks(ws, start_row, start_col, values, ultimo=None):
+    """Escrita em lotes dimensionados por bytes/células (ver escrita_planejada). -> nº de requisições."""
+    if not values: return 0
+    return escrever_em_lotes(
+        lambda rng, part: ws.update(values=part, range_name=rng, value_input_option='USER_ENTERED'),
+        values, linha_ini=start_row, col_ini=start_col, largura=len(values[0]),
+        ultimo=ultimo, desc="update",
+    )
 
 # ===== Normalização para API =====
 def normalize_cell(v):
@@ -139,8 +132,9 @@ except WorksheetNotFound:
 ensure_capacity(aba_destino, min_rows=2, min_cols=14)
 
 # ---- Status inicial
-log("🏷️  Marcando status inicial em N1…")
-safe_update(aba_destino, 'N1', [['Atualizando...']])
+if CARIMBO_PREVIO:
+    log("🏷️  Marcando status inicial em N1…")
+    safe_update(aba_destino, 'N1', [['Atualizando...']])
 
 # ---- Leitura
 log(f"📥 Lendo origem ({ABA_ORIGEM}!{RANGE_ORIGEM})…")
@@ -192,9 +186,12 @@ log(f"📏 Tamanho a escrever: {qtd_linhas} linhas × {qtd_colunas} colunas (vai
 ensure_capacity(aba_destino, min_rows=qtd_linhas + 2, min_cols=max(14, qtd_colunas))
 safe_clear(aba_destino, "A2:M")
 
+carimbado = False
 if qtd_linhas > 0:
     log("🚚 Escrevendo dados em blocos…")
-    update_in_blocks(aba_destino, start_row=2, start_col=1, values=values, block_rows=CHUNK_ROWS)
+    # timestamp final N1 vai junto do último bloco
+    carimbado = update_in_blocks(aba_destino, start_row=2, start_col=1, values=values,
+                                 ultimo=carimbo_gspread(aba_destino, 'N1', lambda: f'Atualizado em: {now()}')) > 0
 else:
     log("⛔ Nada a escrever.")
 
@@ -202,38 +199,14 @@ else:
 if FORCAR_FORMATACAO and qtd_linhas > 1:
     try:
         log("🎨 Aplicando formatação opcional…")
-        sheet_id = aba_destino._properties['sheetId']
-        start_row_idx = 1
-        end_row_idx   = 1 + qtd_linhas
-
-        def repeat_num(col_idx):
-            return {
-                "repeatCell": {
-                    "range": {"sheetId": sheet_id, "startRowIndex": start_row_idx, "endRowIndex": end_row_idx,
-                              "startColumnIndex": col_idx, "endColumnIndex": col_idx + 1},
-                    "cell": {"userEnteredFormat": {"numberFormat": {"type": "NUMBER", "pattern": "#,##0.00"}}},
-                    "fields": "userEnteredFormat.numberFormat"
-                }
-            }
-
-        def repeat_date(col_idx):
-            return {
-                "repeatCell": {
-                    "range": {"sheetId": sheet_id, "startRowIndex": start_row_idx, "endRowIndex": end_row_idx,
-                              "startColumnIndex": col_idx, "endColumnIndex": col_idx + 1},
-                    "cell": {"userEnteredFormat": {"numberFormat": {"type": "DATE", "pattern": "dd/MM/yyyy"}}},
-                    "fields": "userEnteredFormat.numberFormat"
-                }
-            }
-
-        reqs = {"requests": [repeat_num(3), repeat_date(4)]}
-        with_retries(aba_destino.spreadsheet.batch_update, reqs, desc="batch_update formato")
-        log("✅ Formatação aplicada.")
+        # só o delta desde a última execução (estado em developer metadata, ver formatos.py)
+        aplicar_formatos(aba_destino, {3: NUMERO, 4: DATA}, 1, 1 + qtd_linhas, desc="formato OPERACAO")
     except APIError as e:
         log(f"⚠️  Falha na formatação opcional (seguindo mesmo assim): {e}")
 
-# ---- Timestamp final
-log("🏁 Gravando timestamp final em N1…")
-safe_update(aba_destino, 'N1', [[f'Atualizado em: {now()}']])
+# ---- Timestamp final (só se não foi junto dos dados)
+if not carimbado:
+    log("🏁 Gravando timestamp final em N1…")
+    safe_update(aba_destino, 'N1', [[f'Atualizado em: {now()}']])
 
 log(f"🎉 OPERACAO concluído em {time.time() - t0:.1f}s (formatação opcional: {'ON' if FORCAR_FORMATACAO else 'OFF'})")
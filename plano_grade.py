@@ -0,0 +1,234 @@
+# plano_grade.py — destino inteiro (grade + limpeza + dados + carimbos) em 1–2 chamadas
+#
+# O padrão das réplicas era: resize, status, values_clear corpo, cabeçalho, dados,
+# values_clear rabo, resize (encolhe), carimbo — 6 a 8 idas à API por aba.
+# compilar_plano() transforma isso em:
+#   1) um spreadsheets.batchUpdate: updateSheetProperties (cresce/encolhe a grade),
+#      updateCells limpando o rabo, status prévio e, opcionalmente, os próprios dados;
+#   2) um values.batchUpdate com os dados (linhas completadas até a largura, então o
+#      corpo antigo é sobrescrito sem clear separado) + carimbo final.
+# executar_planos() aceita vários planos da MESMA planilha e junta tudo nessas 2 chamadas.
+# Vários planos na mesma aba (ex.: BD_EXEC A:B e F:J) devem receber o mesmo grade_min,
+# senão o último updateSheetProperties encolhe a grade que o outro precisava.
+# Com ESCRITA_PASTE=1 os dados viram pasteData (TSV) na própria batchUpdate (escrita_paste)
+# e só os carimbos vão no values.batchUpdate.
+# executar_planos_async() faz o mesmo pelo ClienteAsync (sheets_async), para vários
+# destinos em paralelo num só thread.
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
+
+from cota_sheets import com_retry, log
+from escrita_planejada import ORCAMENTO, bytes_linha, escrever_em_lotes
+from escrita_paste import ESCRITA_PASTE, agrupar, enviar_requisicoes, requisicoes_bloco
+from formatos import requisicao_descarte
+
+# Dados via updateCells (tipados) no próprio batchUpdate: 1 chamada só, mas sem o
+# parse USER_ENTERED — use apenas quando os valores já vêm com tipo (float/int, '=...').
+PLANO_DADOS_CELULAS = os.environ.get("PLANO_DADOS_CELULAS", "0") == "1"
+
+
+# ========= HELPERS =========
+def _titulo(titulo: str) -> str:
+    return "'" + titulo.replace("'", "''") + "'"
+
+
+def _celula(v) -> dict:
+    if v is None or v == "":
+        return {}
+    if isinstance(v, bool):
+        return {"userEnteredValue": {"boolValue": v}}
+    if isinstance(v, (int, float)):
+        return {"userEnteredValue": {"numberValue": v}}
+    s = str(v)
+    if s.startswith("="):
+        return {"userEnteredValue": {"formulaValue": s}}
+    return {"userEnteredValue": {"stringValue": s}}
+
+
+def _texto_em(sheet_id: int, cel: str, texto: str) -> dict:
+    r, c = a1_to_rowcol(cel)
+    return {"updateCells": {
+        "start": {"sheetId": sheet_id, "rowIndex": r - 1, "columnIndex": c - 1},
+        "rows": [{"values": [_celula(texto)]}],
+        "fields": "userEnteredValue",
+    }}
+
+
+# ========= COMPILAÇÃO =========
+def compilar_plano(ws, linhas: List[List], largura: int, linha_ini: int = 1, col_ini: int = 1,
+                   folga: int = 200, min_cols: int = 0, carimbo_cel: Optional[str] = None,
+                   carimbo_previo: Optional[str] = None, carimbo_final: Optional[str] = None,
+                   grade_min: Tuple[int, int] = (0, 0), dados_celulas: bool = PLANO_DADOS_CELULAS) -> Dict:
+    """
+    Plano para gravar `linhas` em (linha_ini, col_ini) com `largura` colunas, deixando a
+    grade com (última linha de dados + folga) linhas — ou grade_min (linhas, colunas), se
+    maior. Usa ws.row_count/col_count já carregados (sem leitura extra).
+    Retorna {"requests": [...], "dados": [...], "carimbos": [...], "grade": (ws, linhas, colunas)};
+    planos montados à mão podem trazer "grade": None (nenhuma aba local a ajustar).
+    """
+    sid = ws.id
+    n = len(linhas)
+    ultima = linha_ini - 1 + n
+    rows_alvo = max(ultima + folga, linha_ini, grade_min[0])
+    cols_alvo = max(ws.col_count, col_ini + largura - 1, min_cols, grade_min[1])
+    if carimbo_cel:
+        r, c = a1_to_rowcol(carimbo_cel)
+        rows_alvo, cols_alvo = max(rows_alvo, r), max(cols_alvo, c)
+
+    reqs = []
+    if (rows_alvo, cols_alvo) != (ws.row_count, ws.col_count):
+        reqs.append({"updateSheetProperties": {
+            "properties": {"sheetId": sid, "gridProperties": {"rowCount": rows_alvo, "columnCount": cols_alvo}},
+            "fields": "gridProperties.rowCount,gridProperties.columnCount",
+        }})
+    if rows_alvo < ws.row_count:    # linhas apagadas levam a formatação junto (formatos.py)
+        descarte = requisicao_descarte(ws, rows_alvo)
+        if descarte:
+            reqs.append(descarte)
+
+    # rabo: o que sobrou entre o fim dos dados novos e o fim da grade (já encolhida)
+    fim_rabo = min(rows_alvo, ws.row_count)
+    if fim_rabo > ultima:
+        reqs.append({"updateCells": {
+            "range": {"sheetId": sid, "startRowIndex": ultima, "endRowIndex": fim_rabo,
+                      "startColumnIndex": col_ini - 1, "endColumnIndex": col_ini - 1 + largura},
+            "fields": "userEnteredValue",
+        }})
+
+    if carimbo_cel and carimbo_previo:
+        reqs.append(_texto_em(sid, carimbo_cel, carimbo_previo))
+
+    cheias = [list(r) + [""] * (largura - len(r)) for r in linhas]
+    dados = []
+    if cheias and dados_celulas and sum(bytes_linha(r) for r in cheias) <= ORCAMENTO.limite_bytes:
+        reqs.append({"updateCells": {
+            "start": {"sheetId": sid, "rowIndex": linha_ini - 1, "columnIndex": col_ini - 1},
+            "rows": [{"values": [_celula(v) for v in r]} for r in cheias],
+            "fields": "userEnteredValue",
+        }})
+    elif cheias:
+        dados.append({"aba": ws.title, "sheet_id": sid, "linha": linha_ini, "col": col_ini, "largura": largura,
+                      "values": cheias})
+
+    carimbos = []
+    if carimbo_cel and carimbo_final:
+        carimbos.append({"range": f"{_titulo(ws.title)}!{carimbo_cel}", "values": [[carimbo_final]]})
+
+    return {"requests": reqs, "dados": dados, "carimbos": carimbos, "grade": (ws, rows_alvo, cols_alvo)}
+
+
+# ========= EXECUÇÃO =========
+def executar_planos(sh, planos: List[Dict], desc: str = "", paste: bool = ESCRITA_PASTE) -> int:
+    """
+    Executa planos da mesma planilha: 1 batchUpdate + 1 values.batchUpdate (dados +
+    carimbos). Se os dados passarem do orçamento de bytes de uma requisição, sobem em
+    lotes (escrever_em_lotes) e os carimbos vão numa chamada final, depois dos dados.
+    paste=True: dados como pasteData nas batchUpdates (quantas o orçamento pedir).
+    Retorna o nº de chamadas feitas.
+    """
+    reqs, dados, carimbos = _juntar(planos)
+    chamadas = 0
+
+    if paste:
+        for d in dados:
+            reqs += requisicoes_bloco(d["sheet_id"], d["values"], d["linha"], d["col"], d["largura"])
+        dados = []
+        if reqs:
+            chamadas += enviar_requisicoes(sh.batch_update, reqs, desc=desc)
+    elif reqs:
+        com_retry(sh.batch_update, {"requests": reqs}, desc=f"{desc} batchUpdate ({len(reqs)} reqs)", tipo="escrita")
+        chamadas += 1
+    if reqs:
+        for p in (p for p in planos if p["grade"]):    # mesmo ajuste que ws.resize() faz no objeto local
+            ws, rows, cols = p["grade"]
+            ws._properties.setdefault("gridProperties", {}).update(rowCount=rows, columnCount=cols)
+
+    total = sum(bytes_linha(r) for d in dados for r in d["values"])
+    if total <= ORCAMENTO.limite_bytes:
+        data = [{
+            "range": f"{_titulo(d['aba'])}!{rowcol_to_a1(d['linha'], d['col'])}:"
+                     f"{rowcol_to_a1(d['linha'] + len(d['values']) - 1, d['col'] + d['largura'] - 1)}",
+            "values": d["values"],
+        } for d in dados] + carimbos
+        if data:
+            com_retry(sh.values_batch_update, {"valueInputOption": "USER_ENTERED", "data": data},
+                      desc=f"{desc} values.batchUpdate ({len(data)} faixas)", tipo="escrita")
+            chamadas += 1
+    else:
+        log(f"📦 {desc}: {total // 1024} KB de dados — enviando em lotes antes dos carimbos")
+        for d in dados:
+            chamadas += escrever_em_lotes(
+                lambda rng, parte: sh.values_update(rng, params={"valueInputOption": "USER_ENTERED"},
+                                                    body={"values": parte}),
+                d["values"], linha_ini=d["linha"], col_ini=d["col"], largura=d["largura"],
+                aba=d["aba"], desc=f"{desc} {d['aba']}",
+            )
+        if carimbos:
+            com_retry(sh.values_batch_update, {"valueInputOption": "USER_ENTERED", "data": carimbos},
+                      desc=f"{desc} carimbos", tipo="escrita")
+            chamadas += 1
+    return chamadas
+
+
+def _juntar(planos: List[Dict]) -> tuple:
+    reqs = []
+    for r in (r for p in planos for r in p["requests"]):
+        if r not in reqs:
+            reqs.append(r)
+    dados = [d for p in planos for d in p["dados"]]
+    carimbos = list({c["range"]: c for p in planos for c in p["carimbos"]}.values())
+    return reqs, dados, carimbos
+
+
+def _faixa_dados(d: Dict, ini: int, fim: int) -> Dict:
+    linha = d["linha"] + ini
+    return {
+        "range": f"{_titulo(d['aba'])}!{rowcol_to_a1(linha, d['col'])}:"
+                 f"{rowcol_to_a1(linha + (fim - ini) - 1, d['col'] + d['largura'] - 1)}",
+        "values": d["values"][ini:fim],
+    }
+
+
+async def executar_planos_async(cli, spreadsheet_id: str, planos: List[Dict], desc: str = "",
+                                paste: bool = ESCRITA_PASTE) -> int:
+    """
+    executar_planos() via ClienteAsync: batchUpdate(s) e depois values.batchUpdate(s) com
+    os dados — acima do orçamento de bytes, em lotes por linhas — e os carimbos no último.
+    """
+    reqs, dados, carimbos = _juntar(planos)
+    chamadas = 0
+    if paste:
+        for d in dados:
+            reqs += requisicoes_bloco(d["sheet_id"], d["values"], d["linha"], d["col"], d["largura"])
+        dados = []
+    for k, lote in enumerate(agrupar(reqs) if paste else ([reqs] if reqs else []), start=1):
+        await cli.batch_update(spreadsheet_id, {"requests": lote}, desc=f"{desc} batchUpdate {k}")
+        chamadas += 1
+    if reqs:
+        for p in (p for p in planos if p["grade"]):
+            ws, rows, cols = p["grade"]
+            ws._properties.setdefault("gridProperties", {}).update(rowCount=rows, columnCount=cols)
+
+    lotes, atual, tam = [], [], 0
+    for d in dados:
+        ini = 0
+        for i, r in enumerate(d["values"]):
+            b = bytes_linha(r)
+            if tam + b > ORCAMENTO.limite_bytes and (atual or i > ini):
+                if i > ini:
+                    atual.append(_faixa_dados(d, ini, i))
+                lotes.append(atual)
+                atual, tam, ini = [], 0, i
+            tam += b
+        if d["values"][ini:]:
+            atual.append(_faixa_dados(d, ini, len(d["values"])))
+    if atual or carimbos:
+        lotes.append(atual + carimbos)   # carimbos só no último lote, depois de todos os dados
+    for k, data in enumerate(lotes, start=1):
+        await cli.values_batch_update(spreadsheet_id, {"valueInputOption": "USER_ENTERED", "data": data},
+                                      desc=f"{desc} values.batchUpdate {k}/{len(lotes)}")
+        chamadas += 1
+    return chamadas
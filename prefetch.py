@@ -0,0 +1,150 @@
+# prefetch.py — leitura antecipada das fontes do BLOCO 2 enquanto o BLOCO 1 escreve
+#
+# zps_importador (BANCO.xlsx no Drive), cart_plan (10 × Carteira_Planejador) e bd_exec
+# (BD_Serv_Esteira) não dependem de nada que o BLOCO 1 grava. O orquestrador dispara
+# este script em segundo plano no início da rodada; cada fonte vai para o cache da rodada
+# (cache_local.py) e o passo do BLOCO 2 a pega de lá. As chaves saem dos IDs/faixas: se
+# esta lista e a do script divergirem, o passo só não acha o cache e lê da fonte.
+# O BANCO.xlsx vai com id + modifiedTime; zps_importador ainda faz o files.list e só usa
+# o cache se for o mesmo arquivo.
+
+import io
+import os
+import sys
+import json
+import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseDownload
+
+import cache_local
+from cota_sheets import com_retry, log
+
+# ========= FONTES =========
+FAIXAS: List[Tuple[str, str]] = [   # (spreadsheet_id, faixa) lidas por values.get
+    # cart_plan.ORIGENS
+    ("1OTHF2ytEOjGgfE49paARXkz9GjaklOQC_UhiXwUjC2E", "Carteira_Planejador!A6:BI"),
+    ("1XmpY8mqkRou-CRY68j1ljHH8W8zcROy7wnwMMSfbV7o", "Carteira_Planejador!A6:BI"),
+    ("1sGHf-zWXoxjnO20QBw2KWX39BSCzT8rzHdEz1hL7jyU", "Carteira_Planejador!A6:BI"),
+    ("1FO5tyhXygbbzSmmTGdnm45j4DD_rRFQgEheN8T8Wy70", "Carteira_Planejador!A6:BI"),
+    ("1rj2V7CxbZwkan63eCeLkH9G00Gi041IZNC6vwEgq6yI", "Carteira_Planejador!A6:BI"),
+    ("1NV0oObhLHAqnSpJKmeBBHQQxcxwlRh14TKQwO561GEw", "Carteira_Planejador!A6:BI"),
+    ("1rzT8o6XZi4v8j7CYLky3BD3sT5IPjv1PRb45ipBfbw4", "Carteira_Planejador!A6:BI"),
+    ("1oS619l3x_D1mXkvDpw8vs91G6ipZmsK83JqEIwPj7Uk", "Carteira_Planejador!A6:BI"),
+    ("1dNwj8qWTl1k92PxI9iXwaNZYITnxuKP-kOF1QnZK3Iw", "Carteira_Planejador!A6:BI"),
+    ("1gN2tR_LCuRnVCQ9tm2UURnVuMlJPVNEjvmo02TwFQCI", "Carteira_Planejador!A6:BI"),
+    # bd_exec
+    ("189JPWONK4hSpziocviwSQOtj59rWl9tbhkVvrxb6Lds", "BD_Serv_Esteira!A2:B"),
+]
+ARQUIVOS: List[Tuple[str, str]] = [   # (pasta_id, nome) — o mais recente da pasta
+    ("177E69Fo-sgAU9vvPf4LdB6M9l9wRfPhc", "BANCO.xlsx"),   # zps_importador
+]
+
+PREFETCH_THREADS = int(os.environ.get("PREFETCH_THREADS", "4"))
+SCOPES = ["https://www.googleapis.com/auth/drive", "https://www.googleapis.com/auth/spreadsheets"]
+CREDENTIALS_PATH_FALLBACK = "credenciais.json"
+
+
+def make_creds() -> Credentials:
+    env_json = os.environ.get("GOOGLE_CREDENTIALS")
+    if env_json:
+        return Credentials.from_service_account_info(json.loads(env_json), scopes=SCOPES)
+    env_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if env_path and os.path.isfile(env_path):
+        return Credentials.from_service_account_file(env_path, scopes=SCOPES)
+    script_dir = pathlib.Path(__file__).resolve().parent
+    for p in (script_dir / CREDENTIALS_PATH_FALLBACK, pathlib.Path.cwd() / CREDENTIALS_PATH_FALLBACK):
+        if p.is_file():
+            return Credentials.from_service_account_file(str(p), scopes=SCOPES)
+    raise FileNotFoundError("Credenciais não encontradas (GOOGLE_CREDENTIALS / GOOGLE_APPLICATION_CREDENTIALS).")
+
+
+creds = None
+_local = threading.local()   # httplib2 não é thread-safe: um client por thread
+
+
+def _servico(nome: str, versao: str):
+    if not hasattr(_local, nome):
+        setattr(_local, nome, build(nome, versao, credentials=creds, cache_discovery=False))
+    return getattr(_local, nome)
+
+
+# ========= JOBS =========
+def ler_faixa(spreadsheet_id: str, faixa: str):
+    chave = cache_local.chave_valores(spreadsheet_id, faixa)
+    try:
+        resp = com_retry(lambda: _servico("sheets", "v4").spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id, range=faixa).execute(), desc=f"prefetch {faixa} {spreadsheet_id}")
+        valores = resp.get("values", []) or []
+        cache_local.gravar(chave, valores)
+        log(f"📦 prefetch {faixa} {spreadsheet_id}: {len(valores)} linhas")
+    except Exception as e:
+        cache_local.desistir(chave)
+        log(f"⚠️  prefetch {faixa} {spreadsheet_id} falhou (o passo lê da fonte): {e}")
+
+
+def baixar_arquivo(pasta_id: str, nome: str):
+    chave = cache_local.chave_drive(pasta_id, nome)
+    try:
+        drive = _servico("drive", "v3")
+        files = com_retry(lambda: drive.files().list(
+            q=f"name = '{nome}' and trashed = false and '{pasta_id}' in parents",
+            spaces="drive", corpora="allDrives", fields="files(id, name, modifiedTime, size)",
+            orderBy="modifiedTime desc", supportsAllDrives=True, includeItemsFromAllDrives=True, pageSize=1,
+        ).execute(), desc=f"prefetch files.list({nome})").get("files", [])
+        if not files:
+            cache_local.desistir(chave)
+            return
+        f = files[0]
+        buf = io.BytesIO()
+        baixador = MediaIoBaseDownload(buf, drive.files().get_media(fileId=f["id"]), chunksize=4 * 1024 * 1024)
+        done = False
+        while not done:
+            _, done = com_retry(baixador.next_chunk, desc=f"prefetch download {nome}")
+        cache_local.gravar(chave, {"id": f["id"], "modifiedTime": f["modifiedTime"], "conteudo": buf.getvalue()})
+        log(f"📦 prefetch {nome}: {len(buf.getvalue()) / 1_048_576:.2f} MB")
+    except Exception as e:
+        cache_local.desistir(chave)
+        log(f"⚠️  prefetch {nome} falhou (o passo baixa da fonte): {e}")
+
+
+# ========= MAIN =========
+def main():
+    global creds
+    if not cache_local.rodada():
+        log("⏭️ prefetch fora de uma rodada do orquestrador (ESTEIRA_CACHE_RODADA) — nada a fazer.")
+        return
+    # pendências antes de qualquer leitura: um passo que chegue cedo espera em vez de ler em dobro
+    cache_local.registrar_produtor()
+    for pasta_id, nome in ARQUIVOS:
+        cache_local.marcar_pendente(cache_local.chave_drive(pasta_id, nome))
+    for sid, faixa in FAIXAS:
+        cache_local.marcar_pendente(cache_local.chave_valores(sid, faixa))
+
+    try:
+        creds = make_creds()
+        with ThreadPoolExecutor(max_workers=PREFETCH_THREADS) as ex:
+            # o download grande primeiro: é o que mais se beneficia da sobreposição
+            jobs = [ex.submit(baixar_arquivo, p, n) for p, n in ARQUIVOS]
+            jobs += [ex.submit(ler_faixa, s, f) for s, f in FAIXAS]
+            for j in jobs:
+                j.result()
+    finally:
+        for pasta_id, nome in ARQUIVOS:
+            cache_local.desistir(cache_local.chave_drive(pasta_id, nome))
+        for sid, faixa in FAIXAS:
+            cache_local.desistir(cache_local.chave_valores(sid, faixa))
+        cache_local.encerrar_produtor()
+    log("🏁 prefetch concluído.")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        log(f"⚠️  prefetch abortado: {e}")
+        sys.exit(1)
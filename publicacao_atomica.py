@@ -0,0 +1,178 @@
+# publicacao_atomica.py — grava numa aba oculta de staging e publica numa única batchUpdate
+#
+# Antes: clear A:Y + escrita em blocos = aba vazia/parcial durante todo o upload (e,
+# se cair no meio, fica assim até rodar de novo). Aqui o payload sobe inteiro para
+# uma aba oculta "_stg_<aba>_<ts>" (pode subir em paralelo, ninguém está olhando) e
+# só então uma batchUpdate — atômica no Sheets — publica:
+#   copiar (padrão): copyPaste staging -> aba viva + limpa o rabo + carimbo + apaga staging.
+#                    Mantém sheetId, fórmulas de outras abas, filtros e colunas fora da faixa.
+#   trocar:          apaga a aba viva e renomeia/reposiciona a staging no lugar. Mais barato,
+#                    mas referências de outras abas viram #REF! — só p/ abas que ninguém referencia.
+# Falha no upload: a staging é descartada e a aba viva continua intacta.
+# A cola é só de valores (PUBLICACAO_PASTE=PASTE_VALUES): formatos, formatação condicional
+# e validação da aba viva ficam como estão; os formatos explícitos de cada passo
+# (aplicar_formatos) são aplicados depois da publicação. Só as linhas além do fim dos
+# dados anteriores (1 leitura da 1ª coluna da faixa) recebem os formatos da staging
+# (PASTE_FORMAT) — data/número que o USER_ENTERED detectou lá, como numa escrita direta.
+# PASTE_NORMAL traz os formatos da staging (quase tudo padrão) por cima da aba viva toda.
+# Com ESCRITA_PASTE=1 o upload na staging vai como pasteData (escrita_paste).
+
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
+
+from cota_sheets import com_retry, log
+from escrita_planejada import escrever_em_lotes
+from escrita_paste import ESCRITA_PASTE, escrever_paste
+from formatos import COLAGEM_COM_FORMATOS, requisicao_descarte
+from leitura_janelada import linhas_usadas
+
+PUBLICACAO_ATOMICA = os.environ.get("PUBLICACAO_ATOMICA", "1") == "1"
+PUBLICACAO_MODO    = os.environ.get("PUBLICACAO_MODO", "copiar")          # copiar | trocar
+PUBLICACAO_PASTE   = os.environ.get("PUBLICACAO_PASTE", "PASTE_VALUES")   # PASTE_NORMAL cola também os formatos da staging
+PREFIXO_STAGING    = "_stg_"
+
+
+def _faixa(sheet_id: int, l0: int, l1: int, c0: int, c1: int) -> dict:
+    return {"sheetId": sheet_id, "startRowIndex": l0, "endRowIndex": l1, "startColumnIndex": c0, "endColumnIndex": c1}
+
+
+def _texto_em(sheet_id: int, cel: str, texto: str) -> dict:
+    r, c = a1_to_rowcol(cel)
+    return {"updateCells": {
+        "start": {"sheetId": sheet_id, "rowIndex": r - 1, "columnIndex": c - 1},
+        "rows": [{"values": [{"userEnteredValue": {"stringValue": texto}}]}],
+        "fields": "userEnteredValue",
+    }}
+
+
+def _descartar(sh, sheet_id: int):
+    try:
+        com_retry(sh.batch_update, {"requests": [{"deleteSheet": {"sheetId": sheet_id}}]},
+                  desc="descartar staging", tipo="escrita")
+    except Exception as e:
+        log(f"⚠️  Staging {sheet_id} não removida (será limpa na próxima execução): {e}")
+
+
+def _publicar(sh, reqs: list, stg_id: int, desc: str):
+    """batchUpdate final; é atômica, então se falhar nada mudou e a staging só é descartada."""
+    try:
+        com_retry(sh.batch_update, {"requests": reqs}, desc=desc, tipo="escrita")
+    except Exception:
+        _descartar(sh, stg_id)
+        raise
+
+
+def criar_staging(ws, linhas_grade: int, cols_grade: int) -> tuple:
+    """Cria a aba oculta de staging (removendo sobras de execuções que caíram). -> (sheetId, título)."""
+    sh = ws.spreadsheet
+    prefixo = f"{PREFIXO_STAGING}{ws.title}_"
+    meta = com_retry(sh.fetch_sheet_metadata, params={"fields": "sheets.properties(sheetId,title)"},
+                     desc="metadados (staging)")
+    reqs = [{"deleteSheet": {"sheetId": s["properties"]["sheetId"]}}
+            for s in meta.get("sheets", []) if s["properties"]["title"].startswith(prefixo)]
+    titulo = f"{prefixo}{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    reqs.append({"addSheet": {"properties": {
+        "title": titulo, "hidden": True,
+        "gridProperties": {"rowCount": max(1, linhas_grade), "columnCount": max(1, cols_grade)},
+    }}})
+    resp = com_retry(sh.batch_update, {"requests": reqs}, desc=f"criar staging {titulo}", tipo="escrita")
+    return resp["replies"][-1]["addSheet"]["properties"]["sheetId"], titulo
+
+
+def publicar(ws, linhas: List[List], largura: int, linha_ini: int = 1, col_ini: int = 1,
+             carimbo_cel: Optional[str] = None, carimbo_final: Optional[str] = None,
+             modo: str = PUBLICACAO_MODO, desc: str = "") -> int:
+    """
+    Substitui a faixa (linha_ini, col_ini, largura) da aba `ws` por `linhas` sem janela
+    vazia: staging -> 1 batchUpdate. Linhas abaixo do novo fim (na faixa) são limpas.
+    Retorna o sheetId da aba publicada (muda no modo 'trocar').
+    """
+    sh = ws.spreadsheet
+    desc = desc or ws.title
+    n = len(linhas)
+    ultima = linha_ini - 1 + n
+    c0, c1 = col_ini - 1, col_ini - 1 + largura
+
+    stg_id, stg_titulo = criar_staging(ws, ultima, c1)
+    log(f"🧪 {desc}: staging '{stg_titulo}' criada; subindo {n} linhas…")
+    try:
+        if ESCRITA_PASTE:
+            escrever_paste(sh.batch_update, stg_id, linhas, linha_ini=linha_ini, col_ini=col_ini,
+                           largura=largura, desc=f"{desc} (staging)")
+        else:
+            escrever_em_lotes(
+                lambda rng, parte: sh.values_update(rng, params={"valueInputOption": "USER_ENTERED"},
+                                                    body={"values": parte}),
+                linhas, linha_ini=linha_ini, col_ini=col_ini, largura=largura, aba=stg_titulo,
+                desc=f"{desc} (staging)",
+            )
+    except Exception:
+        log(f"❌ {desc}: upload na staging falhou — aba viva não foi tocada")
+        _descartar(sh, stg_id)
+        raise
+
+    if modo == "trocar":
+        reqs = [
+            {"deleteSheet": {"sheetId": ws.id}},
+            {"updateSheetProperties": {
+                "properties": {"sheetId": stg_id, "title": ws.title, "index": ws.index, "hidden": False},
+                "fields": "title,index,hidden",
+            }},
+        ]
+        if carimbo_cel and carimbo_final:
+            r, c = a1_to_rowcol(carimbo_cel)
+            if c > c1 or r > ultima:
+                reqs.append({"updateSheetProperties": {
+                    "properties": {"sheetId": stg_id, "gridProperties": {
+                        "rowCount": max(ultima, r, 1), "columnCount": max(c1, c)}},
+                    "fields": "gridProperties.rowCount,gridProperties.columnCount",
+                }})
+            reqs.append(_texto_em(stg_id, carimbo_cel, carimbo_final))
+        _publicar(sh, reqs, stg_id, f"{desc} trocar aba")
+        ws._properties.update(sheetId=stg_id, hidden=False)
+        log(f"🔁 {desc}: staging publicada no lugar da aba (sheetId {stg_id})")
+        return stg_id
+
+    reqs = []
+    rows_alvo, cols_alvo = max(ws.row_count, ultima), max(ws.col_count, c1)
+    if carimbo_cel and carimbo_final:
+        r, c = a1_to_rowcol(carimbo_cel)
+        rows_alvo, cols_alvo = max(rows_alvo, r), max(cols_alvo, c)
+    if (rows_alvo, cols_alvo) != (ws.row_count, ws.col_count):
+        reqs.append({"updateSheetProperties": {
+            "properties": {"sheetId": ws.id, "gridProperties": {"rowCount": rows_alvo, "columnCount": cols_alvo}},
+            "fields": "gridProperties.rowCount,gridProperties.columnCount",
+        }})
+    if n:
+        reqs.append({"copyPaste": {
+            "source": _faixa(stg_id, linha_ini - 1, ultima, c0, c1),
+            "destination": _faixa(ws.id, linha_ini - 1, ultima, c0, c1),
+            "pasteType": PUBLICACAO_PASTE,
+            "pasteOrientation": "NORMAL",
+        }})
+        if PUBLICACAO_PASTE in COLAGEM_COM_FORMATOS:   # formatos da staging por cima: estado de formatos.py não vale mais
+            descarte = requisicao_descarte(ws)
+            if descarte:
+                reqs.append(descarte)
+        else:   # linhas novas: sem formato na aba viva, pegam o que o USER_ENTERED detectou na staging
+            fim_antigo = max(linha_ini - 1, min(ultima, linhas_usadas(ws, linha_ini, rowcol_to_a1(1, col_ini)[:-1], desc)))
+            if fim_antigo < ultima:
+                reqs.append({"copyPaste": {
+                    "source": _faixa(stg_id, fim_antigo, ultima, c0, c1),
+                    "destination": _faixa(ws.id, fim_antigo, ultima, c0, c1),
+                    "pasteType": "PASTE_FORMAT",
+                    "pasteOrientation": "NORMAL",
+                }})
+    if ws.row_count > ultima:
+        reqs.append({"updateCells": {"range": _faixa(ws.id, ultima, ws.row_count, c0, c1), "fields": "userEnteredValue"}})
+    if carimbo_cel and carimbo_final:
+        reqs.append(_texto_em(ws.id, carimbo_cel, carimbo_final))
+    reqs.append({"deleteSheet": {"sheetId": stg_id}})
+
+    _publicar(sh, reqs, stg_id, f"{desc} publicar staging")
+    ws._properties.setdefault("gridProperties", {}).update(rowCount=rows_alvo, columnCount=cols_alvo)
+    log(f"✅ {desc}: {n} linhas publicadas de uma vez (copyPaste {PUBLICACAO_PASTE})")
+    return ws.id
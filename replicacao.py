@@ -0,0 +1,456 @@
+# replicacao.py — réplica consolidada: todas as abas de um destino numa transação só
+#
+# Os 8 replicar_* abriam cada um os mesmos 4 destinos (32 open_by_key) e faziam de 2 a 8
+# idas à API por aba. Aqui cada aba é uma linha da tabela ESPECS; o master é lido numa
+# única values.batchGet (foto do mesmo instante para todas as abas e todos os destinos),
+# cada spec vira um plano de conversão por coluna (conversoes.py) e cada destino recebe:
+#   open_by_key + worksheets + 1 batchUpdate (grades, rabos, status, formatos)
+#   + 1 values.batchUpdate (dados de todas as abas + carimbos)  — ver plano_grade.
+# Abas em REPLICA_PARTICAO vão particionadas por unidade: cada regional recebe só as
+# linhas das suas unidades (unidades.py).
+# REPLICA_COPIA_SERVIDOR=1: specs com copia=True nem passam pelo runner — a aba do master
+# é copiada para o destino no servidor (sheets.copyTo) e colada sobre a aba viva
+# (copyPaste, mesmo sheetId) dentro do batchUpdate do destino; o carimbo vai depois.
+# Os replicar_* viraram atalhos para uma spec só (REPLICA_CONSOLIDADA=0 no orquestrador).
+# SHEETS_ASYNC=1: os 4 destinos vão em paralelo pelo ClienteAsync (sheets_async), cada um
+# com o seu retry; specs atômicas (staging) e cópias no servidor seguem pelo caminho síncrono.
+
+import os
+import sys
+import re
+import json
+import time
+import asyncio
+import pathlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+os.environ.setdefault("TZ", "America/Sao_Paulo")
+try:
+    import time as _t; _t.tzset()
+except Exception:
+    pass
+
+import gspread
+from google.oauth2.service_account import Credentials as SACreds
+from gspread.utils import a1_to_rowcol
+
+from conversoes import compilar_conversao, converter
+from cota_sheets import com_retry, log
+from formatos import (COLAGEM_COM_FORMATOS, DATA, NUMERO, registrar_estado, requisicao_descarte,
+                      requisicoes_formatos)
+from plano_grade import compilar_plano, executar_planos, executar_planos_async
+from publicacao_atomica import PUBLICACAO_ATOMICA, publicar
+from unidades import particionar
+
+# ========= CONFIG =========
+ID_MASTER = '1gDktQhF0WIjfAX76J2yxQqEeeBsSfMUPGs5svbf9xGM'
+DESTINOS = [
+    '1zIfub-pAVtZGSjYT1Qa7HzjAof56VExU7U5WwLE382c',
+    '1NL6fGUhJyde7_ttTkWRVxg78mAOw8Z5W-LBesK_If_M',
+    '10Y7VKFsn-UKgMqpM63LiUD2N9_XmfSr29CuK3mq84_c',
+    '1B-d3mYf7WwiAnkUTV0419f91OzPF8rcpimgtFNfQ3Mw',
+]
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+DESTINO_MAX_TENTATIVAS = 5
+DESTINO_BACKOFF_BASE_S = 5   # 5,10,20,40 s
+PAUSE_BETWEEN_DESTS    = 0.6
+EXTRA_TAIL_ROWS        = 200
+REPLICA_CARIMBAR       = os.environ.get("REPLICA_CARIMBAR", "1") == "1"
+REPLICA_FORMATOS       = os.environ.get("REPLICA_FORMATOS", "0") == "1"   # #,##0.00 / dd/MM/yyyy nas colunas tipadas
+# Cópia server-side das abas verbatim: o master já guarda os valores tipados, então
+# a conversão no runner é dispensada. Copia também os formatos do master (REPLICA_COPIA_PASTE).
+REPLICA_COPIA_SERVIDOR = os.environ.get("REPLICA_COPIA_SERVIDOR", "0") == "1"
+REPLICA_COPIA_PASTE    = os.environ.get("REPLICA_COPIA_PASTE", "PASTE_NORMAL")
+SHEETS_ASYNC           = os.environ.get("SHEETS_ASYNC", "0") == "1"   # httpx só é importado se ligado
+
+# Abas particionadas por unidade: "Aba:Coluna[,Aba:Coluna…]" (coluna da planilha com a
+# unidade). Linha sem unidade ou com unidade fora do mapeamento vai para todos os destinos.
+REPLICA_PARTICAO = os.environ.get("REPLICA_PARTICAO", "Carteira:R")
+
+# ========= ESPECIFICAÇÕES =========
+# Uma entrada por faixa replicada. Campos:
+#   nome          identificador (replicar_*.py rodam uma spec só: main(["LV CICLO"]))
+#   aba / faixa   mesma aba no master e nos destinos; faixa None = aba inteira
+#   linha_ini, col_ini, largura   onde o payload entra no destino (largura None = cabeçalho)
+#   cabecalho     linhas do topo que só são ajustadas à largura (padrão: 1 se linha_ini == 1)
+#   num / data / data_num   colunas (0-based, relativas à faixa) convertidas — ver conversoes.py
+#   cru           não remove apóstrofo nem converte nada; pular_vazias descarta linhas vazias
+#   folga, min_cols, carimbo_cel, carimbo_previo, carimbo_txt   grade e carimbo (plano_grade)
+#   atomica       publica via staging (publicacao_atomica) quando PUBLICACAO_ATOMICA=1
+#   copia         aba verbatim: com REPLICA_COPIA_SERVIDOR=1 vai por copyTo, sem download
+# Mais de uma spec na mesma aba (BD_EXEC) é permitido: faixas disjuntas, grade combinada.
+ESPECS = [
+    dict(nome="Carteira", aba="Carteira", faixa="A1:S", largura=19, cru=True, pular_vazias=False,
+         folga=EXTRA_TAIL_ROWS + 1, min_cols=20, carimbo_cel="T2", carimbo_previo="Atualizando...",
+         carimbo_txt="Replicado em: ", atomica=True),
+    dict(nome="BD_EXEC A:B", aba="BD_EXEC", faixa="A2:B", linha_ini=2, largura=2, data_num=(1,),
+         carimbo_cel="E1", carimbo_previo="Atualizando..."),
+    dict(nome="BD_EXEC F:J", aba="BD_EXEC", faixa="F2:J", linha_ini=2, col_ini=6, largura=5, data_num=(1,),
+         carimbo_cel="E1", carimbo_previo="Atualizando..."),
+    dict(nome="CICLO", aba="CICLO", faixa="D1:T", col_ini=4, largura=17,   # Z fica de fora (carimbo)
+         num=(7, 8, 12), data=(6, 9, 11), carimbo_cel="Z1"),
+    dict(nome="LV CICLO", aba="LV CICLO", faixa="A1:Y", largura=25,
+         num=(5, 10, 19, 21, 22), data=(7,), carimbo_cel="Z1", copia=True),
+    dict(nome="MED PARCIAL", aba="MED PARCIAL", faixa="A1:Q", largura=17, num=(5, 6, 10), carimbo_cel="R1",
+         copia=True),
+    dict(nome="OPERACAO", aba="OPERACAO", faixa="A1:M", largura=13, num=(3,), data=(4,), carimbo_cel="N1",
+         copia=True),
+    dict(nome="zps", aba="zps", faixa=None, largura=None, num=(2, 5, 6), data=(0, 13), carimbo_cel="R1",
+         copia=True),
+]
+
+
+# ========= CREDENCIAIS =========
+def make_creds():
+    env = os.environ.get('GOOGLE_CREDENTIALS')
+    if env:
+        return SACreds.from_service_account_info(json.loads(env), scopes=SCOPES)
+    env_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    if env_path and os.path.isfile(env_path):
+        return SACreds.from_service_account_file(env_path, scopes=SCOPES)
+    script_dir = pathlib.Path(__file__).resolve().parent
+    for p in (script_dir / 'credenciais.json', pathlib.Path.cwd() / 'credenciais.json'):
+        if p.is_file():
+            return SACreds.from_service_account_file(str(p), scopes=SCOPES)
+    raise FileNotFoundError(
+        "Credenciais não encontradas. Defina GOOGLE_CREDENTIALS (JSON) "
+        "ou GOOGLE_APPLICATION_CREDENTIALS (caminho) ou coloque 'credenciais.json'."
+    )
+
+
+# ========= HELPERS =========
+def agora() -> str:
+    return datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+
+
+def colunas_particao(cfg: str) -> Dict[str, int]:
+    """'Carteira:R' -> {'Carteira': 18} (coluna 1-based da unidade)."""
+    out = {}
+    for item in filter(None, (x.strip() for x in cfg.split(","))):
+        aba, col = item.rsplit(":", 1)
+        out[aba.strip()] = a1_to_rowcol(f"{col.strip().upper()}1")[1]
+    return out
+
+
+def faixa_master(spec: Dict) -> str:
+    titulo = "'" + spec["aba"].replace("'", "''") + "'"
+    return f"{titulo}!{spec['faixa']}" if spec["faixa"] else titulo
+
+
+def colunas_faixa(spec: Dict, n_cols: int) -> tuple:
+    """'A1:Y' -> (0, 25) (índices 0-based, fim exclusivo); faixa None = (0, n_cols)."""
+    m = re.match(r"^([A-Z]+)\d*:([A-Z]+)", spec["faixa"] or "")
+    if not m:
+        return 0, n_cols
+    return a1_to_rowcol(f"{m.group(1)}1")[1] - 1, a1_to_rowcol(f"{m.group(2)}1")[1]
+
+
+# ========= MASTER =========
+def snapshot_master(sh, especs: List[Dict]) -> Dict[str, List[List]]:
+    """
+    Foto do master: todas as faixas replicadas numa única values.batchGet, então todos
+    os payloads (e todos os destinos) saem do mesmo instante. -> {faixa_master: valores}.
+    """
+    if not especs:
+        return {}
+    faixas = list(dict.fromkeys(faixa_master(spec) for spec in especs))
+    t0 = time.time()
+    resp = com_retry(sh.values_batch_get, faixas, desc=f"batchGet master ({len(faixas)} faixas)", tipo="leitura")
+    # valueRanges volta na ordem pedida; o range devolvido vem normalizado (A1:S -> A1:S5000)
+    valores = {rng: vr.get("values", []) for rng, vr in zip(faixas, resp.get("valueRanges", []))}
+    log(f"📸 Master: {len(faixas)} faixas, {sum(len(v) for v in valores.values())} linhas em {time.time() - t0:.1f}s")
+    return valores
+
+
+def montar_payloads(valores: Dict[str, List[List]], especs: List[Dict]) -> List[Dict]:
+    """Compila e aplica o plano de conversão de cada spec. Faixa vazia no master = aba não é tocada."""
+    payloads = []
+    particao = colunas_particao(REPLICA_PARTICAO)
+    for spec in especs:
+        rng = faixa_master(spec)
+        vals = valores.get(rng) or []
+        if not vals:
+            log(f"⚠️  {rng}: nada a replicar — aba mantida como está nos destinos")
+            continue
+        linha_ini = spec.get("linha_ini", 1)
+        cabecalho = spec.get("cabecalho", 1 if linha_ini == 1 else 0)
+        largura = spec["largura"] or len(vals[0])
+        plano = compilar_conversao(largura, spec.get("num", ()), spec.get("data", ()), spec.get("data_num", ()),
+                                   cru=spec.get("cru", False))
+        linhas = converter(vals, largura, plano, cabecalho=cabecalho, pular_vazias=spec.get("pular_vazias", True))
+        if len(linhas) <= cabecalho:
+            log(f"⚠️  {rng}: só cabeçalho — aba mantida como está nos destinos")
+            continue
+        p = dict(spec, linhas=linhas, largura=largura, linha_ini=linha_ini, cabecalho=cabecalho)
+        log(f"📦 {spec['nome']}: {len(linhas) - cabecalho} linhas preparadas ({len(plano)} colunas convertidas)")
+        if spec["aba"] in particao:
+            idx = particao[spec["aba"]] - spec.get("col_ini", 1)
+            p["por_destino"] = particionar(linhas, idx, DESTINOS, cabecalho=cabecalho)
+            log(f"   ↳ particionada por unidade: {[len(v) for v in p['por_destino'].values()]} linhas por destino")
+        payloads.append(p)
+    return payloads
+
+
+def faixas_formato(p: Dict) -> List[tuple]:
+    """(coluna, numberFormat, ini, fim) das colunas tipadas da spec (só com REPLICA_FORMATOS=1)."""
+    if not REPLICA_FORMATOS:
+        return []
+    ini = p["linha_ini"] - 1 + p["cabecalho"]
+    fim = p["linha_ini"] - 1 + len(p["linhas"])
+    c0 = p.get("col_ini", 1) - 1
+    return [(c0 + i, fmt, ini, fim)
+            for cols, fmt in ((p.get("num", ()), NUMERO), (p.get("data", ()), DATA))
+            for i in cols if i < p["largura"]]
+
+
+def plano_copia(ws, copia: Dict, spec: Dict, carimbo_final: str) -> Dict:
+    """
+    Plano (formato plano_grade) que cola a cópia server-side `copia` (resposta do copyTo)
+    sobre a aba viva `ws`: grade = grade da cópia, copyPaste das colunas da spec, limpa o
+    que sobrar abaixo, apaga a cópia; o carimbo vai no values.batchUpdate, depois da cola.
+    """
+    g = copia.get("gridProperties", {})
+    n_lin, n_col = g.get("rowCount", 1), g.get("columnCount", 1)
+    c0, c1 = colunas_faixa(spec, n_col)
+    c1 = min(c1, n_col)
+    d0 = spec.get("col_ini", 1) - 1
+    d1 = d0 + (c1 - c0)
+
+    rows_alvo, cols_alvo = n_lin, max(ws.col_count, d1)
+    carimbos = []
+    cel = spec.get("carimbo_cel") if REPLICA_CARIMBAR else None
+    if cel:
+        r, c = a1_to_rowcol(cel)
+        rows_alvo, cols_alvo = max(rows_alvo, r), max(cols_alvo, c)
+        carimbos.append({"range": faixa_master(dict(aba=ws.title, faixa=cel)), "values": [[carimbo_final]]})
+
+    reqs = []
+    if (rows_alvo, cols_alvo) != (ws.row_count, ws.col_count):
+        reqs.append({"updateSheetProperties": {
+            "properties": {"sheetId": ws.id, "gridProperties": {"rowCount": rows_alvo, "columnCount": cols_alvo}},
+            "fields": "gridProperties.rowCount,gridProperties.columnCount",
+        }})
+    reqs.append({"copyPaste": {
+        "source": {"sheetId": copia["sheetId"], "startRowIndex": 0, "endRowIndex": n_lin,
+                   "startColumnIndex": c0, "endColumnIndex": c1},
+        "destination": {"sheetId": ws.id, "startRowIndex": 0, "endRowIndex": n_lin,
+                        "startColumnIndex": d0, "endColumnIndex": d1},
+        "pasteType": REPLICA_COPIA_PASTE,
+        "pasteOrientation": "NORMAL",
+    }})
+    if REPLICA_COPIA_PASTE in COLAGEM_COM_FORMATOS or rows_alvo < ws.row_count:
+        descarte = requisicao_descarte(ws, None if REPLICA_COPIA_PASTE in COLAGEM_COM_FORMATOS else rows_alvo)
+        if descarte:
+            reqs.append(descarte)
+    fim_rabo = min(rows_alvo, ws.row_count)
+    if fim_rabo > n_lin:
+        reqs.append({"updateCells": {
+            "range": {"sheetId": ws.id, "startRowIndex": n_lin, "endRowIndex": fim_rabo,
+                      "startColumnIndex": d0, "endColumnIndex": d1},
+            "fields": "userEnteredValue",
+        }})
+    reqs.append({"deleteSheet": {"sheetId": copia["sheetId"]}})
+    return {"requests": reqs, "dados": [], "carimbos": carimbos, "grade": (ws, rows_alvo, cols_alvo)}
+
+
+# ========= DESTINO =========
+def grade_minima(payloads: List[Dict]) -> Dict[str, tuple]:
+    """Grade mínima por aba: abas com mais de uma faixa precisam da mesma grade em todos os planos."""
+    grade = {}
+    for p in payloads:
+        linhas_p = p["linha_ini"] - 1 + len(p["linhas"]) + p.get("folga", EXTRA_TAIL_ROWS)
+        cols_p = max(p.get("col_ini", 1) + p["largura"] - 1, p.get("min_cols", 0))
+        r, c = grade.get(p["aba"], (0, 0))
+        grade[p["aba"]] = (max(r, linhas_p), max(c, cols_p))
+    return grade
+
+
+def plano_payload(ws, p: Dict, grade: Dict[str, tuple], ts: str) -> Dict:
+    return compilar_plano(
+        ws, p["linhas"], largura=p["largura"], linha_ini=p["linha_ini"], col_ini=p.get("col_ini", 1),
+        folga=p.get("folga", EXTRA_TAIL_ROWS), min_cols=p.get("min_cols", 0),
+        carimbo_cel=p.get("carimbo_cel") if REPLICA_CARIMBAR else None, carimbo_previo=p.get("carimbo_previo"),
+        carimbo_final=f"{p.get('carimbo_txt', 'Atualizado em: ')}{ts}", grade_min=grade[p["aba"]],
+    )
+
+
+def replicar_destino(gc, pid: str, payloads: List[Dict], copias: List[tuple] = ()) -> int:
+    """
+    Todas as abas de um destino em 1 batchUpdate + 1 values.batchUpdate. `copias` =
+    [(spec, ws_master)] replicadas por copyTo (+1 chamada cada). -> nº de chamadas.
+    """
+    payloads = [dict(p, linhas=p["por_destino"][pid]) if "por_destino" in p else p for p in payloads]
+    sh = com_retry(gc.open_by_key, pid, desc=f"open_by_key destino {pid}")
+    abas = {ws.title: ws for ws in com_retry(sh.worksheets, desc=f"worksheets {pid}", tipo="leitura")}
+    chamadas = 2
+    grade = grade_minima(payloads)
+
+    for titulo, (rows, cols) in grade.items():
+        if titulo not in abas:
+            abas[titulo] = com_retry(sh.add_worksheet, title=titulo, rows=max(rows, 1000), cols=max(cols, 26),
+                                     desc=f"add_worksheet {titulo} destino", tipo="escrita")
+            chamadas += 1
+
+    ts = agora()
+    planos = []
+    formatar = {}   # aba -> faixas de formato (todas as faixas da aba num só delta/metadata)
+    for p in payloads:
+        ws = abas[p["aba"]]
+        formatar.setdefault(p["aba"], []).extend(faixas_formato(p))
+        if p.get("atomica") and PUBLICACAO_ATOMICA:
+            # staging oculta + 1 batchUpdate: a aba nunca aparece pela metade
+            publicar(ws, p["linhas"], largura=p["largura"], linha_ini=p["linha_ini"], col_ini=p.get("col_ini", 1),
+                     carimbo_cel=p.get("carimbo_cel") if REPLICA_CARIMBAR else None,
+                     carimbo_final=f"{p.get('carimbo_txt', 'Atualizado em: ')}{ts}", desc=f"{p['nome']} {pid}")
+            continue
+        planos.append(plano_payload(ws, p, grade, ts))
+    # só o delta do que já está formatado em cada aba (formatos.py; 1 leitura de metadata por destino)
+    for titulo, faixas in formatar.items():
+        reqs = requisicoes_formatos(abas[titulo], faixas) if faixas else []
+        if reqs:
+            planos.append({"requests": reqs, "dados": [], "carimbos": [], "grade": None})
+
+    copiadas = []
+    try:
+        for spec, ws_master in copias:
+            copia = com_retry(ws_master.copy_to, pid, desc=f"copyTo {spec['nome']} -> {pid}", tipo="escrita")
+            copiadas.append(copia["sheetId"])
+            chamadas += 1
+            carimbo_final = f"{spec.get('carimbo_txt', 'Atualizado em: ')}{ts}"
+            if spec["aba"] in abas:
+                planos.append(plano_copia(abas[spec["aba"]], copia, spec, carimbo_final))
+            else:   # destino sem a aba: a própria cópia assume o nome
+                cel = spec.get("carimbo_cel") if REPLICA_CARIMBAR else None
+                planos.append({"requests": [{"updateSheetProperties": {
+                    "properties": {"sheetId": copia["sheetId"], "title": spec["aba"], "hidden": False},
+                    "fields": "title,hidden"}}],
+                    "dados": [], "grade": None,
+                    "carimbos": [{"range": faixa_master(dict(aba=spec["aba"], faixa=cel)),
+                                  "values": [[carimbo_final]]}] if cel else []})
+        return chamadas + executar_planos(sh, planos, desc=f"réplica {pid}")
+    except Exception:
+        if copiadas:   # batchUpdate é atômica: se falhou, as cópias ficaram soltas
+            try:
+                com_retry(sh.batch_update, {"requests": [{"deleteSheet": {"sheetId": s}} for s in copiadas]},
+                          desc=f"descartar cópias {pid}", tipo="escrita")
+            except Exception as e:
+                log(f"⚠️  Cópias {copiadas} não removidas de {pid}: {e}")
+        raise
+
+
+async def replicar_destino_async(cli, pid: str, payloads: List[Dict]) -> int:
+    """replicar_destino() pelo ClienteAsync, sem atômicas nem cópias. -> nº de chamadas."""
+    from sheets_async import AbaRemota, PlanilhaRemota
+    payloads = [dict(p, linhas=p["por_destino"][pid]) if "por_destino" in p else p for p in payloads]
+    meta, abas = await cli.abas(pid, metadata=REPLICA_FORMATOS, desc=f"abas {pid}")
+    if REPLICA_FORMATOS:
+        registrar_estado(pid, meta)
+    chamadas = 1
+    grade = grade_minima(payloads)
+
+    novas = [{"addSheet": {"properties": {"title": t, "gridProperties": {
+        "rowCount": max(rows, 1000), "columnCount": max(cols, 26)}}}}
+        for t, (rows, cols) in grade.items() if t not in abas]
+    if novas:
+        resp = await cli.batch_update(pid, {"requests": novas}, desc=f"addSheet destino {pid}")
+        planilha = PlanilhaRemota(pid)
+        for r in resp.get("replies", []):
+            props = r["addSheet"]["properties"]
+            abas[props["title"]] = AbaRemota(planilha, props)
+        chamadas += 1
+
+    ts = agora()
+    planos = [plano_payload(abas[p["aba"]], p, grade, ts) for p in payloads]
+    formatar = {}
+    for p in payloads:
+        formatar.setdefault(p["aba"], []).extend(faixas_formato(p))
+    for titulo, faixas in formatar.items():
+        reqs = requisicoes_formatos(abas[titulo], faixas) if faixas else []
+        if reqs:
+            planos.append({"requests": reqs, "dados": [], "carimbos": [], "grade": None})
+    return chamadas + await executar_planos_async(cli, pid, planos, desc=f"réplica {pid}")
+
+
+def replicar_async(payloads: List[Dict]) -> List[str]:
+    """Todos os DESTINOS em paralelo (1 event loop), cada um com retry/backoff. -> destinos que falharam."""
+    from sheets_async import ClienteAsync, rodar
+
+    async def um(cli, i: int, pid: str) -> bool:
+        log(f"➡️ [{i}/{len(DESTINOS)}] {pid}: {len(payloads)} faixas (async)")
+        for tentativa in range(1, DESTINO_MAX_TENTATIVAS + 1):
+            try:
+                chamadas = await replicar_destino_async(cli, pid, payloads)
+                log(f"✅ {pid}: {len(payloads)} faixas em {chamadas} chamadas à API")
+                return True
+            except Exception as e:
+                log(f"❌ Tentativa {tentativa}/{DESTINO_MAX_TENTATIVAS} falhou para {pid}: {e}")
+                if tentativa == DESTINO_MAX_TENTATIVAS:
+                    return False
+                atraso = DESTINO_BACKOFF_BASE_S * (2 ** (tentativa - 1))
+                log(f"⏳ Repetindo {pid} em {atraso}s…")
+                await asyncio.sleep(atraso)
+
+    async def todos():
+        async with ClienteAsync(make_creds()) as cli:
+            return await asyncio.gather(*(um(cli, i, pid) for i, pid in enumerate(DESTINOS, start=1)))
+
+    return [pid for pid, ok in zip(DESTINOS, rodar(todos())) if not ok]
+
+
+# ========= MAIN =========
+def main(nomes: Optional[List[str]] = None):
+    """Replica as specs `nomes` (todas, se None) para todos os destinos."""
+    especs = [e for e in ESPECS if nomes is None or e["nome"] in nomes]
+    if not especs:
+        raise SystemExit(f"Nenhuma spec com nome em {nomes}")
+    gc = gspread.authorize(make_creds())
+    t0 = time.time()
+
+    sh_master = com_retry(gc.open_by_key, ID_MASTER, desc="open_by_key master")
+    copias = []
+    if REPLICA_COPIA_SERVIDOR and any(e.get("copia") for e in especs):
+        abas_master = {ws.title: ws for ws in com_retry(sh_master.worksheets, desc="worksheets master")}
+        copias = [(e, abas_master[e["aba"]]) for e in especs if e.get("copia") and e["aba"] in abas_master]
+        log(f"🛰️  Cópia no servidor: {', '.join(e['nome'] for e, _ in copias)}")
+    locais = [e for e in especs if all(e is not c for c, _ in copias)]
+
+    payloads = montar_payloads(snapshot_master(sh_master, locais), locais)
+    if not payloads and not copias:
+        log("⚠️ Nada a replicar (todas as faixas vazias).")
+        return
+
+    if SHEETS_ASYNC:
+        assincronas = [p for p in payloads if not (p.get("atomica") and PUBLICACAO_ATOMICA)]
+        payloads = [p for p in payloads if p.get("atomica") and PUBLICACAO_ATOMICA]
+        falhas = replicar_async(assincronas) if assincronas else []
+        if falhas:
+            log(f"⛔️ Não foi possível atualizar {', '.join(falhas)} após {DESTINO_MAX_TENTATIVAS} tentativas. Abortando.")
+            sys.exit(1)
+        if not payloads and not copias:
+            log(f"🏁 Réplica ({', '.join(e['nome'] for e in especs)}) finalizada em {time.time() - t0:.1f}s.")
+            return
+
+    for i, pid in enumerate(DESTINOS, start=1):
+        log(f"➡️ [{i}/{len(DESTINOS)}] {pid}: {len(payloads) + len(copias)} faixas")
+        for tentativa in range(1, DESTINO_MAX_TENTATIVAS + 1):
+            try:
+                chamadas = replicar_destino(gc, pid, payloads, copias)
+                log(f"✅ {pid}: {len(payloads) + len(copias)} faixas em {chamadas} chamadas à API")
+                break
+            except Exception as e:
+                log(f"❌ Tentativa {tentativa}/{DESTINO_MAX_TENTATIVAS} falhou para {pid}: {e}")
+                if tentativa == DESTINO_MAX_TENTATIVAS:
+                    log(f"⛔️ Não foi possível atualizar {pid} após {DESTINO_MAX_TENTATIVAS} tentativas. Abortando.")
+                    sys.exit(1)
+                atraso = DESTINO_BACKOFF_BASE_S * (2 ** (tentativa - 1))
+                log(f"⏳ Repetindo em {atraso}s…")
+                time.sleep(atraso)
+        time.sleep(PAUSE_BETWEEN_DESTS)
+
+    log(f"🏁 Réplica ({', '.join(e['nome'] for e in especs)}) finalizada em {time.time() - t0:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,20 @@
 # replicador_historico.py — rápido, sem formatação, AB/AC numéricos, escrita em lote por destino
-from datetime import datetime
+from datetime import datetime, timedelta
+import os, json, pathlib
 import re
 import time
 import sys
-import unicodedata
 import gspread
-from gspread.exceptions import APIError
+from gspread.exceptions import APIError, WorksheetNotFound
+
+from historico_indice import (CAMPOS_METADADOS, LINHA_INI, REPLICA_CHAVE, blocos_por_dia, ler_estado_replica,
+                              ler_indice, metadado_da_aba, plano_replica, requisicao_metadado)
+from historico_shards import (ABA_INDICE_SHARDS, HISTORICO_SHARDS, abas_da_janela, aba_do_mes, ler_indice_shards,
+                              linhas_dos_dias, meses_da_faixa)
+from historico_scd import ABA_SCD
+from elegibilidade_ae import AE_ESTATICO, FAIXA_ESTEIRA, FORMULA_AE, IDX_AE, chaves_esteira, coluna_ae
+from leitura_janelada import ler_em_janelas
+from unidades import UNIDADES_POR_DESTINO, norm as _norm
 
 # === CONFIG ===
 ID_ORIGEM       = "1gDktQhF0WIjfAX76J2yxQqEeeBsSfMUPGs5svbf9xGM"
@@ -13,47 +22,39 @@ ABA_HISTORICO   = "Historico"
 CAMINHO_CRED    = "credenciais.json"  # fallback local
 
 # === DESTINOS ===
-PID_IRECE        = "1zIfub-pAVtZGSjYT1Qa7HzjAof56VExU7U5WwLE382c"
-PID_BAR_IBO      = "1NL6fGUhJyde7_ttTkWRVxg78mAOw8Z5W-LBesK_If_M"
-PID_BRU_GUA_LIV_LAPA = "10Y7VKFsn-UKgMqpM63LiUD2N9_XmfSr29CuK3mq84_c"
-PID_VC_JEQ_ITA   = "1B-d3mYf7WwiAnkUTV0419f91OzPF8rcpimgtFNfQ3Mw"
-
-# Mapeamento: planilha → conjunto de unidades (coluna AD) permitidas
-def _norm(s: str) -> str:
-    s = (s or "").strip().upper()
-    s = unicodedata.normalize("NFD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = re.sub(r"\s+", " ", s)
-    return s
-
-MAPEAMENTO_DESTINOS = {
-    PID_IRECE: { _norm("IRECE") },
-    PID_BAR_IBO: { _norm("BARREIRAS"), _norm("IBOTIRAMA") },
-    PID_BRU_GUA_LIV_LAPA: {
-        _norm("BRUMADO"),
-        _norm("GUANAMBI"),
-        _norm("LIVRAMENTO"),
-        _norm("BOM JESUS DA LAPA"),
-    },
-    PID_VC_JEQ_ITA: {
-        _norm("VITORIA DA CONQUISTA"),
-        _norm("JEQUIE"),
-        _norm("ITAPETINGA"),
-    },
-}
+# Mapeamento: planilha → conjunto de unidades (coluna AD) permitidas (ver unidades.py)
+MAPEAMENTO_DESTINOS = UNIDADES_POR_DESTINO
 
 PLANILHAS_DESTINO = list(MAPEAMENTO_DESTINOS.keys())
 
-# Fórmula fixa em AE3 (mantida)
-FORMULA_AE = '=ARRAYFORMULA(SE(B3:B=""; ""; SE((AD3:AD="-") + ÉERROS(PROCH(AD3:AD; Esteira!$B$1:$K$1; 1; 0)); 0; 1)))'
+# AE: fórmula fixa em AE3 (FORMULA_AE) ou, com AE_ESTATICO=1, valores calculados a partir
+# do cabeçalho da Esteira de cada destino (elegibilidade_ae.py)
 
 # Retries
 RETRY_CRIT = (1, 3, 7, 15)    # backoff para operações críticas
 MAX_TENTATIVAS_DEST = 5
 DEST_BACKOFF_BASE_S = 5        # 5,10,20,40,80s
 
+# SHEETS_ASYNC=1: os destinos em paralelo pelo ClienteAsync (sheets_async), 4 chamadas cada
+# (abas + 1 batchUpdate com grade/limpezas + 1 values.batchUpdate + 1 batchUpdate do estado)
+SHEETS_ASYNC = os.environ.get("SHEETS_ASYNC", "0") == "1"
+
+# REPLICA_MODO: incremental (padrão) — cada destino guarda em developer metadata da aba
+# Historico os dias que recebeu ([[dia, nº de linhas, hash], ...]) e só os dias novos ou
+# alterados são escritos (ver plano_escrita); completo — reescreve tudo a partir de A3
+REPLICA_MODO = os.environ.get("REPLICA_MODO", "incremental").strip().lower()
+
+# HISTORICO_ARMAZENAMENTO=scd (importador_historico): a origem é a aba de versões, que
+# vai para a aba Historico dos destinos com o mesmo filtro por AD (+ AM/AN)
+ABA_ORIGEM_HIST = ABA_SCD if os.environ.get("HISTORICO_ARMAZENAMENTO", "snapshot").strip().lower() == "scd" else ABA_HISTORICO
+
+# HISTORICO_SHARDS=1 (snapshot): a mestre tem uma aba por mês (historico_shards.py); a
+# origem é a janela dos últimos HISTORICO_HORIZONTE_DIAS + hoje, lida só dos shards dela
+SHARDS = HISTORICO_SHARDS and ABA_ORIGEM_HIST == ABA_HISTORICO
+HISTORICO_HORIZONTE_DIAS = int(os.environ.get("HISTORICO_HORIZONTE_DIAS", "7"))
+BASE_SERIAL = datetime(1899, 12, 30)
+
 # === AUTENTICAÇÃO (Secret ou arquivo local) ===
-import os, json, pathlib
 from google.oauth2.service_account import Credentials
 
 SCOPES = [
@@ -88,14 +89,6 @@ def _retry(delays, fn, *args, op_name=None, **kwargs):
                 raise
             time.sleep(d)
 
-def _col_index_to_letter_1b(index: int) -> str:
-    # 1->A, 2->B, ... 27->AA
-    res = ""
-    while index > 0:
-        index, rem = divmod(index - 1, 26)
-        res = chr(rem + ord('A')) + res
-    return res
-
 def _clean_number_brl(val: str):
     """Converte '1.234,56' -> 1234.56; vazio/ruído -> ''."""
     s = (val or "").strip()
@@ -118,82 +111,123 @@ def tratar_linha_AB_AC(row, ncols):
         r[28] = _clean_number_brl(r[28])
     return r
 
-def _garantir_grid(ws, linhas_dados, cab2):
-    """
-    Garante que a planilha tenha linhas/colunas suficientes para escrever:
-      - Dados a partir de A3 (nlin = len(linhas_dados) => última linha = 2 + nlin)
-      - Colunas pelo menos até len(cab2) e até AE (coluna 31) para a fórmula
-    """
-    nlin = len(linhas_dados)
-    ncols_cab = len(cab2) if cab2 else (len(linhas_dados[0]) if nlin else 1)
-
-    rows_needed = 2 + nlin                # A3..A{2+nlin}
-    cols_needed = max(ncols_cab, 31)      # garantir AE
+def _limpar_valores(sid, r0, r1, c0, c1):
+    """updateCells sem linhas = values_clear da faixa (índices 0-based, fim exclusivo)."""
+    return {"updateCells": {
+        "range": {"sheetId": sid, "startRowIndex": r0, "endRowIndex": r1,
+                  "startColumnIndex": c0, "endColumnIndex": c1},
+        "fields": "userEnteredValue",
+    }}
 
-    if ws.row_count < rows_needed:
-        _retry(RETRY_CRIT, ws.resize, rows_needed, ws.col_count, op_name='resize rows')
-    current_rows = max(ws.row_count, rows_needed)
-
-    if ws.col_count < cols_needed:
-        _retry(RETRY_CRIT, ws.resize, current_rows, cols_needed, op_name='resize cols')
-
-def escrever_destino(ws, cab1, cab2, linhas_tratadas):
+def plano_escrita(ws, meta, cab1, cab2, linhas_tratadas, chaves_ae=None):
     """
-    Escreve:
-      - A1: cabeçalho 1
-      - A2: cabeçalho 2
-      - A3: dados (todas as colunas do cabeçalho 2)
-      - AE3: fórmula ARRAYFORMULA (após limpar AE)
-      - Limpa rabo abaixo do último dado (A..lastcol) somente se existir
+    -> (requests da batchUpdate de grade/limpeza, payload de valores, request do estado novo, resumo).
+    chaves_ae (AE_ESTATICO): cabeçalho da Esteira do destino; AE vai nas linhas (e no hash).
+    Com estado válido no destino (REPLICA_CHAVE) só os dias novos/alterados são escritos:
+    dias expirados saem do topo (deleteDimension), os blocos iguais ficam e o rabo só é
+    limpo se a partição encolheu (semana reparada na mestre). Sem estado (1ª execução,
+    escrita anterior interrompida, REPLICA_MODO=completo) reescreve tudo a partir de A3.
+    O estado é invalidado na 1ª batchUpdate e regravado só depois dos valores.
     """
     nlin = len(linhas_tratadas)
-    ncols = len(cab2) if cab2 else (len(linhas_tratadas[0]) if nlin else 1)
-    last_col_letter = _col_index_to_letter_1b(ncols)
-
-    # 0) Garante grid suficiente ANTES de qualquer clear/write
-    _garantir_grid(ws, linhas_tratadas, cab2)
+    ncols = (len(cab2) if cab2 else (len(linhas_tratadas[0]) if nlin else 0)) or 1
+    if chaves_ae is not None and ncols > IDX_AE:
+        # cópias: as linhas tratadas são compartilhadas entre destinos
+        linhas_tratadas = [r[:IDX_AE] + [v] + r[IDX_AE + 1:]
+                           for r, v in zip(linhas_tratadas, coluna_ae(linhas_tratadas, chaves_ae))]
+    novo = blocos_por_dia(linhas_tratadas)
+    meta_id, valor = metadado_da_aba(meta, ws.id, REPLICA_CHAVE)
+    antigo = ler_estado_replica(valor) if (REPLICA_MODO == "incremental" and meta_id is not None) else None
+    if antigo is not None and ws.row_count < LINHA_INI - 1 + sum(n for _, n, _ in antigo):
+        antigo = None   # grade menor que o estado: destino mexido à mão
 
-    # 1) Limpa rabo antigo abaixo do novo final (A..last_col) — só se existir
-    if nlin > 0:
-        ultima = 2 + nlin
-        tail_start = ultima + 1
-        if tail_start <= ws.row_count:
-            _retry(RETRY_CRIT, ws.spreadsheet.values_clear,
-                   f"'{ws.title}'!A{tail_start}:{last_col_letter}", op_name='clear tail')
-
-    # 2) Limpa AE (para a ARRAYFORMULA expandir)
-    _retry(RETRY_CRIT, ws.spreadsheet.values_clear, f"'{ws.title}'!AE3:AE", op_name='clear AE')
-
-    # 3) Payload único
     payload = []
     if cab1:
-        payload.append({"range": f"{ws.title}!A1", "values": [cab1]})
+        payload.append({"range": f"{ABA_HISTORICO}!A1", "values": [cab1]})
     if cab2:
-        payload.append({"range": f"{ws.title}!A2", "values": [cab2]})
-    if nlin > 0:
-        payload.append({"range": f"{ws.title}!A3", "values": linhas_tratadas})
-        payload.append({"range": f"{ws.title}!AE3", "values": [[FORMULA_AE]]})
+        payload.append({"range": f"{ABA_HISTORICO}!A2", "values": [cab2]})
+    payload_ae = [] if chaves_ae is not None else [{"range": f"{ABA_HISTORICO}!AE3", "values": [[FORMULA_AE]]}]
+    if nlin == 0:
+        # nada filtrado para o destino: só cabeçalhos, sem limpar nem mexer no estado
+        return [], payload + payload_ae, None, "sem linhas"
+
+    if antigo is None:
+        p = {"apagar": 0, "iguais": 0, "linha_ini": LINHA_INI, "fim_antigo": ws.row_count}
     else:
-        payload.append({"range": f"{ws.title}!AE3", "values": [[FORMULA_AE]]})
-
-    _retry(
-        RETRY_CRIT,
-        ws.spreadsheet.values_batch_update,
-        body={"valueInputOption": "USER_ENTERED", "data": payload},
-        op_name='values_batch_update'
-    )
+        p = plano_replica(antigo, novo)
+    fim_novo = LINHA_INI - 1 + nlin
+    rows_apos = ws.row_count - p["apagar"]
+    rows = max(rows_apos, fim_novo)
+    cols = max(ws.col_count, ncols, 31)   # garantir AE
+
+    reqs = []
+    if meta_id is not None:
+        reqs.append(requisicao_metadado(ws.id, meta_id, REPLICA_CHAVE, ""))
+    if p["apagar"]:
+        reqs.append({"deleteDimension": {"range": {
+            "sheetId": ws.id, "dimension": "ROWS",
+            "startIndex": LINHA_INI - 1, "endIndex": LINHA_INI - 1 + p["apagar"]}}})
+    if (rows, cols) != (rows_apos, ws.col_count):
+        reqs.append({"updateSheetProperties": {
+            "properties": {"sheetId": ws.id, "gridProperties": {"rowCount": rows, "columnCount": cols}},
+            "fields": "gridProperties.rowCount,gridProperties.columnCount"}})
+    if p["fim_antigo"] > fim_novo:
+        reqs.append(_limpar_valores(ws.id, fim_novo, min(p["fim_antigo"], rows), 0, ncols))
+    if antigo is None and chaves_ae is None:
+        reqs.append(_limpar_valores(ws.id, LINHA_INI - 1, rows, IDX_AE, IDX_AE + 1))   # AE livre para a ARRAYFORMULA
+
+    escrever = linhas_tratadas[p["linha_ini"] - LINHA_INI:]
+    if escrever:
+        payload.append({"range": f"{ABA_HISTORICO}!A{p['linha_ini']}", "values": escrever})
+    payload.extend(payload_ae)   # A3 pode ter saído no deleteDimension
+
+    req_estado = requisicao_metadado(ws.id, meta_id, REPLICA_CHAVE, json.dumps(novo, separators=(",", ":")))
+    if antigo is None:
+        resumo = f"completa: {nlin} linhas"
+    else:
+        resumo = (f"incremental: {p['apagar']} expiradas, {p['iguais']}/{len(novo)} dias iguais, "
+                  f"{len(escrever)} linhas a partir de A{p['linha_ini']}")
+    return reqs, payload, req_estado, resumo
 
-def replicar_para(planilha_id, cab1, cab2, linhas):
+def particionar_tratadas(linhas, idx, ncols):
+    """
+    Uma passada nas linhas da origem -> {pid: linhas já tratadas (AB/AC, largura ncols)}.
+    _norm(AD) memoizado por valor distinto; cada linha é tratada uma vez e vai para o(s)
+    destino(s) da unidade. AD vazio ou fora do mapeamento não vai para nenhum destino.
+    """
+    out = {pid: [] for pid in PLANILHAS_DESTINO}
+    destinos_de = {}
+    for l in linhas:
+        v = l[idx] if len(l) > idx else None
+        if v not in destinos_de:
+            u = _norm(v) if v is not None else None
+            destinos_de[v] = [pid for pid in PLANILHAS_DESTINO if u in MAPEAMENTO_DESTINOS.get(pid, set())]
+        pids = destinos_de[v]
+        if pids:
+            r = tratar_linha_AB_AC(l, ncols)
+            for pid in pids:
+                out[pid].append(r)
+    return out
+
+def replicar_para(planilha_id, cab1, cab2, linhas_tratadas):
+    """linhas_tratadas: já na largura do cabeçalho 2 e com AB/AC numéricos (particionar_tratadas)."""
     print(f"\n📁 Atualizando planilha destino: {planilha_id}", flush=True)
     book = gc.open_by_key(planilha_id)
     ws = book.worksheet(ABA_HISTORICO)
-
-    # Ajusta linhas: mantém largura do cabeçalho 2; trata AB/AC
-    ncols = len(cab2) if cab2 else (len(linhas[0]) if linhas else 0)
-    linhas_tratadas = [tratar_linha_AB_AC(l, ncols) for l in linhas]
-
-    escrever_destino(ws, cab1, cab2, linhas_tratadas)
-    print(f"✅ Finalizado: {len(linhas_tratadas)} linhas coladas.", flush=True)
+    meta = _retry(RETRY_CRIT, book.fetch_sheet_metadata, params={"fields": CAMPOS_METADADOS}, op_name='metadados')
+    chaves = None
+    if AE_ESTATICO:
+        chaves = chaves_esteira(_retry(RETRY_CRIT, book.values_get, FAIXA_ESTEIRA, op_name='get cabeçalho Esteira'))
+
+    reqs, payload, req_estado, resumo = plano_escrita(ws, meta, cab1, cab2, linhas_tratadas, chaves)
+    print(f"🧾 Escrita {resumo}", flush=True)
+    if reqs:
+        _retry(RETRY_CRIT, book.batch_update, {"requests": reqs}, op_name='grade/limpeza')
+    _retry(RETRY_CRIT, book.values_batch_update,
+           body={"valueInputOption": "USER_ENTERED", "data": payload}, op_name='values_batch_update')
+    if req_estado:
+        _retry(RETRY_CRIT, book.batch_update, {"requests": [req_estado]}, op_name='estado da réplica')
+    print(f"✅ Finalizado: {len(linhas_tratadas)} linhas no destino.", flush=True)
 
 def tentar_ate_dar_certo(planilha_id, cab1, cab2, linhas):
     for tentativa in range(1, MAX_TENTATIVAS_DEST + 1):
@@ -210,10 +244,111 @@ def tentar_ate_dar_certo(planilha_id, cab1, cab2, linhas):
                 print("⛔️ Abortando: não foi possível atualizar todos os destinos.", flush=True)
                 sys.exit(1)
 
+# === CAMINHO ASYNC (SHEETS_ASYNC=1) ===
+async def replicar_para_async(cli, planilha_id, cab1, cab2, linhas_tratadas):
+    print(f"\n📁 Atualizando planilha destino (async): {planilha_id}", flush=True)
+    meta, abas = await cli.abas(planilha_id, metadata=True, desc=f"abas {planilha_id}")
+    if ABA_HISTORICO not in abas:
+        raise RuntimeError(f"Aba '{ABA_HISTORICO}' não encontrada em {planilha_id}")
+    ws = abas[ABA_HISTORICO]
+    chaves = None
+    if AE_ESTATICO:
+        chaves = chaves_esteira({"values": await cli.values_get(planilha_id, FAIXA_ESTEIRA,
+                                                                desc=f"cabeçalho Esteira {planilha_id}")})
+
+    reqs, payload, req_estado, resumo = plano_escrita(ws, meta, cab1, cab2, linhas_tratadas, chaves)
+    print(f"🧾 {planilha_id}: escrita {resumo}", flush=True)
+    if reqs:
+        await cli.batch_update(planilha_id, {"requests": reqs}, desc=f"grade/limpeza {planilha_id}")
+    await cli.values_batch_update(planilha_id, {"valueInputOption": "USER_ENTERED", "data": payload},
+                                  desc=f"values_batch_update {planilha_id}")
+    if req_estado:
+        await cli.batch_update(planilha_id, {"requests": [req_estado]}, desc=f"estado da réplica {planilha_id}")
+    print(f"✅ Finalizado {planilha_id}: {len(linhas_tratadas)} linhas no destino.", flush=True)
+
+def replicar_todos_async(por_destino):
+    """por_destino = {pid: linhas tratadas}; todos em paralelo, cada um com MAX_TENTATIVAS_DEST."""
+    import asyncio
+    from sheets_async import ClienteAsync, rodar
+
+    async def um(cli, pid, linhas):
+        for tentativa in range(1, MAX_TENTATIVAS_DEST + 1):
+            try:
+                if tentativa > 1:
+                    atraso = DEST_BACKOFF_BASE_S * (2 ** (tentativa - 2))
+                    print(f"🔁 {pid}: tentativa {tentativa}/{MAX_TENTATIVAS_DEST} — aguardando {atraso}s", flush=True)
+                    await asyncio.sleep(atraso)
+                await replicar_para_async(cli, pid, cabecalho_1, cabecalho_2, linhas)
+                return True
+            except Exception as e:
+                print(f"❌ Erro ao atualizar {pid}: {e}", flush=True)
+        return False
+
+    async def todos():
+        async with ClienteAsync(make_creds()) as cli:
+            return await asyncio.gather(*(um(cli, pid, l) for pid, l in por_destino.items()))
+
+    if not all(rodar(todos())):
+        print("⛔️ Abortando: não foi possível atualizar todos os destinos.", flush=True)
+        sys.exit(1)
+
+# === LEITURA DOS SHARDS (HISTORICO_SHARDS=1) ===
+def _serial_data(v):
+    """dd/mm/aaaa ou o serial cru (shard sem formato de data em A) -> serial."""
+    s = str(v).strip()
+    try:
+        return (datetime.strptime(s, "%d/%m/%Y") - BASE_SERIAL).days
+    except ValueError:
+        try:
+            return int(float(s))
+        except ValueError:
+            return None
+
+def ler_janela_shards(book):
+    """[cabeçalho 1, cabeçalho 2] do shard mais recente + linhas da janela, na ordem dos meses."""
+    hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    ini = hoje - timedelta(days=HISTORICO_HORIZONTE_DIAS)
+    s_ini, s_hoje = (ini - BASE_SERIAL).days, (hoje - BASE_SERIAL).days
+    try:
+        indice = ler_indice_shards(_retry(RETRY_CRIT, book.worksheet(ABA_INDICE_SHARDS).get, "A2:E",
+                                          op_name='get índice de shards') or [])
+    except WorksheetNotFound:
+        indice = {}
+    no_indice, fora = abas_da_janela(indice, ini, hoje)
+    existentes = {ws.title: ws for ws in book.worksheets()} if fora else {}
+    if fora:
+        print(f"⚠️ Shards fora do índice: {fora}", flush=True)
+
+    cab, linhas = [[], []], []
+    for m in meses_da_faixa(ini, hoje):
+        nome = aba_do_mes(m)
+        if nome in no_indice:
+            ws = book.worksheet(nome)
+        elif nome in existentes:
+            ws = existentes[nome]
+        else:
+            continue
+        _, dias = ler_indice(ws)
+        if dias is not None:
+            faixa = linhas_dos_dias(dias, s_ini, s_hoje)
+            vals = ler_em_janelas(ws, f"A{faixa[0]}:AL{faixa[1]}", retangular=True, desc=f'get {nome}') if faixa else []
+        else:   # shard sem índice: lê inteiro e filtra pela data em A
+            vals = [l for l in (ler_em_janelas(ws, retangular=True, desc=f'get {nome}') or [])[2:]
+                    if l and s_ini <= (_serial_data(l[0]) or -1) <= s_hoje]
+        print(f"📚 {nome}: {len(vals)} linhas da janela", flush=True)
+        linhas.extend(vals or [])
+        cab = [(list(r) + [""] * 38)[:38] for r in (_retry(RETRY_CRIT, ws.get, "A1:AL2", op_name=f'cabeçalho {nome}') or [])]
+        cab += [[]] * (2 - len(cab))
+    return cab + linhas
+
 # === LEITURA DA PLANILHA ORIGINAL ===
-print("📥 Lendo dados da aba 'Historico' da planilha principal...")
-orig = gc.open_by_key(ID_ORIGEM).worksheet(ABA_HISTORICO)
-dados = _retry(RETRY_CRIT, orig.get_all_values, op_name='get_all_values') or []
+if SHARDS:
+    print(f"📥 Lendo a janela de {HISTORICO_HORIZONTE_DIAS} dias dos shards mensais da planilha principal...")
+    dados = ler_janela_shards(gc.open_by_key(ID_ORIGEM))
+else:
+    print(f"📥 Lendo dados da aba '{ABA_ORIGEM_HIST}' da planilha principal...")
+    orig = gc.open_by_key(ID_ORIGEM).worksheet(ABA_ORIGEM_HIST)
+    dados = ler_em_janelas(orig, retangular=True, desc='get_all_values') or []
 cabecalho_1 = dados[0] if len(dados) > 0 else []
 cabecalho_2 = dados[1] if len(dados) > 1 else []
 linhas_dados = dados[2:] if len(dados) > 2 else []
@@ -222,13 +357,15 @@ print(f"✅ {len(linhas_dados)} linhas carregadas com sucesso.\n")
 # Índice zero-based da coluna AD (A=0 ... Z=25, AA=26, AB=27, AC=28, AD=29)
 IDX_AD = 29
 
-# === EXECUTA PARA TODOS OS DESTINOS COM FILTRO PRÉVIO POR AD ===
-for pid in PLANILHAS_DESTINO:
+# === PARTIÇÃO POR AD (uma passada) E ESCRITA EM CADA DESTINO ===
+ncols_dest = len(cabecalho_2) if cabecalho_2 else (len(linhas_dados[0]) if linhas_dados else 0)
+por_destino = particionar_tratadas(linhas_dados, IDX_AD, ncols_dest)
+for pid, filtradas in por_destino.items():
     permitidos = MAPEAMENTO_DESTINOS.get(pid, set())
-    # filtra somente linhas com AD presente e dentro do conjunto permitido
-    filtradas = [
-        l for l in linhas_dados
-        if len(l) > IDX_AD and _norm(l[IDX_AD]) in permitidos
-    ]
     print(f"🧮 Destino {pid}: {len(filtradas)} linhas após filtro AD ∈ {sorted(list(permitidos))}", flush=True)
-    tentar_ate_dar_certo(pid, cabecalho_1, cabecalho_2, filtradas)
+
+if SHEETS_ASYNC:
+    replicar_todos_async(por_destino)
+else:
+    for pid, filtradas in por_destino.items():
+        tentar_ate_dar_certo(pid, cabecalho_1, cabecalho_2, filtradas)
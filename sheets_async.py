@@ -0,0 +1,181 @@
+# sheets_async.py — cliente assíncrono (httpx) da Sheets/Drive API para as fases de fan-out
+#
+# gspread/googleapiclient são síncronos: concorrência só com threads e um cliente por
+# thread. Aqui um único httpx.AsyncClient num só thread mantém dezenas de requisições
+# em voo. Ritmo e concorrência são do GOVERNADOR de cota_sheets: cada requisição reserva
+# seu horário (req/min por tipo), um 429 pausa todo mundo — síncrono ou assíncrono — e o
+# limite em voo é GOVERNADOR.concorrencia_async (COTA_CONCORRENCIA_ASYNC). Retry igual ao com_retry (mesmos códigos transitórios, backoff + jitter).
+# Mesma autenticação: as Credentials de service account de make_creds(), com refresh do
+# token fora do event loop. Ative com SHEETS_ASYNC=1 nos scripts que têm o caminho async.
+
+import os
+import random
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+from google.auth.transport.requests import Request as GARequest
+
+from cota_sheets import BASE_SLEEP, GOVERNADOR, MAX_RETRIES, codigo_http, eh_transitorio, log
+
+SHEETS_ASYNC    = os.environ.get("SHEETS_ASYNC", "0") == "1"
+ASYNC_TIMEOUT_S = float(os.environ.get("ASYNC_TIMEOUT_S", "180"))
+
+URL_SHEETS = "https://sheets.googleapis.com/v4/spreadsheets"
+URL_DRIVE  = "https://www.googleapis.com/drive/v3/files"
+
+
+class ErroApiAsync(Exception):
+    """Resposta HTTP de erro; .response.status_code como no APIError do gspread (codigo_http lê)."""
+
+    def __init__(self, response: "httpx.Response"):
+        self.response = response
+        super().__init__(f"[{response.status_code}] {response.text[:500]}")
+
+
+# ========= ABAS (o mínimo de gspread que plano_grade/formatos usam) =========
+class PlanilhaRemota:
+    def __init__(self, spreadsheet_id: str):
+        self.id = spreadsheet_id
+
+
+class AbaRemota:
+    """id, title, index, row_count, col_count e _properties, como gspread.Worksheet."""
+
+    def __init__(self, planilha: PlanilhaRemota, propriedades: dict):
+        self.spreadsheet = planilha
+        self._properties = propriedades
+
+    @property
+    def id(self) -> int:
+        return self._properties["sheetId"]
+
+    @property
+    def title(self) -> str:
+        return self._properties["title"]
+
+    @property
+    def index(self) -> int:
+        return self._properties.get("index", 0)
+
+    @property
+    def row_count(self) -> int:
+        return self._properties.get("gridProperties", {}).get("rowCount", 0)
+
+    @property
+    def col_count(self) -> int:
+        return self._properties.get("gridProperties", {}).get("columnCount", 0)
+
+
+# ========= CLIENTE =========
+class ClienteAsync:
+    """
+    async with ClienteAsync(creds) as cli:
+        valores = await cli.values_get(pid, "Aba!A1:C")
+    """
+
+    def __init__(self, creds, em_voo: Optional[int] = None, governador=GOVERNADOR):
+        self.creds = creds
+        self.governador = governador
+        self.em_voo = max(1, em_voo or governador.concorrencia_async)
+        self._http: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._lock_token: Optional[asyncio.Lock] = None
+
+    async def __aenter__(self):
+        self._http = httpx.AsyncClient(
+            timeout=ASYNC_TIMEOUT_S,
+            limits=httpx.Limits(max_connections=self.em_voo, max_keepalive_connections=self.em_voo),
+        )
+        self._sem = asyncio.Semaphore(self.em_voo)
+        self._lock_token = asyncio.Lock()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._http.aclose()
+
+    async def _token(self, renovar: bool = False) -> str:
+        async with self._lock_token:
+            if renovar or not self.creds.valid:
+                await asyncio.to_thread(self.creds.refresh, GARequest())
+            return self.creds.token
+
+    async def _pedir(self, metodo: str, url: str, desc: str = "", tipo: str = "leitura",
+                     max_retries: int = MAX_RETRIES, **kwargs) -> "httpx.Response":
+        tent = 0
+        renovar = False
+        while True:
+            espera = self.governador.reservar(tipo)
+            if espera > 0:
+                await asyncio.sleep(espera)
+            try:
+                async with self._sem:
+                    token = await self._token(renovar)
+                    r = await self._http.request(metodo, url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+                if r.status_code == 401 and not renovar:   # token expirou no meio: renova e repete já
+                    renovar = True
+                    continue
+                if r.status_code >= 400:
+                    raise ErroApiAsync(r)
+                return r
+            except Exception as e:
+                tent += 1
+                renovar = False
+                if not eh_transitorio(e) or tent >= max_retries:
+                    log(f"❌ {desc or url}: {e}")
+                    raise
+                code = codigo_http(e)
+                slp = min(60.0, BASE_SLEEP * (2 ** (tent - 1)) + random.uniform(0, 0.75))
+                if code == 429:
+                    self.governador.penalizar(slp)
+                log(f"⚠️  {desc or url}: HTTP {code} — retry {tent}/{max_retries-1} em {slp:.1f}s")
+                await asyncio.sleep(slp)
+
+    # ----- Sheets -----
+    async def get(self, spreadsheet_id: str, fields: Optional[str] = None, desc: str = "") -> dict:
+        params = {"fields": fields} if fields else {}
+        r = await self._pedir("GET", f"{URL_SHEETS}/{spreadsheet_id}", desc=desc or f"get {spreadsheet_id}",
+                              params=params)
+        return r.json()
+
+    async def abas(self, spreadsheet_id: str, metadata: bool = False, desc: str = "") -> Tuple[dict, Dict[str, AbaRemota]]:
+        """1 chamada -> (metadados brutos, {título: AbaRemota}); metadata=True traz developerMetadata."""
+        campos = "sheets(properties(sheetId,title,index,gridProperties)" + (",developerMetadata)" if metadata else ")")
+        meta = await self.get(spreadsheet_id, fields=campos, desc=desc or f"abas {spreadsheet_id}")
+        planilha = PlanilhaRemota(spreadsheet_id)
+        return meta, {s["properties"]["title"]: AbaRemota(planilha, s["properties"]) for s in meta.get("sheets", [])}
+
+    async def values_get(self, spreadsheet_id: str, faixa: str, desc: str = "",
+                         render: str = "FORMATTED_VALUE") -> List[List]:
+        r = await self._pedir("GET", f"{URL_SHEETS}/{spreadsheet_id}/values/{quote(faixa, safe='!:')}",
+                              desc=desc or f"values_get {faixa}", params={"valueRenderOption": render})
+        return r.json().get("values", []) or []
+
+    async def values_batch_get(self, spreadsheet_id: str, faixas: List[str], desc: str = "",
+                               render: str = "FORMATTED_VALUE") -> List[dict]:
+        r = await self._pedir("GET", f"{URL_SHEETS}/{spreadsheet_id}/values:batchGet",
+                              desc=desc or f"values_batch_get ({len(faixas)} faixas)",
+                              params=[("ranges", f) for f in faixas] + [("valueRenderOption", render)])
+        return r.json().get("valueRanges", [])
+
+    async def values_batch_update(self, spreadsheet_id: str, body: dict, desc: str = "") -> dict:
+        r = await self._pedir("POST", f"{URL_SHEETS}/{spreadsheet_id}/values:batchUpdate",
+                              desc=desc or "values_batch_update", tipo="escrita", json=body)
+        return r.json()
+
+    async def batch_update(self, spreadsheet_id: str, body: dict, desc: str = "") -> dict:
+        r = await self._pedir("POST", f"{URL_SHEETS}/{spreadsheet_id}:batchUpdate",
+                              desc=desc or "batch_update", tipo="escrita", json=body)
+        return r.json()
+
+    # ----- Drive -----
+    async def drive_baixar(self, file_id: str, desc: str = "") -> bytes:
+        r = await self._pedir("GET", f"{URL_DRIVE}/{file_id}", desc=desc or f"drive {file_id}",
+                              params={"alt": "media", "supportsAllDrives": "true"})
+        return r.content
+
+
+def rodar(coro):
+    """Roda uma corrotina a partir de código síncrono (scripts top-level)."""
+    return asyncio.run(coro)
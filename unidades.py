@@ -0,0 +1,80 @@
+# unidades.py — unidades operacionais e a planilha regional de cada uma
+#
+# Fonte única do mapeamento que antes vivia só no replicador_historico (coluna AD) e
+# dos apelidos do importador_carteira (CONQUISTA -> VITORIA DA CONQUISTA ...).
+# particionar() separa as linhas de uma aba por destino a partir da coluna de unidade.
+
+import re
+import unicodedata
+from typing import Dict, List, Set
+
+# ========= DESTINOS =========
+PID_IRECE            = "1zIfub-pAVtZGSjYT1Qa7HzjAof56VExU7U5WwLE382c"
+PID_BAR_IBO          = "1NL6fGUhJyde7_ttTkWRVxg78mAOw8Z5W-LBesK_If_M"
+PID_BRU_GUA_LIV_LAPA = "10Y7VKFsn-UKgMqpM63LiUD2N9_XmfSr29CuK3mq84_c"
+PID_VC_JEQ_ITA       = "1B-d3mYf7WwiAnkUTV0419f91OzPF8rcpimgtFNfQ3Mw"
+
+# Apelidos usados nas origens -> nome canônico da unidade
+MAP_UNIDADE = {
+    'CONQUISTA': 'VITORIA DA CONQUISTA',
+    'ITAPETINGA': 'ITAPETINGA',
+    'JEQUIE': 'JEQUIE',
+    'GUANAMBI': 'GUANAMBI',
+    'BARREIRAS': 'BARREIRAS',
+    'LAPA': 'BOM JESUS DA LAPA',
+    'IRECE': 'IRECE',
+    'IBOTIRAMA': 'IBOTIRAMA',
+    'BRUMADO': 'BRUMADO',
+    'LIVRAMENTO': 'LIVRAMENTO',
+}
+
+# Planilha regional -> unidades (canônicas, normalizadas) que ela atende
+UNIDADES_POR_DESTINO: Dict[str, Set[str]] = {
+    PID_IRECE: {"IRECE"},
+    PID_BAR_IBO: {"BARREIRAS", "IBOTIRAMA"},
+    PID_BRU_GUA_LIV_LAPA: {"BRUMADO", "GUANAMBI", "LIVRAMENTO", "BOM JESUS DA LAPA"},
+    PID_VC_JEQ_ITA: {"VITORIA DA CONQUISTA", "JEQUIE", "ITAPETINGA"},
+}
+
+_DESTINO_DA_UNIDADE = {u: pid for pid, us in UNIDADES_POR_DESTINO.items() for u in us}
+
+
+# ========= NORMALIZAÇÃO =========
+def norm(s) -> str:
+    """Maiúsculas, sem acento, espaços colapsados."""
+    s = str(s or "").strip().upper()
+    s = unicodedata.normalize("NFD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return re.sub(r"\s+", " ", s)
+
+
+def unidade_canonica(valor) -> str:
+    u = norm(valor)
+    return MAP_UNIDADE.get(u, u)
+
+
+def destino_da_unidade(valor):
+    """pid da planilha regional da unidade, ou None se a unidade não é mapeada."""
+    return _DESTINO_DA_UNIDADE.get(unidade_canonica(valor))
+
+
+# ========= PARTIÇÃO =========
+def particionar(linhas: List[List], idx: int, destinos: List[str], cabecalho: int = 0) -> Dict[str, List[List]]:
+    """
+    {pid: linhas} usando a coluna `idx` como unidade. As `cabecalho` primeiras linhas vão
+    para todos; linhas com unidade vazia ou fora do mapeamento também (não se perde nada
+    na réplica por causa de cadastro incompleto).
+    """
+    out = {pid: list(linhas[:cabecalho]) for pid in destinos}
+    cache = {}
+    for r in linhas[cabecalho:]:
+        v = r[idx] if idx < len(r) else ""
+        if v not in cache:
+            cache[v] = destino_da_unidade(v)
+        pid = cache[v]
+        if pid in out:
+            out[pid].append(r)
+        else:
+            for lst in out.values():
+                lst.append(r)
+    return out
@@ -3,6 +3,7 @@ import io
 import os
 import time
 import math
+import threading
 import random
 import json
 import pathlib
@@ -35,6 +36,10 @@ except ModuleNotFoundError:
 
 from google.oauth2.service_account import Credentials
 
+import cache_local
+from escrita_planejada import com_carimbo, escrever_em_lotes
+from escrita_paste import ESCRITA_PASTE, escrever_paste, requisicao_texto
+
 # ========= CONFIG =========
 CREDENTIALS_PATH_FALLBACK = "credenciais.json"  # usado se não houver envs
 SCOPES = ["https://www.googleapis.com/auth/drive", "https://www.googleapis.com/auth/spreadsheets"]
@@ -45,8 +50,6 @@ ABA_DESTINO      = "zps"
 EMPRESAS         = ["SINO ELETRICIDADE LTDA", "SIRTEC SISTEMAS ELÉTRICOS LTDA."]
 
 # Tuning
-BLOCK_ROWS  = 2000           # linhas por bloco de envio
-BATCH_GROUP = 8              # quantos ranges acumulamos antes de dar flush
 MAX_RETRIES = 6
 BASE_SLEEP  = 1.0
 TRANSIENT_CODES = {429, 500, 502, 503, 504}
@@ -124,6 +127,14 @@ creds = make_creds()
 drive = build("drive", "v3", credentials=creds)
 sheets = build("sheets", "v4", credentials=creds)
 
+# httplib2 não é thread-safe: cada thread de upload paralelo usa o seu próprio client
+_local = threading.local()
+
+def sheets_da_thread():
+    if not hasattr(_local, "sheets"):
+        _local.sheets = build("sheets", "v4", credentials=creds, cache_discovery=False)
+    return _local.sheets
+
 # ========= BUSCA DO ARQUIVO =========
 log("📥 Procurando BANCO.xlsx mais recente…")
 resp = with_retry(
@@ -158,36 +169,42 @@ size_bytes = int(file.get("size", 0) or 0)
 log(f"📄 Arquivo: {file['name']}  ID: {file_id}  Modificado: {file['modifiedTime']}  Tamanho: {size_bytes/1_048_576:.2f} MB")
 
 # ========= DOWNLOAD =========
-log("⬇️  Baixando arquivo do Drive…")
-buf = io.BytesIO()
-request = drive.files().get_media(fileId=file_id)
-downloader = MediaIoBaseDownload(buf, request, chunksize=4 * 1024 * 1024)
-
-done = False
-last_pct = -1
+# Baixado antes pelo prefetch.py (rodada do orquestrador)? Só vale se for o mesmo arquivo/versão.
+cacheado = cache_local.ler(cache_local.chave_drive(FOLDER_ORIGEM_ID, "BANCO.xlsx"))
 t0_dl = time.time()
-while not done:
-    try:
-        status, done = downloader.next_chunk()
-        if status:
-            pct = int(status.progress() * 100)
-            if pct != last_pct:
-                if size_bytes:
-                    got = int(status.progress() * size_bytes)
-                    log(f"   ↳ Progresso: {pct:3d}% ({got/1_048_576:.2f} MB de {size_bytes/1_048_576:.2f} MB)")
-                else:
-                    log(f"   ↳ Progresso: {pct:3d}%")
-                last_pct = pct
-    except HttpError as e:
-        code = _status_http_error(e)
-        if code in TRANSIENT_CODES:
-            sleep_s = min(60, BASE_SLEEP + random.uniform(0, 0.75))
-            log(f"⚠️  HTTP {code} durante download. Pausando {sleep_s:.1f}s e retomando…")
-            time.sleep(sleep_s)
-            continue
-        raise
-
-buf.seek(0)
+if cacheado and (cacheado["id"], cacheado["modifiedTime"]) == (file_id, file["modifiedTime"]):
+    log("📦 BANCO.xlsx do cache da rodada (prefetch) — sem download")
+    buf = io.BytesIO(cacheado["conteudo"])
+else:
+    log("⬇️  Baixando arquivo do Drive…")
+    buf = io.BytesIO()
+    request = drive.files().get_media(fileId=file_id)
+    downloader = MediaIoBaseDownload(buf, request, chunksize=4 * 1024 * 1024)
+
+    done = False
+    last_pct = -1
+    while not done:
+        try:
+            status, done = downloader.next_chunk()
+            if status:
+                pct = int(status.progress() * 100)
+                if pct != last_pct:
+                    if size_bytes:
+                        got = int(status.progress() * size_bytes)
+                        log(f"   ↳ Progresso: {pct:3d}% ({got/1_048_576:.2f} MB de {size_bytes/1_048_576:.2f} MB)")
+                    else:
+                        log(f"   ↳ Progresso: {pct:3d}%")
+                    last_pct = pct
+        except HttpError as e:
+            code = _status_http_error(e)
+            if code in TRANSIENT_CODES:
+                sleep_s = min(60, BASE_SLEEP + random.uniform(0, 0.75))
+                log(f"⚠️  HTTP {code} durante download. Pausando {sleep_s:.1f}s e retomando…")
+                time.sleep(sleep_s)
+                continue
+            raise
+
+    buf.seek(0)
 log(f"✅ Download concluído em {time.time() - t0_dl:.1f}s")
 
 # ========= LEITURA DO EXCEL =========
@@ -325,64 +342,40 @@ else:
             "batchUpdate(expandGrid)"
         )
 
-    # ====== CABEÇALHO ======
-    with_retry(
-        lambda: sheets.spreadsheets().values().update(
-            spreadsheetId=SPREADSHEET_ID,
-            range=f"{ABA_DESTINO}!A1",
-            valueInputOption="USER_ENTERED",
-            body={"values": [valores[0]]},
-        ).execute(),
-        "values.update(cabecalho)"
-    )
-
-    # ====== BLOCO A BLOCO ======
+    # ====== LOTES (tamanho por bytes/células, ver escrita_planejada) ======
+    # cabeçalho vai no primeiro bloco (linha 1) e o timestamp K1 junto do último
     t0_up = time.time()
-    i, bloco = 1, 0
-    pending_ranges = []
+    total_rows = len(valores) - 1
 
-    def flush_batch():
-        if not pending_ranges:
-            return
-        body = {"valueInputOption": "USER_ENTERED", "data": pending_ranges}
-        with_retry(
-            lambda: sheets.spreadsheets().values().batchUpdate(
-                spreadsheetId=SPREADSHEET_ID, body=body
-            ).execute(),
-            f"values.batchUpdate({len(pending_ranges)} ranges)"
+    def enviar(rng, parte):
+        sheets_da_thread().spreadsheets().values().update(
+            spreadsheetId=SPREADSHEET_ID,
+            range=rng,
+            valueInputOption="USER_ENTERED",
+            body={"majorDimension": "ROWS", "values": parte},
+        ).execute()
+
+    def carimbo():
+        return f"Atualizado em {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"
+
+    if ESCRITA_PASTE and sheet_id is not None:
+        escrever_paste(
+            lambda body: sheets_da_thread().spreadsheets().batchUpdate(
+                spreadsheetId=SPREADSHEET_ID, body=body).execute(),
+            sheet_id, valores, linha_ini=1, largura=len(valores[0]),
+            depois=[requisicao_texto(sheet_id, "K1", carimbo())], desc="zps",
+        )
+    else:
+        escrever_em_lotes(
+            enviar, valores, linha_ini=1, aba=ABA_DESTINO, desc="zps",
+            ultimo=com_carimbo(
+                lambda data: sheets_da_thread().spreadsheets().values().batchUpdate(
+                    spreadsheetId=SPREADSHEET_ID,
+                    body={"valueInputOption": "USER_ENTERED", "data": data},
+                ).execute(),
+                ABA_DESTINO, "K1", carimbo,
+            ),
         )
-        pending_ranges.clear()
-
-    total_rows = len(valores) - 1
-    while i < len(valores):
-        parte = valores[i:i + BLOCK_ROWS]
-        start_row = i + 1
-        end_row = i + len(parte)
-        bloco += 1
-        log(f"   ↳ Bloco {bloco}: linhas {start_row}..{end_row} ({len(parte)} linhas)")
-        pending_ranges.append({
-            "range": f"{ABA_DESTINO}!A{start_row}",
-            "majorDimension": "ROWS",
-            "values": parte
-        })
-        i += len(parte)
-        if len(pending_ranges) >= BATCH_GROUP:
-            flush_batch()
-            time.sleep(0.3)
-
-    flush_batch()
     log(f"✅ Upload concluído em {time.time() - t0_up:.1f}s ({total_rows} linhas)")
 
-# ========= TIMESTAMP =========
-agora = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-with_retry(
-    lambda: sheets.spreadsheets().values().update(
-        spreadsheetId=SPREADSHEET_ID,
-        range=f"{ABA_DESTINO}!K1",
-        valueInputOption="USER_ENTERED",
-        body={"values": [[f"Atualizado em {agora}"]]},
-    ).execute(),
-    "values.update(K1 timestamp)"
-)
-
 log(f"🎉 Finalizado com sucesso. Linhas enviadas: {len(df_final)}  (tempo total {time.time() - t0_total:.1f}s)")